@@ -0,0 +1,43 @@
+import argparse
+import logging as L
+import sys
+
+import torch
+
+from benchmarks import harness, micro, synthesis, training  # noqa
+from mlprogram import logging
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", "-o", type=str, default=None,
+                        help="The path of the JSON file of the results")
+    parser.add_argument("--filter", "-k", type=str, default=".*",
+                        help="The regex of the benchmarks to be run")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="The JSON file of the results to be compared")
+    parser.add_argument("--threshold", type=float, default=1.1)
+    parser.add_argument("--n_thread", type=int, default=1)
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(harness.benchmarks()))
+        return
+
+    baseline = harness.load(args.baseline) \
+        if args.baseline is not None else None
+    logging.set_level(L.INFO)
+    torch.set_num_threads(args.n_thread)
+    result = harness.run(args.filter)
+    if args.output is not None:
+        harness.save(result, args.output)
+    if baseline is not None:
+        rows = harness.compare(baseline, result, args.threshold)
+        print("\n".join(rows))
+        if any(row.endswith("!") for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import platform
+import re
+import subprocess
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+
+from mlprogram import logging
+
+logger = logging.Logger(__name__)
+
+
+@dataclass
+class Measurement:
+    """
+    The result of a benchmark. The times are the seconds per run and the
+    throughput is the items (e.g., steps or samples) per second.
+    """
+    n_run: int
+    n_item: int
+    mean: float
+    median: float
+    p90: float
+    min: float
+    latency: float
+    throughput: float
+    unit: str
+
+
+def measure(f: Callable[[], Optional[int]], n_run: int = 10, n_warmup: int = 2,
+            unit: str = "item") -> Measurement:
+    """
+    Measure the elapsed time of f
+
+    Parameters
+    ----------
+    f: Callable[[], Optional[int]]
+        The function to be measured. It returns the number of the processed
+        items (1 if None).
+    n_run: int
+    n_warmup: int
+        The number of the runs that are not measured
+    unit: str
+        The name of the item
+    """
+    for _ in range(n_warmup):
+        f()
+    times = []
+    n_item = 0
+    for _ in range(n_run):
+        begin = time.perf_counter()
+        n = f()
+        times.append(time.perf_counter() - begin)
+        n_item += n if n is not None else 1
+    total = sum(times)
+    return Measurement(
+        n_run=n_run,
+        n_item=n_item,
+        mean=float(np.mean(times)),
+        median=float(np.median(times)),
+        p90=float(np.percentile(times, 90)),
+        min=float(np.min(times)),
+        latency=total / max(n_item, 1),
+        throughput=n_item / total if total > 0 else float("inf"),
+        unit=unit,
+    )
+
+
+_benchmarks: Dict[str, Callable[[], Measurement]] = {}
+
+
+def benchmark(name: str) -> Callable[[Callable[[], Measurement]],
+                                     Callable[[], Measurement]]:
+    """
+    Register the function as the benchmark
+    """
+    def wrapper(f: Callable[[], Measurement]) -> Callable[[], Measurement]:
+        if name in _benchmarks:
+            raise RuntimeError(f"Benchmark {name} is already registered")
+        _benchmarks[name] = f
+        return f
+    return wrapper
+
+
+def benchmarks() -> List[str]:
+    return list(_benchmarks.keys())
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(pattern: str = ".*") -> Dict[str, Any]:
+    """
+    Run the benchmarks whose names match the pattern
+    """
+    results = {}
+    for name, f in _benchmarks.items():
+        if re.search(pattern, name) is None:
+            continue
+        logger.info(f"Run {name}")
+        torch.manual_seed(0)
+        np.random.seed(0)
+        results[name] = asdict(f())
+        logger.info(f"{name}: {results[name]}")
+    return {
+        "commit": _git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "torch": torch.__version__,
+        "machine": platform.machine(),
+        "n_thread": torch.get_num_threads(),
+        "results": results,
+    }
+
+
+def compare(baseline: Dict[str, Any], result: Dict[str, Any],
+            threshold: float = 1.1) -> List[str]:
+    """
+    Compare the latencies of two results and return the table rows.
+    The rows of the benchmarks that are slower than threshold * baseline
+    are marked with "!".
+    """
+    rows = [f"{'name':50} {'baseline':>12} {'current':>12} {'ratio':>8}"]
+    for name, value in result["results"].items():
+        if name not in baseline["results"]:
+            continue
+        base = baseline["results"][name]["latency"]
+        current = value["latency"]
+        ratio = current / base if base > 0 else float("inf")
+        mark = "!" if ratio > threshold else " "
+        rows.append(f"{name:50} {base:12.3e} {current:12.3e} {ratio:8.2f}{mark}")
+    return rows
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as file:
+        return json.load(file)
+
+
+def save(result: Dict[str, Any], path: str) -> None:
+    with open(path, "w") as file:
+        json.dump(result, file, indent=2)
@@ -0,0 +1,239 @@
+from typing import List
+
+import numpy as np
+
+from benchmarks import nl2code
+from benchmarks.harness import Measurement, benchmark, measure
+from mlprogram.actions import ActionSequence, PersistentActionSequence
+from mlprogram.builtins import Environment
+from mlprogram.datasets.deepfix import Lexer
+from mlprogram.encoders import ActionSequenceEncoder
+from mlprogram.languages import Token, intern, linediff
+from mlprogram.languages.c import MutationDataset, TypoMutator
+from mlprogram.languages.csg import (
+    AST,
+    CanvasCache,
+    Dataset,
+    Interpreter,
+    Parser,
+    get_samples,
+)
+from mlprogram.languages.python.metrics import Bleu
+from mlprogram.utils.data import ListDataset
+
+
+def _csg_programs(n: int) -> List[AST]:
+    dataset = Dataset(16, 3, 8, 1, 45, seed=0)
+    it = iter(dataset)
+    return [next(it)["ground_truth"] for _ in range(n)]
+
+
+def _action_sequences(n: int) -> List[ActionSequence]:
+    parser = Parser()
+    return [ActionSequence.create(parser.parse(code))
+            for code in _csg_programs(n)]
+
+
+@benchmark("action_sequence/eval")
+def action_sequence_eval() -> Measurement:
+    sequences = _action_sequences(100)
+
+    def f() -> int:
+        n = 0
+        for sequence in sequences:
+            out = ActionSequence()
+            for action in sequence.action_sequence:
+                out.eval(action)
+            n += len(sequence.action_sequence)
+        return n
+    return measure(f, unit="action")
+
+
+@benchmark("action_sequence/clone")
+def action_sequence_clone() -> Measurement:
+    sequences = _action_sequences(100)
+
+    def f() -> int:
+        for sequence in sequences:
+            for _ in range(10):
+                sequence.clone()
+        return 10 * len(sequences)
+    return measure(f, unit="clone")
+
+
+@benchmark("ast/lookup")
+def ast_lookup() -> Measurement:
+    parser = Parser()
+    programs = _csg_programs(100)
+    trees = [parser.parse(code) for code in programs]
+    # The equal (but not identical) trees are used as the keys
+    queries = [parser.parse(code) for code in programs]
+
+    def f() -> int:
+        table = {tree: i for i, tree in enumerate(trees)}
+        for _ in range(10):
+            for tree in queries:
+                table[tree]
+        return 10 * len(trees)
+    return measure(f, unit="lookup")
+
+
+@benchmark("ast/lookup_interned")
+def ast_lookup_interned() -> Measurement:
+    parser = Parser()
+    programs = _csg_programs(100)
+    trees = [intern(parser.parse(code)) for code in programs]
+    queries = [intern(parser.parse(code)) for code in programs]
+
+    def f() -> int:
+        table = {tree: i for i, tree in enumerate(trees)}
+        for _ in range(10):
+            for tree in queries:
+                table[tree]
+        return 10 * len(trees)
+    return measure(f, unit="lookup")
+
+
+@benchmark("encoder/encode_action")
+def encode_action() -> Measurement:
+    dataset = Dataset(16, 3, 8, 1, 45, seed=0)
+    encoder = ActionSequenceEncoder(get_samples(dataset, Parser()), 0)
+    sequences = _action_sequences(100)
+    reference: List[Token] = []
+
+    def f() -> int:
+        for sequence in sequences:
+            # Measure the encoding without the memoized tensors
+            sequence._encoding_cache.clear()
+            encoder.encode_action(sequence, reference)
+        return len(sequences)
+    return measure(f, unit="sequence")
+
+
+@benchmark("encoder/encode_action_per_step")
+def encode_action_per_step() -> Measurement:
+    # Each step of a search encodes the clone of the previous hypothesis
+    # with one appended action
+    dataset = Dataset(16, 3, 8, 1, 45, seed=0)
+    encoder = ActionSequenceEncoder(get_samples(dataset, Parser()), 0)
+    sequences = _action_sequences(100)
+    reference: List[Token] = []
+
+    def f() -> int:
+        n = 0
+        for sequence in sequences:
+            out = PersistentActionSequence()
+            for action in sequence.action_sequence:
+                out = out.clone()
+                out.eval(action)
+                encoder.encode_action(out, reference)
+                encoder.encode_parent(out)
+            n += len(sequence.action_sequence)
+        return n
+    return measure(f, unit="step")
+
+
+@benchmark("collate/round_trip")
+def collate_round_trip() -> Measurement:
+    qencoder, aencoder = nl2code.encoders()
+    transform = nl2code.transform(qencoder, aencoder)
+    entries: List[Environment] = transform(
+        [nl2code.train_dataset[i % 3] for i in range(32)])
+
+    def f() -> int:
+        for _ in range(10):
+            nl2code.collate.split(nl2code.collate.collate(entries))
+        return 10
+    return measure(f, unit="batch")
+
+
+def _execute(interpreter: Interpreter, programs: List[AST]) -> int:
+    n = 0
+    for code in programs:
+        interpreter.execute(code, interpreter.create_state([None]))
+        n += 1
+    return n
+
+
+@benchmark("csg/interpreter.execute")
+def csg_execute() -> Measurement:
+    programs = _csg_programs(100)
+
+    def f() -> int:
+        # A new cache, so the canvases are rendered
+        interpreter = Interpreter(16, 16, 8, False,
+                                  canvas_cache=CanvasCache())
+        return _execute(interpreter, programs)
+    return measure(f, unit="program")
+
+
+@benchmark("csg/interpreter.execute_cached")
+def csg_execute_cached() -> Measurement:
+    programs = _csg_programs(100)
+    # The canvases are cached in the warmup
+    interpreter = Interpreter(16, 16, 8, False, canvas_cache=CanvasCache())
+    return measure(lambda: _execute(interpreter, programs), unit="program")
+
+
+@benchmark("linediff/interpreter.execute")
+def linediff_execute() -> Measurement:
+    # A 300-line program (the size of the long DeepFix programs) edited by
+    # the sequences of deltas like the search states of SMC. The deltas of
+    # each run are new, so the results are not cached.
+    program = "\n".join(f"int x{i} = {i};" for i in range(300))
+    interpreter = linediff.Interpreter()
+    state = interpreter.create_state([program])
+    n_run = [0]
+
+    def f() -> int:
+        n_run[0] += 1
+        for i in range(100):
+            s = state
+            for delta in [
+                    linediff.Replace(i * 7 % 300, f"int y{n_run[0]} = 0;"),
+                    linediff.Insert(i * 13 % 300, f"int z{n_run[0]};"),
+                    linediff.Remove(i * 11 % 300)]:
+                s = interpreter.execute(delta, s)
+        return 300
+    return measure(f, unit="delta")
+
+
+def _c_programs(n: int) -> ListDataset:
+    # 50-line programs (the typical size of the DeepFix programs)
+    return ListDataset([
+        Environment({"code": "\n".join(
+            f"int x{j} = f({i}, {j}); printf(\"%d\\n\", x{j});"
+            for j in range(50))})
+        for i in range(n)])
+
+
+@benchmark("c/mutation_dataset")
+def mutation_dataset() -> Measurement:
+    dataset = MutationDataset(_c_programs(100), TypoMutator(5), lexer=Lexer())
+    return measure(lambda: sum(1 for _ in dataset), unit="program")
+
+
+@benchmark("c/mutation_dataset_pregenerated")
+def mutation_dataset_pregenerated() -> Measurement:
+    dataset = MutationDataset(_c_programs(100), TypoMutator(5), lexer=Lexer(),
+                              n_mutation=4)
+    return measure(lambda: sum(1 for _ in dataset), unit="program")
+
+
+@benchmark("metrics/bleu.batch")
+def bleu_batch() -> Measurement:
+    # The evaluation of 100 samples with 5 candidates (the references are
+    # cached in the warmup like the evaluations during training)
+    rng = np.random.RandomState(0)
+    words = ["self", "x", "=", "(", ")", "foo", "bar", "return", ":", "if"]
+
+    def code() -> str:
+        return " ".join(rng.choice(words, 30))
+    samples = [(code(), [code() for _ in range(5)]) for _ in range(100)]
+    bleu = Bleu()
+
+    def f() -> int:
+        for expected, candidates in samples:
+            bleu.batch(expected, candidates)
+        return len(samples)
+    return measure(f, unit="sample")
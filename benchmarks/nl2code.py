@@ -0,0 +1,170 @@
+from collections import OrderedDict
+from typing import Any, Callable, Tuple
+
+import torch
+from torchnlp.encoders import LabelEncoder
+
+import mlprogram.nn
+import mlprogram.nn.nl2code as nl2code
+from mlprogram.builtins import Apply, Environment, Pick
+from mlprogram.encoders import ActionSequenceEncoder
+from mlprogram.functools import Compose, Map, Sequence
+from mlprogram.nn.action_sequence import Loss
+from mlprogram.samplers import ActionSequenceSampler
+from mlprogram.transforms.action_sequence import (
+    AddActions,
+    AddPreviousActions,
+    AddState,
+    EncodeActionSequence,
+    GroundTruthToActionSequence,
+)
+from mlprogram.transforms.text import EncodeWordQuery
+from mlprogram.utils.data import Collate, CollateOptions, get_samples, get_words
+from test_integration.nl2code_dummy_dataset import (
+    Parser,
+    is_subtype,
+    tokenize,
+    train_dataset,
+)
+
+# The NL2Code model of test_integration/test_nl2code.py. The benchmarks do
+# not train it because the cost of the decoding does not depend on the
+# parameters.
+
+
+def encoders() -> Tuple[LabelEncoder, ActionSequenceEncoder]:
+    words = get_words(train_dataset, tokenize)
+    samples = get_samples(train_dataset, Parser())
+    return LabelEncoder(words, 2), ActionSequenceEncoder(samples, 2)
+
+
+def model(qencoder: LabelEncoder,
+          aencoder: ActionSequenceEncoder) -> torch.nn.Module:
+    embedding = mlprogram.nn.action_sequence.ActionsEmbedding(
+        aencoder._rule_encoder.vocab_size,
+        aencoder._token_encoder.vocab_size,
+        aencoder._node_type_encoder.vocab_size,
+        64, 256
+    )
+    decoder = nl2code.Decoder(embedding.output_size, 256, 256, 64, 0.0)
+    return torch.nn.Sequential(OrderedDict([
+        ("encoder", torch.nn.Sequential(OrderedDict([
+            ("embedding", Apply(
+                module=mlprogram.nn.EmbeddingWithMask(
+                    qencoder.vocab_size, 256, -1),
+                in_keys=[["word_nl_query", "x"]],
+                out_key="nl_features")),
+            ("lstm", Apply(
+                module=mlprogram.nn.BidirectionalLSTM(256, 256, 0.0),
+                in_keys=[["nl_features", "x"]],
+                out_key="reference_features")),
+        ]))),
+        ("decoder", torch.nn.Sequential(OrderedDict([
+            ("embedding", Apply(
+                module=embedding,
+                in_keys=["actions", "previous_actions"],
+                out_key="action_features")),
+            ("decoder", Apply(
+                module=decoder,
+                in_keys=[
+                    ["reference_features", "nl_query_features"],
+                    "actions", "action_features", "history",
+                    "hidden_state", "state",
+                ],
+                out_key=[
+                    "action_features", "action_contexts", "history",
+                    "hidden_state", "state",
+                ])),
+            ("predictor", Apply(
+                module=nl2code.Predictor(embedding, 256, 256, 256, 64),
+                in_keys=["reference_features", "action_features",
+                         "action_contexts"],
+                out_key=["rule_probs", "token_probs", "reference_probs"])),
+        ]))),
+    ]))
+
+
+collate = Collate(
+    word_nl_query=CollateOptions(True, 0, -1),
+    nl_query_features=CollateOptions(True, 0, -1),
+    reference_features=CollateOptions(True, 0, -1),
+    actions=CollateOptions(True, 0, -1),
+    previous_actions=CollateOptions(True, 0, -1),
+    previous_action_rules=CollateOptions(True, 0, -1),
+    history=CollateOptions(False, 1, 0),
+    hidden_state=CollateOptions(False, 0, 0),
+    state=CollateOptions(False, 0, 0),
+    ground_truth_actions=CollateOptions(True, 0, -1)
+)
+
+
+def _extract_reference() -> Apply:
+    return Apply(module=mlprogram.nn.Function(tokenize),
+                 in_keys=[["text_query", "str"]], out_key="reference")
+
+
+def _add_actions(aencoder: ActionSequenceEncoder, train: bool) \
+        -> "OrderedDict[str, Any]":
+    return OrderedDict([
+        ("add_previous_action", Apply(
+            module=AddPreviousActions(aencoder, n_dependent=1),
+            in_keys=["action_sequence", "reference"],
+            constants={"train": train},
+            out_key="previous_actions")),
+        ("add_action", Apply(
+            module=AddActions(aencoder, n_dependent=1),
+            in_keys=["action_sequence", "reference"],
+            constants={"train": train},
+            out_key="actions")),
+        ("add_state", AddState("state")),
+        ("add_hidden_state", AddState("hidden_state")),
+        ("add_history", AddState("history")),
+    ])
+
+
+def sampler(qencoder: LabelEncoder, aencoder: ActionSequenceEncoder,
+            model: torch.nn.Module) -> ActionSequenceSampler:
+    transform_input = Compose(OrderedDict([
+        ("extract_reference", _extract_reference()),
+        ("encode_query", Apply(module=EncodeWordQuery(qencoder),
+                               in_keys=["reference"],
+                               out_key="word_nl_query")),
+    ]))
+    return ActionSequenceSampler(
+        aencoder, is_subtype, transform_input,
+        Compose(_add_actions(aencoder, False)), collate, model)
+
+
+def transform(qencoder: LabelEncoder, aencoder: ActionSequenceEncoder) \
+        -> Callable[[Any], Any]:
+    steps = OrderedDict([
+        ("extract_reference", _extract_reference()),
+        ("encode_word_query", Apply(module=EncodeWordQuery(qencoder),
+                                    in_keys=["reference"],
+                                    out_key="word_nl_query")),
+        ("to_action_sequence", Apply(
+            module=GroundTruthToActionSequence(Parser()),
+            in_keys=["ground_truth"],
+            out_key="action_sequence")),
+    ])
+    steps.update(_add_actions(aencoder, True))
+    steps["encode_action_sequence"] = Apply(
+        module=EncodeActionSequence(aencoder),
+        in_keys=["action_sequence", "reference"],
+        out_key="ground_truth_actions")
+    return Map(Sequence(steps))
+
+
+def loss() -> torch.nn.Module:
+    return torch.nn.Sequential(OrderedDict([
+        ("loss", Apply(
+            module=Loss(),
+            in_keys=["rule_probs", "token_probs", "reference_probs",
+                     "ground_truth_actions"],
+            out_key="action_sequence_loss")),
+        ("pick", mlprogram.nn.Function(Pick("action_sequence_loss"))),
+    ]))
+
+
+def query(i: int) -> Environment:
+    return train_dataset[i % len(train_dataset)].clone_without_supervision()
@@ -0,0 +1,95 @@
+from typing import Generator, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from benchmarks import nl2code
+from benchmarks.harness import Measurement, benchmark, measure
+from mlprogram.builtins import Pick
+from mlprogram.samplers import DuplicatedSamplerState, Sampler, SamplerState
+from mlprogram.synthesizers import DFS, SMC, BeamSearch, Synthesizer
+
+
+class CountingSampler(Sampler):
+    """
+    The sampler that counts the steps (the calls of the sampling methods).
+    The states longer than max_length are not expanded in all_samples because
+    DFS does not terminate with the untrained model.
+    """
+
+    def __init__(self, sampler: Sampler, max_length: Optional[int] = None):
+        self.sampler = sampler
+        self.max_length = max_length
+        self.n_step = 0
+
+    def initialize(self, input):
+        return self.sampler.initialize(input)
+
+    def create_output(self, input, state) -> Optional[Tuple]:
+        return self.sampler.create_output(input, state)
+
+    def all_samples(self, states: List[SamplerState], sorted: bool = True) \
+            -> Generator[DuplicatedSamplerState, None, None]:
+        if self.max_length is not None:
+            states = [
+                state for state in states
+                if len(state.state["action_sequence"].action_sequence) <
+                self.max_length
+            ]
+        if len(states) != 0:
+            self.n_step += 1
+        return self.sampler.all_samples(states, sorted)
+
+    def top_k_samples(self, states: List[SamplerState], k: int) \
+            -> Generator[DuplicatedSamplerState, None, None]:
+        self.n_step += 1
+        return self.sampler.top_k_samples(states, k)
+
+    def batch_k_samples(self, states: List[SamplerState], ks: List[int]) \
+            -> Generator[DuplicatedSamplerState, None, None]:
+        self.n_step += 1
+        return self.sampler.batch_k_samples(states, ks)
+
+
+def _sampler(max_length: Optional[int] = None) -> CountingSampler:
+    qencoder, aencoder = nl2code.encoders()
+    model = nl2code.model(qencoder, aencoder)
+    model.eval()
+    return CountingSampler(nl2code.sampler(qencoder, aencoder, model),
+                           max_length)
+
+
+def _measure_synthesizer(synthesizer: Synthesizer, sampler: CountingSampler,
+                         n_output: Optional[int] = None) -> Measurement:
+    queries = [nl2code.query(i) for i in range(3)]
+
+    def f() -> int:
+        sampler.n_step = 0
+        with torch.no_grad():
+            for query in queries:
+                for i, _ in enumerate(synthesizer(query)):
+                    if n_output is not None and i + 1 == n_output:
+                        break
+        return sampler.n_step
+    return measure(f, n_run=5, n_warmup=1, unit="step")
+
+
+@benchmark("synthesizer/beam_search")
+def beam_search() -> Measurement:
+    sampler = _sampler()
+    return _measure_synthesizer(BeamSearch(5, 20, sampler), sampler)
+
+
+@benchmark("synthesizer/smc")
+def smc() -> Measurement:
+    sampler = _sampler()
+    return _measure_synthesizer(
+        SMC(20, 10, sampler, to_key=Pick("action_sequence"),
+            rng=np.random.RandomState(0)), sampler,
+        n_output=10)
+
+
+@benchmark("synthesizer/dfs")
+def dfs() -> Measurement:
+    sampler = _sampler(max_length=20)
+    return _measure_synthesizer(DFS(sampler), sampler, n_output=10)
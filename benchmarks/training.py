@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+from pytorch_pfn_extras.reporting import report
+from torch import optim
+
+from benchmarks import nl2code
+from benchmarks.harness import Measurement, benchmark, measure
+from mlprogram.entrypoint import train_supervised
+from mlprogram.entrypoint.train import Iteration
+from mlprogram.utils.data import ListDataset
+
+N_ITER = 20
+
+
+def _evaluate() -> None:
+    report({"score": 0.0})
+
+
+@benchmark("train_supervised/nl2code")
+def train_nl2code() -> Measurement:
+    qencoder, aencoder = nl2code.encoders()
+    transform = nl2code.transform(qencoder, aencoder)
+    collate = nl2code.collate
+    dataset = ListDataset([nl2code.train_dataset[i % 3] for i in range(96)])
+    loss = nl2code.loss()
+
+    def f() -> int:
+        model = nl2code.model(qencoder, aencoder)
+        optimizer = optim.Adam(model.parameters())
+        with tempfile.TemporaryDirectory() as tmpdir:
+            train_supervised(
+                os.path.join(tmpdir, "workspace"),
+                os.path.join(tmpdir, "output"),
+                dataset, model, optimizer, loss, _evaluate, "score",
+                lambda x: collate.collate(transform(x)), 8,
+                Iteration(N_ITER), evaluation_interval=Iteration(N_ITER),
+                snapshot_interval=Iteration(N_ITER),
+                n_dataloader_worker=0)
+        return N_ITER
+    return measure(f, n_run=3, n_warmup=1, unit="iteration")
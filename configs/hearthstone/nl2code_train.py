@@ -43,7 +43,14 @@ optimizer = torch.optim.Optimizer(
 main = mlprogram.entrypoint.train_supervised(
     workspace_dir="output/workspace",
     output_dir=output_dir,
-    dataset=train_dataset,
+    # The transform is applied once and the results are reused in each epoch
+    dataset=mlprogram.utils.data.materialize(
+        dataset=train_dataset,
+        transform=transform,
+        path=os.path.join(
+            args=[output_dir, "store"],
+        ),
+    ),
     model=model,
     optimizer=optimizer,
     loss=torch.nn.Sequential(
@@ -81,19 +88,7 @@ main = mlprogram.entrypoint.train_supervised(
     ),
     metric=params.metric,
     threshold=params.metric_threshold,
-    collate=mlprogram.functools.Compose(
-        funcs=collections.OrderedDict(
-            items=[
-                [
-                    "transform",
-                    mlprogram.functools.Map(
-                        func=transform,
-                    ),
-                ],
-                ["collate", collate.collate],
-            ],
-        ),
-    ),
+    collate=collate.collate,
     batch_size=params.batch_size,
     length=mlprogram.entrypoint.train.Epoch(
         n=params.n_epoch,
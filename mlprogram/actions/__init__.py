@@ -11,4 +11,5 @@ from mlprogram.actions.action import (  # noqa
 from mlprogram.actions.action_sequence import (  # noqa
     ActionSequence,
     InvalidActionException,
+    PersistentActionSequence,
 )
@@ -1,6 +1,7 @@
+from collections.abc import Sequence
 from copy import deepcopy
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, cast
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union, cast
 
 from mlprogram import logging
 from mlprogram.actions.action import (
@@ -74,6 +75,9 @@ class ActionSequence:
         The index of the head AST node.
     _head_children_index: Dict[Int, Int]
         The relation between actions and their head indexes of fields.
+    _encoding_cache: Dict[str, Any]
+        The tensors memoized by ActionSequenceEncoder. The encoded rows of
+        the evaluated actions never change, so the clones inherit them.
     """
 
     def __init__(self):
@@ -81,6 +85,17 @@ class ActionSequence:
         self._action_sequence: List[Action] = []
         self._head_action_index: Optional[int] = None
         self._head_children_index: Dict[int, int] = dict()
+        self._encoding_cache: Dict[str, Any] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The memoized tensors are not pickled
+        state = self.__dict__.copy()
+        state.pop("_encoding_cache", None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._encoding_cache = {}
 
     @property
     def head(self) -> Optional[Parent]:
@@ -225,6 +240,7 @@ class ActionSequence:
         action_sequence._head_action_index = self._head_action_index
         action_sequence._head_children_index = \
             deepcopy(self._head_children_index)
+        action_sequence._encoding_cache = dict(self._encoding_cache)
 
         return action_sequence
 
@@ -258,6 +274,8 @@ class ActionSequence:
         AST
             The AST corresponding to the action sequence
         """
+        tree_children = self._tree.children
+
         def generate(head: int, node_type: Optional[NodeType] = None) -> AST:
             action = self._action_sequence[head]
             if isinstance(action, GenerateToken):
@@ -274,7 +292,7 @@ class ActionSequence:
                 ast = Node(rule.parent.type_name, [])
                 for (name, node_type), actions in zip(
                         rule.children,
-                        self._tree.children[head]):
+                        tree_children[head]):
                     assert node_type.type_name is not None
                     if node_type.is_variadic:
                         # Variadic field
@@ -306,8 +324,8 @@ class ActionSequence:
             return generate(0)
         return generate(0)
 
-    @staticmethod
-    def create(node: AST):
+    @classmethod
+    def create(cls, node: AST):
         """
         Return the action sequence corresponding to this AST
 
@@ -361,8 +379,221 @@ class ActionSequence:
             else:
                 logger.critical(f"Invalid type of node: {type(node)}")
                 raise RuntimeError(f"Invalid type of node: {type(node)}")
-        action_sequence = ActionSequence()
+        action_sequence = cls()
         node = Node(None, [Field("root", Root(), node)])
         for action in to_sequence(node):
             action_sequence.eval(action)
         return action_sequence
+
+
+class _PersistentVector(Sequence):
+    """
+    The immutable sequence with structural sharing.
+
+    The elements are stored in a 32-ary trie, so appending or replacing
+    an element copies only O(log L) nodes and the rest of the trie is shared
+    with the original vector.
+    """
+    _BITS = 5
+    _WIDTH = 1 << _BITS
+    _MASK = _WIDTH - 1
+
+    def __init__(self, root: Tuple = (), shift: int = 0, size: int = 0):
+        self._root = root
+        self._shift = shift
+        self._size = size
+
+    def append(self, value: Any) -> "_PersistentVector":
+        if self._size == self._WIDTH << self._shift:
+            # The trie is full
+            root = (self._root, self._new_path(self._shift, value))
+            return _PersistentVector(root, self._shift + self._BITS,
+                                     self._size + 1)
+        root = self._append(self._root, self._shift, self._size, value)
+        return _PersistentVector(root, self._shift, self._size + 1)
+
+    def _new_path(self, shift: int, value: Any) -> Tuple:
+        node: Tuple = (value,)
+        for _ in range(0, shift, self._BITS):
+            node = (node,)
+        return node
+
+    def _append(self, node: Tuple, shift: int, index: int, value: Any) \
+            -> Tuple:
+        if shift == 0:
+            return node + (value,)
+        i = (index >> shift) & self._MASK
+        if i < len(node):
+            child = self._append(node[i], shift - self._BITS, index, value)
+            return node[:i] + (child,)
+        return node + (self._new_path(shift - self._BITS, value),)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("index out of range")
+        node = self._root
+        for shift in range(self._shift, 0, -self._BITS):
+            node = node[(index >> shift) & self._MASK]
+        return node[index & self._MASK]
+
+    def __iter__(self) -> Iterator[Any]:
+        def iterate(node: Tuple, shift: int) -> Iterator[Any]:
+            if shift == 0:
+                yield from node
+            else:
+                for child in node:
+                    yield from iterate(child, shift - self._BITS)
+        return iterate(self._root, self._shift)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return False
+        return len(self) == len(other) and list(self) == list(other)
+
+    def __str__(self) -> str:
+        return str(list(self))
+
+    def __repr__(self) -> str:
+        return str(self)
+
+
+class PersistentActionSequence(ActionSequence):
+    """
+    The action sequence that shares its structure with its clones.
+
+    `clone` is O(1) and `eval` copies only O(log L) objects, so forking
+    many hypotheses from one action sequence does not copy the prefix.
+    The semantics of `eval`, `head`, `parent`, and `generate` are the same
+    as `ActionSequence`.
+
+    Attributes
+    ----------
+    _actions: _PersistentVector
+        The sequence of the evaluated actions.
+    _parents: _PersistentVector
+        The parent of each action.
+    _stack: Optional[Tuple[Tuple[int, int], Any]]
+        The linked list of (action index, field index) from the head
+        to the root. The first element is the head.
+    """
+
+    def __init__(self):
+        self._actions = _PersistentVector()
+        self._parents = _PersistentVector()
+        self._stack: Optional[Tuple[Tuple[int, int], Any]] = None
+        self._encoding_cache: Dict[str, Any] = {}
+
+    @property
+    def head(self) -> Optional[Parent]:
+        if self._stack is None:
+            return None
+        action, field = self._stack[0]
+        return Parent(action, field)
+
+    def _rule(self, index: int) -> ExpandTreeRule:
+        return cast(ExpandTreeRule, cast(ApplyRule, self._actions[index]).rule)
+
+    def _update_head(self, stack: Optional[Tuple[Tuple[int, int], Any]],
+                     close_variadic_field: bool = False) \
+            -> Optional[Tuple[Tuple[int, int], Any]]:
+        while stack is not None:
+            (action, field), parent_stack = stack
+            rule = self._rule(action)
+            n_fields = len(rule.children)
+            if field < n_fields:
+                if close_variadic_field or \
+                        not rule.children[field][1].is_variadic:
+                    field += 1
+                if field < n_fields:
+                    return ((action, field), parent_stack)
+            # Return to the parent because all fields are filled
+            stack = parent_stack
+            close_variadic_field = False
+        return None
+
+    def eval(self, action: Action) -> None:
+        index = len(self._actions)
+        head = self.head
+        if head is not None:
+            head_field: Optional[NodeType] = \
+                self._rule(head.action).children[head.field][1]
+        else:
+            head_field = None
+
+        if isinstance(action, ApplyRule):
+            rule: Rule = action.rule
+            if isinstance(rule, ExpandTreeRule):
+                if head_field is not None and \
+                        head_field.constraint == NodeConstraint.Token:
+                    raise InvalidActionException("GenerateToken", action)
+                self._actions = self._actions.append(action)
+                self._parents = self._parents.append(head)
+                self._stack = ((index, 0), self._stack)
+                if len(rule.children) == 0:
+                    self._stack = self._update_head(self._stack)
+            else:
+                if head is None:
+                    raise InvalidActionException(
+                        "Applying ExpandTreeRule", action)
+                assert head_field is not None
+                if not head_field.is_variadic:
+                    raise InvalidActionException(
+                        "Variadic Fields", action)
+                self._actions = self._actions.append(action)
+                self._parents = self._parents.append(head)
+                self._stack = self._update_head(self._stack,
+                                                close_variadic_field=True)
+        else:
+            if head is None:
+                raise InvalidActionException(
+                    "Applying ExpandTreeRule", action)
+            assert head_field is not None
+            if head_field.constraint != NodeConstraint.Token:
+                raise InvalidActionException(
+                    "ApplyRule", action)
+            self._actions = self._actions.append(action)
+            self._parents = self._parents.append(head)
+            if not head_field.is_variadic:
+                self._stack = self._update_head(self._stack)
+
+    def clone(self):
+        action_sequence = PersistentActionSequence()
+        action_sequence._actions = self._actions
+        action_sequence._parents = self._parents
+        action_sequence._stack = self._stack
+        action_sequence._encoding_cache = dict(self._encoding_cache)
+        return action_sequence
+
+    def parent(self, index: int) -> Optional[Parent]:
+        return self._parents[index]
+
+    @property
+    def action_sequence(self) -> Sequence:  # type: ignore
+        return self._actions
+
+    @property
+    def _action_sequence(self) -> Sequence:  # type: ignore
+        return self._actions
+
+    @property
+    def _tree(self) -> Tree:  # type: ignore
+        # Build the intermediate AST (used only by generate)
+        children: Dict[int, List[List[int]]] = {}
+        parents: Dict[int, Optional[Parent]] = {}
+        for i, (action, parent) in enumerate(zip(self._actions,
+                                                 self._parents)):
+            children[i] = []
+            if isinstance(action, ApplyRule) and \
+                    isinstance(action.rule, ExpandTreeRule):
+                children[i] = [[] for _ in action.rule.children]
+            parents[i] = parent
+            if parent is not None:
+                children[parent.action][parent.field].append(i)
+        return Tree(children, parents)
@@ -71,6 +71,17 @@ class Environment(object):
                 return x
         self._values = {key: _to(x) for key, x in self._values.items()}
 
+    def pin_memory(self) -> "Environment":
+        # Called by DataLoader(pin_memory=True) in its pin-memory thread
+        def _pin_memory(x: Any):
+            if hasattr(x, "pin_memory"):
+                return x.pin_memory()
+            else:
+                return x
+        return Environment(
+            {key: _pin_memory(x) for key, x in self._values.items()},
+            set(self._supervisions))
+
     def __str__(self) -> str:
         return f"Environment(${str(self.to_dict())})"
 
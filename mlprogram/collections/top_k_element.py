@@ -1,10 +1,17 @@
-from bisect import bisect_left
-from typing import Any, Callable, List, Optional, Tuple
+import heapq
+from typing import Any, Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import torch
 
 
 class TopKElement:
     """
     Hold top-k elements
+
+    The elements are kept in a min-heap of (score, index, element), so the
+    worst element is replaced in O(log k). When the scores are the same, the
+    element added later has priority.
     """
 
     def __init__(self, k: int,
@@ -18,8 +25,9 @@ class TopKElement:
         handle_deleted_element: Optional[Callable[[Any], None]]
             The function called when the element is deleted
         """
-        self._elems: List[Tuple[float, Any]] = []
+        self._heap: List[Tuple[float, int, Any]] = []
         self._k = k
+        self._n_added = 0
         self._handle_deleted_element = handle_deleted_element
 
     @property
@@ -27,7 +35,8 @@ class TopKElement:
         """
         Returns the list of element
         """
-        return list(map(lambda x: (-x[0], x[1]), self._elems))
+        return [(score, elem)
+                for score, _, elem in sorted(self._heap, reverse=True)]
 
     def add(self, score: float, elem: Any) -> None:
         """
@@ -38,14 +47,46 @@ class TopKElement:
         score: float
         elem: Any
         """
-        index = bisect_left(list(map(lambda x: x[0], self._elems)), -score)
-        if index > self._k:
-            if self._handle_deleted_element is not None:
-                self._handle_deleted_element(elem)
+        entry = (score, self._n_added, elem)
+        self._n_added += 1
+        if len(self._heap) < self._k:
+            heapq.heappush(self._heap, entry)
             return
-        self._elems.insert(index, (-score, elem))
+        if self._k != 0 and score >= self._heap[0][0]:
+            entry = heapq.heapreplace(self._heap, entry)
         if self._handle_deleted_element is not None:
-            for _, elem in self._elems[self._k:]:
-                self._handle_deleted_element(elem)
+            self._handle_deleted_element(entry[2])
+
+    def add_many(self, scores: Union[np.ndarray, torch.Tensor, List[float]],
+                 elems: Sequence[Any]) -> None:
+        """
+        Add elements to the container. The result is the same as calling
+        `add` for each element in order, but only the elements that can be
+        in the top-k are pushed to the heap.
 
-        self._elems = self._elems[:self._k]
+        Parameters
+        ----------
+        scores: Union[np.ndarray, torch.Tensor, List[float]]
+            The 1-D vector of the scores
+        elems: Sequence[Any]
+        """
+        if isinstance(scores, torch.Tensor):
+            scores = scores.detach().cpu().numpy()
+        scores = np.asarray(scores)
+        n = len(scores)
+        if n > self._k:
+            if self._k == 0:
+                indexes = np.zeros((0,), dtype=np.int64)
+            else:
+                # The k-th largest score in scores
+                threshold = np.partition(scores, n - self._k)[n - self._k]
+                indexes = np.nonzero(scores >= threshold)[0]
+            if self._handle_deleted_element is not None:
+                mask = np.ones((n,), dtype=np.bool)
+                mask[indexes] = False
+                for i in np.nonzero(mask)[0]:
+                    self._handle_deleted_element(elems[i])
+        else:
+            indexes = np.arange(n)
+        for i in indexes:
+            self.add(scores[i].item(), elems[i])
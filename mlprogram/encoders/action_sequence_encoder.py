@@ -1,8 +1,19 @@
 from dataclasses import dataclass
-from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar, Union, cast
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+    cast,
+)
 
+import numpy as np
 import torch
-from torchnlp.encoders import LabelEncoder
 
 from mlprogram import logging
 from mlprogram.actions import (
@@ -14,6 +25,7 @@ from mlprogram.actions import (
     NodeType,
     Rule,
 )
+from mlprogram.actions.action_sequence import Parent
 from mlprogram.languages import Token
 
 logger = logging.Logger(__name__)
@@ -58,6 +70,11 @@ class Samples(Generic[V]):
 
 class ActionSequenceEncoder:
     def __init__(self, samples: Samples, token_threshold: int):
+        # torchnlp is imported only when an encoder is created, so the
+        # modules that merely use the encoders (e.g., the samplers imported
+        # by mlprogram.entrypoint) do not depend on it
+        from torchnlp.encoders import LabelEncoder
+
         reserved_labels: List[Union[Unknown,
                                     CloseVariadicFieldRule]] = [Unknown()]
         reserved_labels.append(CloseVariadicFieldRule())
@@ -76,6 +93,56 @@ class ActionSequenceEncoder:
             if value not in self.value_to_idx:
                 self.value_to_idx[value] = []
             self.value_to_idx[value].append(idx)
+        self._build_tables()
+
+    def _build_tables(self) -> None:
+        # The lookup tables to encode actions without creating a tensor for
+        # each label
+        self._rule_to_idx = self._rule_encoder.token_to_index
+        self._node_type_to_idx = self._node_type_encoder.token_to_index
+        self._token_to_idx = self._token_encoder.token_to_index
+        # The IDs of the node types of each rule (parent, children)
+        self._rule_node_types: Dict[Rule, Tuple[int, List[int]]] = {}
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = dict(self.__dict__)
+        for key in ["_rule_to_idx", "_node_type_to_idx", "_token_to_idx",
+                    "_rule_node_types"]:
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._build_tables()
+
+    def _encode_rule(self, rule: Rule) -> int:
+        return self._rule_to_idx.get(rule, self._rule_encoder.unknown_index)
+
+    def _encode_node_type(self, node_type: NodeType) -> int:
+        return self._node_type_to_idx.get(
+            node_type, self._node_type_encoder.unknown_index)
+
+    def _encode_token(self, kind: Optional[str], value: Any) -> int:
+        return self._token_to_idx.get((kind, value),
+                                      self._token_encoder.unknown_index)
+
+    def _node_types(self, rule: ExpandTreeRule) -> Tuple[int, List[int]]:
+        node_types = self._rule_node_types.get(rule)
+        if node_types is None:
+            node_types = (
+                self._encode_node_type(rule.parent),
+                [self._encode_node_type(child) for _, child in rule.children]
+            )
+            self._rule_node_types[rule] = node_types
+        return node_types
+
+    @staticmethod
+    def _reference_index(reference: List[Token]) -> Dict[Any, int]:
+        index: Dict[Any, int] = {}
+        for i, token in enumerate(reference):
+            if token.raw_value not in index:
+                index[token.raw_value] = i
+        return index
 
     def decode(self, tensor: torch.LongTensor, reference: List[Token]) \
             -> Optional[ActionSequence]:
@@ -125,7 +192,8 @@ class ActionSequenceEncoder:
 
     def encode_action(self,
                       action_sequence: ActionSequence,
-                      reference: List[Token]) \
+                      reference: List[Token],
+                      start: int = 0) \
             -> Optional[torch.Tensor]:
         """
         Return the tensor encoded the action sequence
@@ -135,64 +203,142 @@ class ActionSequenceEncoder:
         action_sequence: action_sequence
             The action_sequence containing action sequence to be encoded
         reference
+        start: int
+            The index of the first action to be encoded. The preceding actions
+            are skipped, so encoding only the tail of a long sequence does
+            not depend on its length.
+            If start is 0, the result is memoized in action_sequence, and the
+            sequences evaluated from it (and its clones) encode only the
+            appended actions (see `extend_action`). The memoized tensor
+            should not be modified in place.
 
         Returns
         -------
         Optional[torch.Tensor]
             The encoded tensor. The shape of tensor is
-            (len(action_sequence) + 1, 4). Each action will be encoded by
-            the tuple of (ID of the node types, ID of the applied rule,
-            ID of the inserted token, the index of the word copied from
+            (len(action_sequence) - start + 1, 4). Each action will be
+            encoded by the tuple of (ID of the node types, ID of the applied
+            rule, ID of the inserted token, the index of the word copied from
             the reference. The padding value should be -1.
             None if the action sequence cannot be encoded.
         """
-        reference_value = [token.raw_value for token in reference]
-        action = \
-            torch.ones(len(action_sequence.action_sequence) + 1, 4).long() \
-            * -1
-        for i in range(len(action_sequence.action_sequence)):
-            a = action_sequence.action_sequence[i]
+        if start == 0:
+            return self._memoize(
+                "action", action_sequence, reference,
+                lambda: self._encode_action_tensor(action_sequence,
+                                                   reference, 0),
+                lambda encoded: self.extend_action(encoded, action_sequence,
+                                                   reference))
+        return self._encode_action_tensor(action_sequence, reference, start)
+
+    def _encode_action_tensor(self, action_sequence: ActionSequence,
+                              reference: List[Token], start: int) \
+            -> Optional[torch.Tensor]:
+        buffer = self._encode_action(action_sequence,
+                                     self._reference_index(reference), start)
+        if buffer is None:
+            return None
+        return torch.from_numpy(buffer)
+
+    def _memoize(self, name: str, action_sequence: ActionSequence,
+                 reference: Optional[List[Token]],
+                 encode: Callable[[], Optional[torch.Tensor]],
+                 extend: Callable[[torch.Tensor], Optional[torch.Tensor]]) \
+            -> Optional[torch.Tensor]:
+        cache = getattr(action_sequence, "_encoding_cache", None)
+        if cache is None:
+            return encode()
+        length = len(action_sequence.action_sequence)
+        entry = cache.get(name)
+        tensor = None
+        if entry is not None:
+            encoder, ref, encoded = entry
+            if encoder is self and ref is reference:
+                # The sequences only grow, so the memoized tensor is the
+                # encoding of a prefix
+                n_encoded = encoded.shape[0] - 1
+                if n_encoded == length:
+                    return encoded
+                elif n_encoded < length:
+                    tensor = extend(encoded)
+        if tensor is None:
+            tensor = encode()
+        if tensor is not None:
+            cache[name] = (self, reference, tensor)
+        return tensor
+
+    def _encode_action(self, action_sequence: ActionSequence,
+                       reference_index: Dict[Any, int], start: int,
+                       out: Optional[np.ndarray] = None) \
+            -> Optional[np.ndarray]:
+        actions = action_sequence.action_sequence
+        length = len(actions)
+        start = min(max(start, 0), length)
+        if out is None:
+            out = np.empty((length - start + 1, 4), dtype=np.int64)
+        out.fill(-1)
+        for i in range(start, length):
+            a = actions[i]
             parent = action_sequence.parent(i)
             if parent is not None:
-                parent_action = \
-                    cast(ApplyRule,
-                         action_sequence.action_sequence[parent.action])
+                parent_action = cast(ApplyRule, actions[parent.action])
                 parent_rule = cast(ExpandTreeRule, parent_action.rule)
-                action[i, 0] = self._node_type_encoder.encode(
-                    parent_rule.children[parent.field][1])
+                out[i - start, 0] = \
+                    self._node_types(parent_rule)[1][parent.field]
 
             if isinstance(a, ApplyRule):
-                rule = a.rule
-                action[i, 1] = self._rule_encoder.encode(rule)
+                out[i - start, 1] = self._encode_rule(a.rule)
             else:
-                encoded_token = \
-                    int(self._token_encoder.encode((a.kind, a.value)).numpy())
+                encoded_token = self._encode_token(a.kind, a.value)
 
                 if encoded_token != 0:
-                    action[i, 2] = encoded_token
+                    out[i - start, 2] = encoded_token
 
                 # Unknown token
-                if a.value in reference_value:
-                    # TODO use kind in reference
-                    action[i, 3] = \
-                        reference_value.index(cast(str, a.value))
+                # TODO use kind in reference
+                index = reference_index.get(a.value)
+                if index is not None:
+                    out[i - start, 3] = index
 
-                if encoded_token == 0 and \
-                        a.value not in reference_value:
+                if encoded_token == 0 and index is None:
                     logger.debug("cannot encode token")
                     return None
 
         head = action_sequence.head
-        length = len(action_sequence.action_sequence)
         if head is not None:
-            head_action = \
-                cast(ApplyRule,
-                     action_sequence.action_sequence[head.action])
+            head_action = cast(ApplyRule, actions[head.action])
             head_rule = cast(ExpandTreeRule, head_action.rule)
-            action[length, 0] = self._node_type_encoder.encode(
-                head_rule.children[head.field][1])
+            out[length - start, 0] = \
+                self._node_types(head_rule)[1][head.field]
+
+        return out
 
-        return action
+    def extend_action(self, encoded: torch.Tensor,
+                      action_sequence: ActionSequence,
+                      reference: List[Token]) -> Optional[torch.Tensor]:
+        """
+        Return the tensor encoded the action sequence by reusing the encoded
+        tensor of its prefix. Only the appended actions are encoded.
+
+        Parameters
+        ----------
+        encoded: torch.Tensor
+            The result of `encode_action` for the prefix of action_sequence
+        action_sequence: ActionSequence
+        reference: List[Token]
+
+        Returns
+        -------
+        Optional[torch.Tensor]
+            The same as the result of `encode_action(action_sequence,
+            reference)`
+        """
+        # The last row of encoded represents the head, so it is re-encoded
+        tail = self._encode_action_tensor(action_sequence, reference,
+                                          encoded.shape[0] - 1)
+        if tail is None:
+            return None
+        return torch.cat([encoded[:-1], tail], dim=0)
 
     def encode_raw_value(self, text: str) -> List[int]:
         if text in self.value_to_idx:
@@ -206,7 +352,7 @@ class ActionSequenceEncoder:
             for text in texts
         ]
 
-    def encode_parent(self, action_sequence) -> torch.Tensor:
+    def encode_parent(self, action_sequence, start: int = 0) -> torch.Tensor:
         """
         Return the tensor encoded the action sequence
 
@@ -214,48 +360,72 @@ class ActionSequenceEncoder:
         ----------
         action_sequence: action_sequence
             The action_sequence containing action sequence to be encoded
+        start: int
+            The index of the first action to be encoded. If start is 0, the
+            result is memoized in action_sequence (see `encode_action`).
 
         Returns
         -------
         torch.Tensor
             The encoded tensor. The shape of `action` tensor is
-            (len(action_sequence) + 1, 4). Each action will be encoded by
+            (len(action_sequence) - start + 1, 4). Each action will be encoded by
             the tuple of (ID of the parent node types, ID of the
             parent-action's rule, the index of the parent action,
             the index of the field).
             The padding value should be -1.
         """
-        parent_tensor = \
-            torch.ones(len(action_sequence.action_sequence) + 1, 4).long() \
-            * -1
-
-        for i in range(len(action_sequence.action_sequence)):
+        if start == 0:
+            return cast(torch.Tensor, self._memoize(
+                "parent", action_sequence, None,
+                lambda: self._encode_parent(action_sequence, 0),
+                lambda encoded: self.extend_parent(encoded, action_sequence)))
+        return self._encode_parent(action_sequence, start)
+
+    def _encode_parent(self, action_sequence: ActionSequence, start: int) \
+            -> torch.Tensor:
+        actions = action_sequence.action_sequence
+        length = len(actions)
+        start = min(max(start, 0), length)
+        parent_tensor = np.full((length - start + 1, 4), -1, dtype=np.int64)
+
+        def encode(i: int, parent: Parent) -> None:
+            parent_action = cast(ApplyRule, actions[parent.action])
+            parent_rule = cast(ExpandTreeRule, parent_action.rule)
+            parent_tensor[i, 0] = self._node_types(parent_rule)[0]
+            parent_tensor[i, 1] = self._encode_rule(parent_rule)
+            parent_tensor[i, 2] = parent.action
+            parent_tensor[i, 3] = parent.field
+
+        for i in range(start, length):
             parent = action_sequence.parent(i)
             if parent is not None:
-                parent_action = \
-                    cast(ApplyRule,
-                         action_sequence.action_sequence[parent.action])
-                parent_rule = cast(ExpandTreeRule, parent_action.rule)
-                parent_tensor[i, 0] = \
-                    self._node_type_encoder.encode(parent_rule.parent)
-                parent_tensor[i, 1] = self._rule_encoder.encode(parent_rule)
-                parent_tensor[i, 2] = parent.action
-                parent_tensor[i, 3] = parent.field
+                encode(i - start, parent)
 
         head = action_sequence.head
-        length = len(action_sequence.action_sequence)
         if head is not None:
-            head_action = \
-                cast(ApplyRule,
-                     action_sequence.action_sequence[head.action])
-            head_rule = cast(ExpandTreeRule, head_action.rule)
-            parent_tensor[length, 0] = \
-                self._node_type_encoder.encode(head_rule.parent)
-            parent_tensor[length, 1] = self._rule_encoder.encode(head_rule)
-            parent_tensor[length, 2] = head.action
-            parent_tensor[length, 3] = head.field
+            encode(length - start, head)
+
+        return torch.from_numpy(parent_tensor)
+
+    def extend_parent(self, encoded: torch.Tensor,
+                      action_sequence: ActionSequence) -> torch.Tensor:
+        """
+        Return the tensor encoded the action sequence by reusing the encoded
+        tensor of its prefix. Only the appended actions are encoded.
+
+        Parameters
+        ----------
+        encoded: torch.Tensor
+            The result of `encode_parent` for the prefix of action_sequence
+        action_sequence: ActionSequence
 
-        return parent_tensor
+        Returns
+        -------
+        torch.Tensor
+            The same as the result of `encode_parent(action_sequence)`
+        """
+        tail = self._encode_parent(action_sequence, encoded.shape[0] - 1)
+        return torch.cat([encoded[:-1], tail], dim=0)
 
     def encode_tree(self, action_sequence: ActionSequence) \
             -> Union[torch.Tensor, torch.Tensor]:
@@ -292,7 +462,8 @@ class ActionSequenceEncoder:
     def encode_each_action(self,
                            action_sequence: ActionSequence,
                            reference: List[Token],
-                           max_arity: int) \
+                           max_arity: int,
+                           start: int = 0) \
             -> torch.Tensor:
         """
         Return the tensor encoding the each action
@@ -303,48 +474,49 @@ class ActionSequenceEncoder:
             The action_sequence containing action sequence to be encoded
         reference
         max_arity: int
+        start: int
+            The index of the first action to be encoded.
 
         Returns
         -------
         torch.Tensor
             The encoded tensor. The shape of tensor is
-            (len(action_sequence), max_arity + 1, 3).
+            (len(action_sequence) - start, max_arity + 1, 3).
             [:, 0, 0] encodes the parent node type. [:, i, 0] encodes
             the node type of (i - 1)-th child node. [:, i, 1] encodes
             the token of (i - 1)-th child node. [:, i, 2] encodes the reference
             index of (i - 1)-th child node.
             The padding value is -1.
         """
-        L = len(action_sequence.action_sequence)
-        reference_value = [token.raw_value for token in reference]
-        retval = torch.ones(L, max_arity + 1, 3).long() * -1
-        for i, action in enumerate(action_sequence.action_sequence):
+        actions = action_sequence.action_sequence
+        L = len(actions)
+        start = min(max(start, 0), L)
+        reference_index = self._reference_index(reference)
+        retval = np.full((L - start, max_arity + 1, 3), -1, dtype=np.int64)
+        for i in range(L - start):
+            action = actions[start + i]
             if isinstance(action, ApplyRule):
                 if isinstance(action.rule, ExpandTreeRule):
+                    parent, children = self._node_types(action.rule)
                     # Encode parent
-                    retval[i, 0, 0] = \
-                        self._node_type_encoder.encode(action.rule.parent)
+                    retval[i, 0, 0] = parent
                     # Encode children
-                    for j, (_, child) in enumerate(
-                            action.rule.children[:max_arity]):
-                        retval[i, j + 1, 0] = \
-                            self._node_type_encoder.encode(child)
+                    children = children[:max_arity]
+                    retval[i, 1:len(children) + 1, 0] = children
             else:
                 gentoken: GenerateToken = action
-                kind = gentoken.kind
-                value = gentoken.value
                 encoded_token = \
-                    int(self._token_encoder.encode((kind, value)).numpy())
+                    self._encode_token(gentoken.kind, gentoken.value)
 
                 if encoded_token != 0:
                     retval[i, 1, 1] = encoded_token
 
-                if value in reference_value:
-                    # TODO use kind in reference
-                    retval[i, 1, 2] = \
-                        reference_value.index(cast(str, value))
+                # TODO use kind in reference
+                index = reference_index.get(gentoken.value)
+                if index is not None:
+                    retval[i, 1, 2] = index
 
-        return retval
+        return torch.from_numpy(retval)
 
     def encode_path(self, action_sequence: ActionSequence, max_depth: int) \
             -> torch.Tensor:
@@ -366,14 +538,15 @@ class ActionSequenceEncoder:
             Each node represented by the rule id.
             The padding value is -1.
         """
-        L = len(action_sequence.action_sequence)
-        retval = torch.ones(L, max_depth).long() * -1
+        actions = action_sequence.action_sequence
+        L = len(actions)
+        retval = np.full((L, max_depth), -1, dtype=np.int64)
         for i in range(L):
             parent_opt = action_sequence.parent(i)
             if parent_opt is not None:
-                p = action_sequence.action_sequence[parent_opt.action]
+                p = actions[parent_opt.action]
                 if isinstance(p, ApplyRule):
-                    retval[i, 0] = self._rule_encoder.encode(p.rule)
+                    retval[i, 0] = self._encode_rule(p.rule)
                 retval[i, 1:] = retval[parent_opt.action, :max_depth - 1]
 
-        return retval
+        return torch.from_numpy(retval)
@@ -33,10 +33,10 @@ def with_file_cache(path, config, types):
 
 def parse_config(configs: Dict[str, Any],
                  custom_types: Optional[Dict[str, Any]] = None) -> Config:
-    _types = {k: v for k, v in types.items()}
+    # The registry is copied without resolving the types
+    _types = types.copy()
     if custom_types is not None:
-        for k, v in custom_types.items():
-            _types[k] = v
+        _types.update(custom_types)
     _types["with_file_cache"] = \
         lambda path, config: with_file_cache(path, config, _types)
 
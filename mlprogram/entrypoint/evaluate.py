@@ -1,9 +1,23 @@
+import contextlib
 import json
 import multiprocessing as mp
 import os
+import threading
 import time
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, Generic, List, Mapping, Optional, Tuple, TypeVar
+from dataclasses import dataclass, field
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Generic,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 import numpy as np
 import torch
@@ -13,7 +27,8 @@ from tqdm import tqdm
 
 from mlprogram import distributed, logging
 from mlprogram.builtins import Environment
-from mlprogram.synthesizers import Synthesizer
+from mlprogram.entrypoint.precision import Precision
+from mlprogram.synthesizers import BatchedSynthesizer, Synthesizer
 from mlprogram.utils.data import ListDataset
 
 logger = logging.Logger(__name__)
@@ -42,16 +57,20 @@ class EvaluationResult(Generic[Code, GroundTruth]):
     metrics: Dict[int, Dict[str, float]]
     generation_rate: float
     generation_time: float
+    # The corpus-level metrics of the top-1 candidates (e.g., BLEU)
+    corpus_metrics: Dict[str, float] = field(default_factory=dict)
 
 
 class EvaluateSample(Generic[Code]):
     def __init__(self, synthesizer: Synthesizer[Environment, Code],
                  metrics: Mapping[str, Callable[[Environment, Code], float]],
-                 top_n: List[int]):
+                 top_n: List[int],
+                 precision: Optional[Precision] = None):
         super().__init__()
         self.synthesizer = synthesizer
         self.metrics = metrics
         self.top_n = top_n
+        self.precision = precision
 
     def __call__(self, elem: Tuple[int, Environment]) \
             -> Result:
@@ -59,33 +78,83 @@ class EvaluateSample(Generic[Code]):
         input = sample.clone_without_supervision()
         begin = time.time()
         logger.debug(f"Start evaluation of {i}-th sample")
-        with logger.block("synthesizer"):
+        with logger.block("synthesizer"), self._autocast():
             candidates = list(self.synthesizer(input))
         end = time.time()
         with logger.block("calculate_metrics"):
             candidates.sort(key=lambda x: -x.score)
+            # Each candidate is evaluated once, and the values are shared by
+            # all top_n
+            outputs = [c.output
+                       for c in candidates[:max(self.top_n, default=0)]]
+            values = {name: _calculate_metric(f, sample, outputs)
+                      for name, f in self.metrics.items()}
             ms = {}
             for n in self.top_n:
-                m: Dict[str, float] = {}
-                for name in self.metrics.keys():
-                    m[name] = 0
-                for c in candidates[:n]:
-                    for name, f in self.metrics.items():
-                        m[name] = max(m[name], f(sample.clone(), c.output))
-                ms[n] = m
+                ms[n] = {name: max([0] + value[:n])
+                         for name, value in values.items()}
         logger.debug(f"Finish evaluation of {i}-th sample")
         return Result(
             sample.to_dict(),
             list(map(lambda x: x.output, candidates)), ms,
             len(candidates) != 0, end - begin)
 
+    def _autocast(self) -> ContextManager:
+        if self.precision is None:
+            return contextlib.nullcontext()
+        return self.precision.autocast()
+
+
+def _calculate_metric(f: Callable[[Environment, Code], float],
+                      sample: Environment, outputs: List[Code]) -> List[float]:
+    if len(outputs) == 0:
+        return []
+    if hasattr(f, "batch"):
+        # Calculate the metric of all the candidates in one call
+        return f.batch(sample.clone(), outputs)  # type: ignore
+    return [f(sample.clone(), output) for output in outputs]
+
+
+def _calculate_corpus_metrics(
+        metrics: Mapping[str, Callable[[Environment, Code], float]],
+        results: List[Result]) -> Dict[str, float]:
+    retval: Dict[str, float] = {}
+    targets = {name: f for name, f in metrics.items() if hasattr(f, "corpus")}
+    if len(targets) == 0:
+        return retval
+    envs = [Environment(dict(result.sample)) for result in results]
+    outputs = [result.candidates[0] if len(result.candidates) != 0 else None
+               for result in results]
+    for name, f in targets.items():
+        value = f.corpus(envs, outputs)  # type: ignore
+        if value is not None:
+            retval[name] = value
+    return retval
+
+
+_evaluate_sample: Optional[EvaluateSample] = None
+
+
+def _initialize_worker(evaluate_sample: EvaluateSample) -> None:
+    global _evaluate_sample
+    # Each worker uses one core to avoid oversubscription
+    torch.set_num_threads(1)
+    _evaluate_sample = evaluate_sample
+
+
+def _evaluate_in_worker(elem: Tuple[int, Environment]) -> Tuple[int, Result]:
+    assert _evaluate_sample is not None
+    return elem[0], _evaluate_sample(elem)
+
 
 class EvaluateSynthesizer(Generic[Code, GroundTruth]):
     def __init__(self, dataset: torch.utils.data.Dataset,
                  synthesizer: Synthesizer[Environment, Code],
                  metrics: Mapping[str, Callable[[Environment, Code], float]],
                  top_n: List[int] = [1, 3],
-                 n_samples: Optional[int] = None):
+                 n_samples: Optional[int] = None,
+                 n_process: int = 0,
+                 precision: Optional[Precision] = None):
         super().__init__()
         self.dataset = dataset
         if n_samples is not None:
@@ -93,6 +162,39 @@ class EvaluateSynthesizer(Generic[Code, GroundTruth]):
         self.synthesizer = synthesizer
         self.metrics = metrics
         self.top_n = top_n
+        self.n_process = n_process
+        self.precision = precision
+
+    def _evaluate_in_pool(self, evaluate_sample: EvaluateSample[Code],
+                          samples: List[Environment]) \
+            -> List[Result[Code, GroundTruth]]:
+        # The synthesizer (and the model in it) is sent to each worker only
+        # once. torch moves the parameters to shared memory when pickling.
+        results: List[Optional[Result[Code, GroundTruth]]] = \
+            [None] * len(samples)
+        # Bound the number of samples waiting in the work queue
+        semaphore = threading.Semaphore(2 * self.n_process)
+
+        def elems():
+            for elem in enumerate(samples):
+                semaphore.acquire()
+                yield elem
+
+        with ctx.Pool(self.n_process, initializer=_initialize_worker,
+                      initargs=(evaluate_sample,)) as pool:
+            try:
+                for i, result in tqdm(
+                        total=len(samples),
+                        iterable=pool.imap_unordered(_evaluate_in_worker,
+                                                     elems())):
+                    semaphore.release()
+                    logger.debug(f"Receive the result of {i}-th sample")
+                    results[i] = result
+            finally:
+                # Unblock the task handler of the pool
+                for _ in range(len(samples)):
+                    semaphore.release()
+        return cast(List[Result[Code, GroundTruth]], results)
 
     @logger.function_block("__call__")
     def __call__(
@@ -108,7 +210,8 @@ class EvaluateSynthesizer(Generic[Code, GroundTruth]):
                 t[name] = 0.0
             total[n] = t
         evaluate_sample: EvaluateSample[Code] = \
-            EvaluateSample(self.synthesizer, self.metrics, self.top_n)
+            EvaluateSample(self.synthesizer, self.metrics, self.top_n,
+                           self.precision)
 
         results: List[Result[Code, GroundTruth]] = []
         rank = distributed.rank(group=group)
@@ -118,12 +221,19 @@ class EvaluateSynthesizer(Generic[Code, GroundTruth]):
                     f"({n_sample} per process)")
 
         samples = self.dataset[rank * n_sample:(rank + 1) * n_sample]
-        results = [
-            evaluate_sample(elem)
-            for elem in tqdm(
+        if self.n_process > 0:
+            results = self._evaluate_in_pool(evaluate_sample, samples)
+        else:
+            elems = tqdm(
                 total=len(samples),
                 iterable=logger.iterable_block("evaluate_sample",
-                                               enumerate(samples)))]
+                                               enumerate(samples)))
+            if isinstance(self.synthesizer, BatchedSynthesizer):
+                # Solve the samples in lockstep to decode them in large batches
+                with evaluate_sample._autocast():
+                    results = self.synthesizer.map(evaluate_sample, elems)
+            else:
+                results = [evaluate_sample(elem) for elem in elems]
         gathered_results = distributed.all_gather(results)
         results = []
         for r in gathered_results:
@@ -143,16 +253,23 @@ class EvaluateSynthesizer(Generic[Code, GroundTruth]):
         total = {n: {name: value / len(self.dataset)
                      for name, value in metric.items()}
                  for n, metric in total.items()}
+        with logger.block("calculate_corpus_metrics"):
+            corpus_metrics = _calculate_corpus_metrics(self.metrics, results)
         r = EvaluationResult(results, total,
-                             np.mean(generated), np.mean(times))
+                             np.mean(generated), np.mean(times),
+                             corpus_metrics)
         # report
         for n, metric in total.items():
             for name, value in metric.items():
                 report({f"{name}@{n}": value})
+        for name, value in corpus_metrics.items():
+            report({f"corpus_{name}": value})
         report({"generation_rate": r.generation_rate})
         report({"generation_time": r.generation_time})
         # logging
         logger.info(f"{r.metrics}")
+        if len(r.corpus_metrics) != 0:
+            logger.info(f"corpus: {r.corpus_metrics}")
         logger.info(f"generation rate: {r.generation_rate}")
         logger.info(f"generation time: {r.generation_time}")
         return r
@@ -165,7 +282,9 @@ def evaluate(input_dir: str, workspace_dir: str, output_dir: str,
              metrics: Mapping[str, Callable[[Environment, Code], float]],
              top_n: List[int] = [1],
              device: torch.device = torch.device("cpu"),
-             n_samples: Optional[int] = None) \
+             n_samples: Optional[int] = None,
+             n_process: int = 0,
+             precision: str = "fp32") \
         -> None:
     os.makedirs(workspace_dir, exist_ok=True)
 
@@ -173,7 +292,8 @@ def evaluate(input_dir: str, workspace_dir: str, output_dir: str,
     model.to(device)
 
     evaluate_synthesizer = EvaluateSynthesizer[Code, GroundTruth](
-        valid_dataset, synthesizer, metrics, top_n, n_samples)
+        valid_dataset, synthesizer, metrics, top_n, n_samples, n_process,
+        Precision(precision, device))
 
     model_dir = os.path.join(input_dir, "model")
     if len(os.listdir(model_dir)) > 1:
@@ -205,6 +325,7 @@ def evaluate(input_dir: str, workspace_dir: str, output_dir: str,
             json.dump(
                 {
                     "metrics": result.metrics,
+                    "corpus_metrics": result.corpus_metrics,
                     "generation_rate": result.generation_rate,
                     "generation_time": result.generation_time
                 },
@@ -0,0 +1,82 @@
+import contextlib
+from typing import ContextManager, Optional
+
+import torch
+
+from mlprogram import logging
+
+logger = logging.Logger(__name__)
+
+
+class Precision(object):
+    """
+    The precision policy of the training and evaluation.
+
+    "fp32" runs everything in float32. "bf16" and "fp16" run the forward
+    computation in autocast. fp16 is available only on CUDA and its
+    loss is scaled by GradScaler to avoid the underflow of the gradients.
+    The unsupported combinations fall back to the nearest supported one:
+    fp16 on CPU uses bf16 and bf16 on the GPUs without bf16 support uses fp16.
+    bf16 requires torch.autocast (torch>=1.10).
+    """
+
+    def __init__(self, name: str, device: torch.device):
+        """
+        Parameters
+        ----------
+        name: str
+            "fp32", "bf16", or "fp16"
+        device: torch.device
+        """
+        if name not in ["fp32", "bf16", "fp16"]:
+            raise ValueError(f"Invalid precision: {name}")
+        if device.type == "cpu" and name == "fp16":
+            logger.warning("fp16 autocast is not supported on CPU. Use bf16")
+            name = "bf16"
+        if device.type == "cuda" and name == "bf16" and \
+                not (hasattr(torch.cuda, "is_bf16_supported") and
+                     torch.cuda.is_bf16_supported()):
+            logger.warning("bf16 is not supported on this GPU. Use fp16")
+            name = "fp16"
+        if name == "bf16" and not hasattr(torch, "autocast"):
+            raise ValueError(
+                f"bf16 on {device.type} requires torch.autocast "
+                f"(torch>=1.10), but torch {torch.__version__} is installed")
+        self.name = name
+        self.device = device
+        self.dtype: Optional[torch.dtype] = {
+            "fp32": None,
+            "bf16": torch.bfloat16,
+            "fp16": torch.float16,
+        }[name]
+        self.scaler: Optional[torch.cuda.amp.GradScaler] = None
+        if name == "fp16":
+            self.scaler = torch.cuda.amp.GradScaler()
+
+    @property
+    def enabled(self) -> bool:
+        return self.dtype is not None
+
+    def autocast(self) -> ContextManager:
+        """
+        Return the context manager in which the forward computation runs
+        """
+        if self.dtype is None:
+            return contextlib.nullcontext()
+        if self.dtype == torch.float16:
+            # torch.cuda.amp.autocast is also available in the older torch
+            return torch.cuda.amp.autocast()
+        return torch.autocast(device_type=self.device.type, dtype=self.dtype)
+
+    def backward(self, loss: torch.Tensor) -> None:
+        if self.scaler is not None:
+            loss = self.scaler.scale(loss)
+        loss.backward()
+
+    def step(self, optimizer: torch.optim.Optimizer) -> None:
+        if self.scaler is not None:
+            # GradScaler skips the step if the gradients contain inf or nan
+            self.scaler.step(optimizer)
+            self.scaler.update()
+        else:
+            optimizer.step()
@@ -1,8 +1,10 @@
+import contextlib
+import multiprocessing as mp
 import os
 import shutil
 import traceback
 from dataclasses import dataclass
-from typing import Any, Callable, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import pytorch_pfn_extras as ppe
 import torch
@@ -11,12 +13,32 @@ from torch import nn
 from torch.utils.data import DataLoader
 
 from mlprogram import distributed, logging
-from mlprogram.builtins import Environment
+from mlprogram.builtins import Environment, Identity
+from mlprogram.entrypoint.precision import Precision
 from mlprogram.pytorch_pfn_extras import SaveTopKModel, StopByThreshold
-from mlprogram.synthesizers import Synthesizer
+from mlprogram.synthesizers import BatchedSynthesizer, Synthesizer
+from mlprogram.utils.data import BucketBatchSampler
 
 logger = logging.Logger(__name__)
 
+# The same context as mlprogram.entrypoint.evaluate
+ctx = mp.get_context("spawn")
+
+_reward: Optional[Callable[[Environment, Any], float]] = None
+
+
+def _initialize_reward_worker(reward: Callable[[Environment, Any], float]) \
+        -> None:
+    global _reward
+    # Each worker uses one core to avoid oversubscription
+    torch.set_num_threads(1)
+    _reward = reward
+
+
+def _compute_reward(sample: Environment, output: Any) -> float:
+    assert _reward is not None
+    return _reward(sample, output)
+
 
 @dataclass
 class Epoch:
@@ -120,20 +142,40 @@ def create_extensions_manager(n_iter: int, evaluation_interval_iter: int,
 
 
 def create_dataloader(dataset: torch.utils.data.Dataset,
-                      batch_size: int, n_worker: int, collate_fn: Callable) \
+                      batch_size: int, n_worker: int, collate_fn: Callable,
+                      batch_sampler: Optional[torch.utils.data.Sampler] = None,
+                      prefetch_factor: int = 2,
+                      pin_memory: bool = False) \
         -> torch.utils.data.DataLoader:
-    if hasattr(dataset, "__len__"):
+    """
+    Create the DataLoader used throughout the training.
+
+    The workers are persistent, so the loader should be created once and
+    iterated in each epoch. The workers keep their copies of the dataset, and
+    iterable datasets are responsible for reseeding themselves in each epoch
+    (see `mlprogram.languages.csg.Dataset`).
+    """
+    kwargs: Dict[str, Any] = {
+        "num_workers": n_worker,
+        "collate_fn": collate_fn,
+        "pin_memory": pin_memory,
+    }
+    if n_worker > 0:
+        kwargs["persistent_workers"] = True
+        kwargs["prefetch_factor"] = prefetch_factor
+    if batch_sampler is not None:
+        return DataLoader(dataset, batch_sampler=batch_sampler, **kwargs)
+    if hasattr(dataset, "__len__") and \
+            not isinstance(dataset, torch.utils.data.IterableDataset):
         is_iterable = False
     else:
         is_iterable = True
     if is_iterable:
         return DataLoader(dataset, batch_size=batch_size,
-                          shuffle=False, num_workers=n_worker,
-                          collate_fn=collate_fn)
+                          shuffle=False, **kwargs)
     else:
         return DataLoader(dataset, batch_size=batch_size,
-                          shuffle=True, num_workers=n_worker,
-                          collate_fn=collate_fn)
+                          shuffle=True, **kwargs)
 
 
 def get_world_process_group(device: torch.device) \
@@ -207,8 +249,22 @@ def train_supervised(workspace_dir: str, output_dir: str,
                      maximize: bool = True,
                      threshold: Optional[float] = None,
                      n_dataloader_worker: int = 1,
-                     device: torch.device = torch.device("cpu")) \
+                     device: torch.device = torch.device("cpu"),
+                     batch_sampler: Optional[BucketBatchSampler] = None,
+                     prefetch_factor: int = 2,
+                     pin_memory: Optional[bool] = None,
+                     precision: str = "fp32",
+                     n_accumulation: int = 1) \
         -> None:
+    """
+    Train the model by the supervised learning.
+
+    batch_size is the size of a micro-batch. The gradients of n_accumulation
+    micro-batches are accumulated before each optimizer step, so the
+    effective batch size is batch_size * n_accumulation * (#processes).
+    The iterations (length, evaluation_interval, and snapshot_interval)
+    count the optimizer steps.
+    """
     os.makedirs(workspace_dir, exist_ok=True)
 
     logger.info("Prepare model")
@@ -216,9 +272,12 @@ def train_supervised(workspace_dir: str, output_dir: str,
     model.train()
 
     group = get_world_process_group(device)
-    global_batch_size = batch_size * distributed.size(group)
+    global_batch_size = batch_size * distributed.size(group) * n_accumulation
 
-    if hasattr(dataset, "__len__"):
+    if batch_sampler is not None:
+        # batch_sampler splits the batches among the processes
+        iter_per_epoch = len(batch_sampler) // n_accumulation
+    elif hasattr(dataset, "__len__"):
         iter_per_epoch = len(dataset) // global_batch_size
     else:
         iter_per_epoch = 1
@@ -240,38 +299,70 @@ def train_supervised(workspace_dir: str, output_dir: str,
             workspace_dir)
 
     train_model = setup_distributed_training(model, loss, group)
+    policy = Precision(precision, device)
+
+    if pin_memory is None:
+        pin_memory = device.type == "cuda"
+    loader = create_dataloader(dataset, batch_size, n_dataloader_worker,
+                               collate, batch_sampler,
+                               prefetch_factor=prefetch_factor,
+                               pin_memory=pin_memory)
 
     logger.info("Start training")
     try:
+        micro_batches: List[Environment] = []
+        padding_ratios: List[float] = []
         while manager.iteration < n_iter:
-            loader = create_dataloader(dataset, batch_size, n_dataloader_worker,
-                                       collate)
-
             for batch in logger.iterable_block("iteration", loader, True):
                 if manager.iteration >= n_iter:
                     break
+                if batch_sampler is not None:
+                    padding_ratio = batch_sampler.pop_padding_ratio()
+                    if padding_ratio is not None:
+                        padding_ratios.append(padding_ratio)
                 if len(batch.to_dict()) == 0:
                     logger.warning(f"Skip {manager.iteration} th batch")
                     continue
+                micro_batches.append(batch)
+                if len(micro_batches) < n_accumulation:
+                    continue
                 with manager.run_iteration():
                     train_model.train()
-                    with logger.block("to"):
-                        batch.to(device=device)
-                    with logger.block("forward"):
-                        bloss = train_model(batch)
-                    with logger.block("backward"):
-                        optimizer.zero_grad(set_to_none=True)
-                        bloss.backward()
+                    optimizer.zero_grad(set_to_none=True)
+                    total_loss = 0.0
+                    for i, batch in enumerate(micro_batches):
+                        with logger.block("to"):
+                            batch.to(device=device, non_blocking=pin_memory)
+                        # The gradients are all-reduced only in the backward of
+                        # the last micro-batch
+                        if i != len(micro_batches) - 1 and \
+                                hasattr(train_model, "no_sync"):
+                            sync = train_model.no_sync()
+                        else:
+                            sync = contextlib.nullcontext()
+                        with sync:
+                            with logger.block("forward"), policy.autocast():
+                                bloss = train_model(batch) / len(micro_batches)
+                            with logger.block("backward"):
+                                policy.backward(bloss)
+                        total_loss += bloss.item()
                     with logger.block("optimizer.step"):
-                        optimizer.step()
+                        policy.step(optimizer)
 
-                    ppe.reporting.report({"loss": bloss.item()})
+                    ppe.reporting.report({"loss": total_loss})
+                    if len(padding_ratios) != 0:
+                        ppe.reporting.report({
+                            "padding_ratio":
+                                sum(padding_ratios) / len(padding_ratios)
+                        })
                     logger.dump_elapsed_time_log()
                     if device.type == "cuda":
                         ppe.reporting.report({
                             "gpu.max_memory_allocated":
                                 torch.cuda.max_memory_allocated(device)
                         })
+                micro_batches = []
+                padding_ratios = []
     except RuntimeError as e:  # noqa
         logger.critical(traceback.format_exc())
 
@@ -298,8 +389,24 @@ def train_REINFORCE(input_dir: str, workspace_dir: str, output_dir: str,
                     use_pretrained_model: bool = False,
                     use_pretrained_optimizer: bool = False,
                     n_dataloader_worker: int = 2,
-                    device: torch.device = torch.device("cpu")) \
+                    device: torch.device = torch.device("cpu"),
+                    prefetch_factor: int = 2,
+                    precision: str = "fp32",
+                    n_parallel_rollout: int = 0,
+                    n_reward_process: int = 0) \
         -> None:
+    """
+    Parameters
+    ----------
+    n_parallel_rollout: int
+        The number of the samples rolled out in lockstep. The decoder calls
+        of the rollouts are merged into one batch (see BatchedSynthesizer).
+        If the synthesizer is already a BatchedSynthesizer, it is used as is.
+    n_reward_process: int
+        The number of the processes that compute the rewards. The processes
+        are kept during the training. If 0, the rewards are computed in the
+        main process.
+    """
     os.makedirs(workspace_dir, exist_ok=True)
 
     logger.info("Prepare model")
@@ -344,36 +451,69 @@ def train_REINFORCE(input_dir: str, workspace_dir: str, output_dir: str,
             report_metrics=["reward"])
 
     train_model = setup_distributed_training(model, loss, group)
+    policy = Precision(precision, device)
+
+    # The samples are moved to the device one by one in the rollout, so
+    # pinning the memory does not help
+    loader = create_dataloader(dataset, batch_size, n_dataloader_worker,
+                               Identity(), prefetch_factor=prefetch_factor)
+
+    if n_parallel_rollout > 0 and \
+            not isinstance(synthesizer, BatchedSynthesizer):
+        synthesizer = BatchedSynthesizer(synthesizer, synthesizer,
+                                         n_parallel_rollout)
+
+    def rollout(sample: Environment) -> List[Any]:
+        # The grad mode and autocast are thread local, so they are enabled in
+        # this function (it runs in the threads of BatchedSynthesizer)
+        outputs = []
+        with torch.no_grad(), policy.autocast():
+            sample_inputs = sample.clone_without_supervision()
+            sample_inputs.to(device)
+            for result in logger.iterable_block(
+                    "sample",
+                    synthesizer(sample_inputs, n_required_output=n_rollout)):
+                if not result.is_finished:
+                    continue
+                outputs.extend([result.output] * result.num)
+        return outputs
+
+    pool = None
+    if n_reward_process > 0:
+        pool = ctx.Pool(n_reward_process, initializer=_initialize_reward_worker,
+                        initargs=(reward,))
 
     logger.info("Start training")
     try:
         while manager.iteration < n_iter:
-            loader = create_dataloader(dataset, batch_size, n_dataloader_worker,
-                                       lambda x: x)
-
             for samples in logger.iterable_block("iteration", loader, True):
                 if manager.iteration >= n_iter:
                     break
                 # Rollout
-                rollouts = []
                 train_model.train()
-                with torch.no_grad():
-                    for sample in logger.iterable_block("rollout", samples):
-                        sample_inputs = sample.clone_without_supervision()
-                        sample_inputs.to(device)
-                        for rollout in logger.iterable_block(
-                                "sample",
-                                synthesizer(sample_inputs,
-                                            n_required_output=n_rollout)):
-                            if not rollout.is_finished:
-                                continue
-                            for _ in range(rollout.num):
-                                output = sample.clone()
-                                output["ground_truth"] = rollout.output
-                                output.mark_as_supervision("ground_truth")
-                                output["reward"] = \
-                                    torch.tensor(reward(sample.clone(), rollout.output))
-                                rollouts.append(output)
+                with logger.block("rollout"):
+                    if isinstance(synthesizer, BatchedSynthesizer):
+                        # Roll out the samples in lockstep to decode them in
+                        # large batches
+                        outputs = synthesizer.map(rollout, samples)
+                    else:
+                        outputs = [rollout(sample) for sample in samples]
+                with logger.block("reward"):
+                    pairs = [(sample, output)
+                             for sample, output_list in zip(samples, outputs)
+                             for output in output_list]
+                    if pool is not None:
+                        rewards = pool.starmap(_compute_reward, pairs)
+                    else:
+                        rewards = [reward(sample.clone(), output)
+                                   for sample, output in pairs]
+                rollouts = []
+                for (sample, output), r in zip(pairs, rewards):
+                    output_sample = sample.clone()
+                    output_sample["ground_truth"] = output
+                    output_sample.mark_as_supervision("ground_truth")
+                    output_sample["reward"] = torch.tensor(r)
+                    rollouts.append(output_sample)
                 if len(rollouts) == 0:
                     logger.warning("No rollout")
                     continue
@@ -388,14 +528,14 @@ def train_REINFORCE(input_dir: str, workspace_dir: str, output_dir: str,
                         batch2 = collate(rollouts)
                     with logger.block("to"):
                         batch2.to(device)
-                    with logger.block("forward"):
+                    with logger.block("forward"), policy.autocast():
                         train_model.train()
                         bloss = train_model(batch2)
                     with logger.block("backward"):
                         optimizer.zero_grad(set_to_none=True)
-                        bloss.backward()
+                        policy.backward(bloss)
                     with logger.block("optimizer.step"):
-                        optimizer.step()
+                        policy.step(optimizer)
 
                     ppe.reporting.report({"loss": bloss.item()})
                     ppe.reporting.report({
@@ -409,5 +549,9 @@ def train_REINFORCE(input_dir: str, workspace_dir: str, output_dir: str,
                         })
     except RuntimeError as e:  # noqa
         logger.critical(traceback.format_exc())
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
 
     save_results(workspace_dir, output_dir, model, optimizer)
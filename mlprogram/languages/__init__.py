@@ -5,6 +5,7 @@ from mlprogram.languages.ast import Leaf  # noqa
 from mlprogram.languages.ast import Node  # noqa
 from mlprogram.languages.ast import Root  # noqa
 from mlprogram.languages.ast import Sugar  # noqa
+from mlprogram.languages.ast import intern  # noqa
 from mlprogram.languages.expander import Expander  # noqa
 from mlprogram.languages.interpreter import BatchedState  # noqa
 from mlprogram.languages.interpreter import Interpreter  # noqa
@@ -7,3 +7,9 @@ Error = TypeVar("Error")
 class Analyzer(Generic[Code, Error]):
     def __call__(self, code: Code) -> List[Error]:
         raise NotImplementedError
+
+    def batch(self, codes: List[Code]) -> List[List[Error]]:
+        """
+        Analyze the codes. The subclasses may analyze them concurrently.
+        """
+        return [self(code) for code in codes]
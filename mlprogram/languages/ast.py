@@ -1,6 +1,8 @@
+import threading
+import weakref
 from copy import deepcopy
-from dataclasses import dataclass
-from typing import Any, Generic, List, Optional, TypeVar, Union
+from dataclasses import dataclass, field
+from typing import Any, Dict, Generic, List, Optional, Tuple, TypeVar, Union
 
 Kind = TypeVar("Kind")
 V = TypeVar("V")
@@ -34,6 +36,15 @@ class AST(Generic[Kind]):
     """
     Abstract syntax tree of the target language
     """
+    # The cached hash. It is set only for the interned ASTs (see intern).
+    _hash: Optional[int] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The hash depends on the hash seed of the process, so the unpickled
+        # (or copied) AST is not interned.
+        state = self.__dict__.copy()
+        state.pop("_hash", None)
+        return state
 
     def clone(self):
         """
@@ -68,6 +79,14 @@ class Field(Generic[Kind]):
     name: str
     type_name: Union[Kind, Root]
     value: Union[AST, List[AST]]
+    # The cached hash of the interned field
+    _hash: Optional[int] = field(default=None, init=False, repr=False,
+                                 compare=False)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        state.pop("_hash", None)
+        return state
 
     def clone(self):
         """
@@ -78,6 +97,9 @@ class Field(Generic[Kind]):
         Field
             The cloned field
         """
+        if self._hash is not None:
+            # Interned fields are immutable
+            return self
         if isinstance(self.value, list):
             return Field(self.name, self.type_name,
                          [v.clone() for v in self.value])
@@ -85,6 +107,8 @@ class Field(Generic[Kind]):
             return Field(self.name, self.type_name, self.value.clone())
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         if isinstance(self.value, list):
             return hash(self.name) ^ hash(self.type_name) ^ \
                 hash(tuple(self.value))
@@ -92,7 +116,12 @@ class Field(Generic[Kind]):
             return hash(self.name) ^ hash(self.type_name) ^ hash(self.value)
 
     def __eq__(self, rhs: Any) -> bool:
+        if self is rhs:
+            return True
         if isinstance(rhs, Field):
+            if self._hash is not None and rhs._hash is not None and \
+                    self._hash != rhs._hash:
+                return False
             return self.name == rhs.name and \
                 self.type_name == rhs.type_name and self.value == rhs.value
         else:
@@ -123,14 +152,24 @@ class Node(AST[Kind], Generic[Kind]):
         AST
             The cloned AST
         """
+        if self._hash is not None:
+            # Interned nodes are immutable
+            return self
         return Node(self.type_name,
                     [f.clone() for f in self.fields])
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         return hash(self.type_name) ^ hash(tuple(self.fields))
 
     def __eq__(self, rhs: Any) -> bool:
+        if self is rhs:
+            return True
         if isinstance(rhs, Node):
+            if self._hash is not None and rhs._hash is not None and \
+                    self._hash != rhs._hash:
+                return False
             return self.type_name == rhs.type_name and \
                 self.fields == rhs.fields
         else:
@@ -164,13 +203,23 @@ class Leaf(AST[Kind], Generic[Kind, V]):
         AST
             The cloned AST
         """
+        if self._hash is not None:
+            # Interned leaves are immutable
+            return self
         return Leaf(self.type_name, deepcopy(self.value))
 
     def __hash__(self) -> int:
+        if self._hash is not None:
+            return self._hash
         return hash(self.type_name) ^ hash(self.value)
 
     def __eq__(self, rhs: Any) -> bool:
+        if self is rhs:
+            return True
         if isinstance(rhs, Leaf):
+            if self._hash is not None and rhs._hash is not None and \
+                    self._hash != rhs._hash:
+                return False
             return self.type_name == rhs.type_name and \
                 self.value == rhs.value
         else:
@@ -180,6 +229,91 @@ class Leaf(AST[Kind], Generic[Kind, V]):
         return self.type_name
 
 
+# The interned ASTs. The keys of the nodes contain the ids of the interned
+# children, which are alive while the parent is alive.
+_interned: "weakref.WeakValueDictionary[Tuple, AST]" = \
+    weakref.WeakValueDictionary()
+_interned_lock = threading.Lock()
+
+
+def _intern_value(value: Union[AST, List[AST]]) \
+        -> Optional[Tuple[Union[AST, List[AST]], Any]]:
+    if isinstance(value, list):
+        children = [intern(v) for v in value]
+        if any(v._hash is None for v in children):
+            return None
+        return children, tuple(id(v) for v in children)
+    child = intern(value)
+    if child._hash is None:
+        return None
+    return child, id(child)
+
+
+def intern(ast: AST) -> AST:
+    """
+    Return the canonical instance of the AST (hash consing).
+
+    All equal ASTs are interned to one instance and the subtrees are interned
+    recursively, so equal subtrees share one instance. The hash of an
+    interned AST is cached, the equality check of interned ASTs is an
+    identity (or hash) check in most cases, and clone returns itself.
+    The interned AST must not be modified. The ASTs whose values are not
+    hashable are returned as is.
+
+    Parameters
+    ----------
+    ast: AST
+
+    Returns
+    -------
+    AST
+        The interned AST that is equal to the argument
+    """
+    if ast._hash is not None:
+        return ast
+    if isinstance(ast, Leaf):
+        # The type is in the key because 1 and True are equal
+        key: Tuple = (Leaf, ast.type_name, type(ast.value), ast.value)
+        try:
+            h = hash(ast)
+            hash(key)
+        except TypeError:
+            return ast
+        with _interned_lock:
+            interned = _interned.get(key)
+            if interned is None:
+                interned = Leaf(ast.type_name, ast.value)
+                interned._hash = h
+                _interned[key] = interned
+        return interned
+    if isinstance(ast, Node):
+        fields = []
+        field_keys = []
+        for f in ast.fields:
+            interned_value = _intern_value(f.value)
+            if interned_value is None:
+                # The subtree is not hashable
+                return ast
+            value, value_key = interned_value
+            fields.append(Field(f.name, f.type_name, value))
+            field_keys.append((f.name, f.type_name, value_key))
+        key = (Node, ast.type_name, tuple(field_keys))
+        try:
+            hash(key)
+        except TypeError:
+            return ast
+        with _interned_lock:
+            interned = _interned.get(key)
+            if interned is None:
+                for f in fields:
+                    f._hash = hash(f)
+                interned = Node(ast.type_name, fields)
+                interned._hash = hash(interned)
+                _interned[key] = interned
+        return interned
+    return ast
+
+
 class Sugar:
     @staticmethod
     def node(type_name: Optional[Union[Kind, Root]], **kwargs) -> Node:
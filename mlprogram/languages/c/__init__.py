@@ -1,3 +1,6 @@
 from mlprogram.languages.c.analyzer import Analyzer  # noqa
+from mlprogram.languages.c.analyzer import Clang  # noqa
+from mlprogram.languages.c.analyzer import local_compiler  # noqa
+from mlprogram.languages.c.dataset import MutationDataset  # noqa
 from mlprogram.languages.c.lexer import Lexer  # noqa
 from mlprogram.languages.c.typo_mutator import TypoMutator  # noqa
\ No newline at end of file
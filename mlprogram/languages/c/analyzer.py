@@ -1,47 +1,290 @@
+import hashlib
+import json
 import os
 import re
 import subprocess
-import tempfile
-from typing import IO, List, cast
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from mlprogram import logging
 from mlprogram.languages import Analyzer as BaseAnalyzer
 
+logger = logging.Logger(__name__)
+
+
+class Clang(object):
+    """
+    Compile the code with clang and return the diagnostics
+    """
+
+    def __init__(self, cmd: str = "clang"):
+        self.cmd = cmd
+        self._cache_key: Optional[str] = None
+
+    @property
+    def cache_key(self) -> str:
+        """
+        The identifier of the compiler used as the namespace of the cache.
+        It contains the version of the compiler, so the cached results are
+        not reused after the compiler is changed.
+        """
+        if self._cache_key is None:
+            try:
+                version = subprocess.run(
+                    [self.cmd, "--version"],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.STDOUT,
+                    text=True).stdout
+            except OSError:
+                logger.warning(f"Cannot get the version of {self.cmd}")
+                version = ""
+            self._cache_key = f"clang:{self.cmd}\0{version}"
+        return self._cache_key
+
+    def __call__(self, code: str) -> str:
+        # The object file is not needed, so it is written to /dev/null
+        proc = subprocess.run(
+            [self.cmd, "-x", "c", "-c", "-", "-o", os.devnull],
+            input=code,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+            text=True)
+        return proc.stderr
+
+
+_pairs = {")": "(", "]": "[", "}": "{"}
+
+
+def local_compiler(code: str) -> str:
+    """
+    The stand-in of clang that does not require the compiler.
+
+    It reports only the unbalanced brackets and the missing semicolon at the
+    end of the code, in the same format as clang's diagnostics. It is
+    intended for tests and environments without clang.
+    """
+    errors = []
+    stack: List[Tuple[str, int, int]] = []
+    for lineno, line in enumerate(code.split("\n")):
+        for column, c in enumerate(line):
+            if c in "([{":
+                stack.append((c, lineno, column))
+            elif c in _pairs:
+                if len(stack) == 0 or stack[-1][0] != _pairs[c]:
+                    errors.append(f"<stdin>:{lineno + 1}:{column + 1}: "
+                                  f"error: extraneous '{c}'")
+                else:
+                    stack.pop()
+    for c, lineno, column in stack:
+        errors.append(f"<stdin>:{lineno + 1}:{column + 1}: "
+                      f"error: unmatched '{c}'")
+    lines = code.rstrip().split("\n")
+    if len(stack) == 0 and lines[-1] != "" and \
+            not lines[-1].endswith((";", "}")):
+        errors.append(f"<stdin>:{len(lines)}:{len(lines[-1]) + 1}: "
+                      "error: expected ';' after top level declarator")
+    if len(errors) != 0:
+        errors.append(f"{len(errors)} error{'s' if len(errors) > 1 else ''} "
+                      "generated.")
+    return "\n".join(errors)
+
+
+def parse_diagnostics(stderr: str) -> List[str]:
+    errors = []
+    text = ""
+    for line in stderr.split("\n"):
+        if re.match(r'<stdin>:\d+:\d+:\s+error:', line):
+            # error
+            if text != "":
+                errors.append(text)
+            text = line
+        elif re.match(r'<stdin>:\d+:\d+:\s+warning:', line):
+            # warning
+            if text != "":
+                errors.append(text)
+            text = line
+        elif re.match(r'\d+ \w+ generated.', line):
+            # summary of the result
+            continue
+        elif re.match(r'\s*', line):
+            continue
+        else:
+            text = text + "\n" + line
+    if text != "":
+        errors.append(text)
+    return errors
+
 
 class Analyzer(BaseAnalyzer[str, str]):
-    def __init__(self, clang_cmd: str = "clang"):
+    """
+    Return the errors and warnings of the C code.
+
+    The codes are compiled concurrently by at most `n_worker` compilers.
+    The results are memoized by the content hash in memory and, if
+    `cache_dir` is specified, in the files of the directory, so the cache is
+    shared between the processes and reused across runs.
+    """
+
+    def __init__(self, clang_cmd: str = "clang",
+                 n_worker: int = 1,
+                 cache_dir: Optional[str] = None,
+                 cache_size: int = 10000,
+                 compiler: Optional[Callable[[str], str]] = None):
+        """
+        Parameters
+        ----------
+        clang_cmd: str
+        n_worker: int
+            The maximum number of the concurrent compilations
+        cache_dir: Optional[str]
+            The directory of the persistent cache. If None, the results are
+            cached only in memory.
+        cache_size: int
+            The number of the results cached in memory
+        compiler: Optional[Callable[[str], str]]
+            The function that returns the diagnostics of the code. If None,
+            clang_cmd is used (see Clang). `local_compiler` can be used as
+            the stand-in of clang. If the compiler has `cache_key`, it is
+            used as the namespace of the cache.
+        """
         self.clang_cmd = clang_cmd
+        self.n_worker = n_worker
+        self.cache_dir = cache_dir
+        self.cache_size = cache_size
+        self.compiler = compiler or Clang(clang_cmd)
+        self._cache_namespace: Optional[str] = None
+        self._init()
+
+    def _init(self) -> None:
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The lock and threads are not picklable. The in-memory cache is not
+        # sent to the workers (the persistent cache is shared instead).
+        state = self.__dict__.copy()
+        for key in ["_lock", "_cache", "_executor"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._init()
+
+    def close(self) -> None:
+        """
+        Shut down the worker threads. The analyzer can still be used after
+        closing; the threads are started again when needed.
+        """
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def __enter__(self) -> "Analyzer":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        # _init may not be called if __init__ fails
+        if hasattr(self, "_lock"):
+            self.close()
 
     def __call__(self, code: str) -> List[str]:
-        with tempfile.TemporaryDirectory() as tmpdir:
-            path = os.path.join(tmpdir, "x.o")
-            proc = subprocess.Popen(
-                [self.clang_cmd, "-x", "c", "-c", "-", "-o", path],
-                stdin=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True)
-            cast(IO[str], proc.stdin).write(code)
-            _, stderr = proc.communicate()
-        errors = []
-        text = ""
-        for line in stderr.split("\n"):
-            if re.match(r'<stdin>:\d+:\d+:\s+error:', line):
-                # error
-                if text != "":
-                    errors.append(text)
-                text = line
-            elif re.match(r'<stdin>:\d+:\d+:\s+warning:', line):
-                # warning
-                if text != "":
-                    errors.append(text)
-                text = line
-            elif re.match(r'\d+ \w+ generated.', line):
-                # summary of the result
-                continue
-            elif re.match(r'\s*', line):
+        return self.batch([code])[0]
+
+    def batch(self, codes: List[str]) -> List[List[str]]:
+        keys = [self._key(code) for code in codes]
+        results: Dict[str, List[str]] = {}
+        misses: Dict[str, str] = {}
+        for key, code in zip(keys, codes):
+            if key in results or key in misses:
                 continue
+            errors = self._load(key)
+            if errors is None:
+                misses[key] = code
             else:
-                text = text + "\n" + line
-        if text != "":
-            errors.append(text)
+                results[key] = errors
+
+        if len(misses) != 0:
+            with logger.block("compile"):
+                if self.n_worker <= 1 or len(misses) == 1:
+                    outputs = [self.compiler(code) for code in misses.values()]
+                else:
+                    outputs = list(self._get_executor().map(self.compiler,
+                                                            misses.values()))
+            for key, output in zip(misses.keys(), outputs):
+                errors = parse_diagnostics(output)
+                self._store(key, errors)
+                results[key] = errors
+        return [list(results[key]) for key in keys]
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # The threads only wait for the compiler processes
+                self._executor = ThreadPoolExecutor(self.n_worker)
+            return self._executor
+
+    def _key(self, code: str) -> str:
+        if self._cache_namespace is None:
+            # The compilers without cache_key (e.g., local_compiler) are
+            # identified by their names
+            compiler = self.compiler
+            self._cache_namespace = getattr(
+                compiler, "cache_key",
+                f"{getattr(compiler, '__module__', '')}."
+                f"{getattr(compiler, '__qualname__', type(compiler).__name__)}")
+        return hashlib.sha256(
+            f"{self._cache_namespace}\0{code}".encode()).hexdigest()
 
+    def _path(self, key: str) -> str:
+        assert self.cache_dir is not None
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[List[str]]:
+        with self._lock:
+            errors = self._cache.get(key)
+            if errors is not None:
+                self._cache.move_to_end(key)
+                return errors
+        if self.cache_dir is None:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as file:
+                errors = json.load(file)
+        except (OSError, ValueError):
+            logger.warning(f"Invalid cache file: {path}")
+            return None
+        self._store_in_memory(key, errors)
         return errors
+
+    def _store_in_memory(self, key: str, errors: List[str]) -> None:
+        with self._lock:
+            self._cache[key] = errors
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _store(self, key: str, errors: List[str]) -> None:
+        self._store_in_memory(key, errors)
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename it, so the other processes
+        # never read a partially written file
+        tmpfile = os.path.join(os.path.dirname(path), str(uuid.uuid4()))
+        with open(tmpfile, "w") as file:
+            json.dump(errors, file)
+        os.replace(tmpfile, path)
@@ -0,0 +1,188 @@
+import multiprocessing as mp
+from typing import Generator, List, Optional, Tuple, cast
+
+import numpy as np
+import torch
+from torch.utils import data
+from torch.utils.data import IterableDataset
+from tqdm import tqdm
+
+from mlprogram import distributed, logging
+from mlprogram.builtins import Environment
+from mlprogram.functools import file_cache
+from mlprogram.languages import Lexer, Token
+from mlprogram.languages.c.typo_mutator import TypoMutator
+from mlprogram.languages.linediff import Delta, Diff, Replace
+
+logger = logging.Logger(__name__)
+
+# The mutation is stored as the mutated lines (the pairs of the line number
+# and the mutated text) and the tokens of the mutated code. The mutated code
+# and the diff are restored from the original code.
+Edits = Tuple[Tuple[int, str], ...]
+Mutation = Tuple[Edits, Optional[List[Token]]]
+
+# The tags of the random streams derived from the seed
+_ORDER = 0
+_SHARD = 1
+_PROGRAM = 2
+
+
+def _to_edits(mutated: str, diff: Diff) -> Edits:
+    lines = mutated.split("\n")
+    return tuple((delta.get_line_number(), lines[delta.get_line_number()])
+                 for delta in diff.deltas)
+
+
+def _apply_edits(code: str, edits: Edits) -> Tuple[str, Diff]:
+    if len(edits) == 0:
+        return code, Diff([])
+    lines = code.split("\n")
+    deltas: List[Delta] = []
+    for line, text in edits:
+        deltas.append(Replace(line, lines[line]))
+        lines[line] = text
+    return "\n".join(lines), Diff(deltas)
+
+
+class _Generate:
+    def __init__(self, mutator: TypoMutator, lexer: Optional[Lexer],
+                 n_mutation: int, seed: int):
+        self.mutator = mutator
+        self.lexer = lexer
+        self.n_mutation = n_mutation
+        self.seed = seed
+
+    def __call__(self, elem: Tuple[int, str]) -> List[Mutation]:
+        i, code = elem
+        # Each program has its own random stream, so the mutations do not
+        # depend on the number of the processes
+        rng = np.random.RandomState([self.seed, _PROGRAM, i])
+        mutations: List[Mutation] = []
+        for _ in range(self.n_mutation):
+            mutated, _, diff = self.mutator.mutate(code, rng)
+            tokens = None
+            if self.lexer is not None:
+                tokens = self.lexer.tokenize(mutated)
+            mutations.append((_to_edits(mutated, cast(Diff, diff)), tokens))
+        return mutations
+
+
+class MutationDataset(IterableDataset):
+    """
+    The stream of the programs with synthetic errors (see TypoMutator).
+
+    Each iteration (epoch) visits the programs of the dataset once in a
+    random order. The programs are sharded among the processes and the
+    DataLoader workers, and each shard mutates its programs with its own
+    random stream, so the workers never yield the same samples. The stream is
+    determined by seed, the number of the shards, and the epoch.
+    """
+
+    def __init__(self, dataset: torch.utils.data.Dataset,
+                 mutator: TypoMutator,
+                 lexer: Optional[Lexer] = None,
+                 n_mutation: Optional[int] = None,
+                 cache_path: Optional[str] = None,
+                 n_process: int = 0,
+                 seed: int = 0):
+        """
+        Parameters
+        ----------
+        dataset: torch.utils.data.Dataset
+            The map-style dataset of the correct programs. The program is
+            read from the "code" key.
+        mutator: TypoMutator
+        lexer: Optional[Lexer]
+            The lexer (e.g., mlprogram.datasets.deepfix.Lexer). If specified,
+            each mutated program is tokenized once and the tokens are stored
+            in the "reference" key.
+        n_mutation: Optional[int]
+            The number of the mutations generated for each program in
+            advance. The i-th epoch uses the (i % n_mutation)-th mutations.
+            If None, the programs are mutated on the fly.
+        cache_path: Optional[str]
+            The file that the pre-generated mutations are saved to. The
+            mutations are stored as the mutated lines, not the whole
+            programs.
+        n_process: int
+            The number of the processes generating the mutations in advance
+        seed: int
+            The seed shared by all the processes
+        """
+        self.dataset = dataset
+        self.mutator = mutator
+        self.lexer = lexer
+        self.n_mutation = n_mutation
+        self.seed = seed
+        # The number of the iterators created in this process. Persistent
+        # DataLoader workers keep their copies of the dataset, so this is
+        # the epoch in each worker.
+        self.epoch = 0
+
+        self.mutations: Optional[List[List[Mutation]]] = None
+        if n_mutation is not None:
+            generate = _Generate(mutator, lexer, n_mutation, seed)
+
+            def _generate() -> List[List[Mutation]]:
+                logger.info(
+                    f"Generate {n_mutation} mutations of {len(dataset)} programs")
+                codes = [(i, dataset[i]["code"]) for i in range(len(dataset))]
+                if n_process == 0:
+                    return [generate(elem) for elem in tqdm(codes)]
+                with mp.Pool(processes=n_process) as pool:
+                    chunksize = max(1, len(codes) // (n_process * 16))
+                    return list(tqdm(pool.imap(generate, codes, chunksize),
+                                     total=len(codes)))
+
+            if cache_path is not None:
+                self.mutations = file_cache(cache_path)(_generate)()
+            else:
+                self.mutations = _generate()
+
+    def __len__(self) -> int:
+        # The number of the programs visited by this process in each epoch
+        # (the DataLoader splits them further among its workers)
+        world_size = distributed.size()
+        return (len(self.dataset) + world_size - 1) // world_size
+
+    def __iter__(self) -> Generator[Environment, None, None]:
+        worker_info = data.get_worker_info()
+        if worker_info is None:
+            n_worker, worker_id = 1, 0
+        else:
+            n_worker, worker_id = worker_info.num_workers, worker_info.id
+        n_shard = distributed.size() * n_worker
+        shard = distributed.rank() * n_worker + worker_id
+        epoch = self.epoch
+        self.epoch += 1
+
+        # All the shards share the order and each shard takes every n_shard-th
+        # program of it
+        order = np.random.RandomState([self.seed, _ORDER, epoch]) \
+            .permutation(len(self.dataset))
+        rng = np.random.RandomState([self.seed, _SHARD, epoch, shard])
+        return self._iterate(order[shard::n_shard], epoch, rng)
+
+    def _iterate(self, indexes: np.ndarray, epoch: int,
+                 rng: np.random.RandomState) \
+            -> Generator[Environment, None, None]:
+        for i in indexes:
+            entry = cast(Environment, self.dataset[int(i)].clone())
+            code = entry["code"]
+            if self.mutations is None:
+                mutated, _, diff = self.mutator.mutate(code, rng)
+                tokens = None
+                if self.lexer is not None:
+                    tokens = self.lexer.tokenize(mutated)
+            else:
+                assert self.n_mutation is not None
+                edits, tokens = \
+                    self.mutations[int(i)][epoch % self.n_mutation]
+                mutated, diff = _apply_edits(code, edits)
+            entry["code"] = mutated
+            entry["test_cases"] = [(mutated, code)]
+            entry["ground_truth"] = diff
+            if self.lexer is not None:
+                entry["reference"] = tokens
+            yield entry
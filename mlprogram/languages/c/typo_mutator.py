@@ -10,8 +10,16 @@ class TypoMutator:
         self.max_mutation = max_mutation
         self.rng = np.random.RandomState(seed or 0)
 
-    def mutate(self, code: str) -> Tuple[str, List[Tuple[str, str]], AST]:
-        n_mutation = self.rng.randint(1, self.max_mutation + 1)
+    def mutate(self, code: str,
+               rng: Optional[np.random.RandomState] = None) \
+            -> Tuple[str, List[Tuple[str, str]], AST]:
+        """
+        Return the mutated code, the test case, and the diff that fixes the
+        mutation. The random stream of the mutator is used if rng is None.
+        """
+        if rng is None:
+            rng = self.rng
+        n_mutation = rng.randint(1, self.max_mutation + 1)
 
         # Based on https://bitbucket.org/iiscseal/deepfix/src/master/data_processing/typo_mutator.py  # noqa
         # Duplicate '(', ')', '{', '}', ',', ';'
@@ -43,21 +51,21 @@ class TypoMutator:
         if len(code) == 0:
             return (code, [(code, code)], Diff([]))
         lines = list(code.split("\n"))
-        targets = self.rng.choice(len(lines), size=min(len(lines), n_mutation),
-                                  replace=False)
+        targets = rng.choice(len(lines), size=min(len(lines), n_mutation),
+                             replace=False)
         targets.sort()
         deltas: List[Delta] = []
         for line in targets:
             candidates = get_candidate(lines[line])
             if len(candidates) == 0:
                 continue
-            i = self.rng.choice(len(candidates))
+            i = rng.choice(len(candidates))
             offset, value = candidates[i]
 
             operations = get_operations(value)
             if len(operations) == 0:
                 continue
-            i = self.rng.choice(len(operations))
+            i = rng.choice(len(operations))
             op, value = operations[i]
 
             if op == "Duplicate":
@@ -8,8 +8,14 @@ from mlprogram.languages.csg.ast import (  # noqa
     Translation,
     Union,
 )
+from mlprogram.languages.csg.canvas import Canvas  # noqa
 from mlprogram.languages.csg.dataset import Dataset  # noqa
 from mlprogram.languages.csg.expander import Expander  # noqa
 from mlprogram.languages.csg.functions import IsSubtype, get_samples  # noqa
-from mlprogram.languages.csg.interpreter import Interpreter, Shape, show  # noqa
+from mlprogram.languages.csg.interpreter import (  # noqa
+    CanvasCache,
+    Interpreter,
+    Shape,
+    show,
+)
 from mlprogram.languages.csg.parser import Parser  # noqa
@@ -1,18 +1,34 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 
 class AST:
+    # The ASTs are immutable, so the structural hash is computed only once
+    _hash: Optional[int] = None
+
     def type_name(self) -> str:
         raise NotImplementedError
 
     def __eq__(self, rhs: Any) -> bool:
+        if self is rhs:
+            return True
         if isinstance(rhs, AST):
+            if hash(self) != hash(rhs):
+                return False
             return self.type_name() == rhs.type_name() and \
                 self.state_dict() == rhs.state_dict()
         return False
 
     def __hash__(self) -> int:
-        return hash(self.type_name()) ^ hash(tuple(self.state_dict().items()))
+        if self._hash is None:
+            self._hash = hash(self.type_name()) ^ \
+                hash(tuple(self.state_dict().items()))
+        return self._hash
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The hash depends on the hash seed of the process
+        state = self.__dict__.copy()
+        state.pop("_hash", None)
+        return state
 
     def state_dict(self) -> Dict[str, Any]:
         raise NotImplementedError
@@ -0,0 +1,84 @@
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+# The number of the set bits in each 16-bit word
+_POPCOUNT = np.array([bin(i).count("1") for i in range(1 << 16)],
+                     dtype=np.uint8)
+
+
+class Canvas(object):
+    """
+    The binary canvas that packs 8 pixels into one byte.
+
+    Canvas is immutable and supports the set operations (`&`, `|`, and `-`)
+    and counting the filled pixels (`sum`) without unpacking the pixels.
+    The bits are zero-padded to an even number of bytes, so they are counted
+    per 16-bit word. `numpy.asarray(canvas)` returns the unpacked boolean
+    array.
+    """
+
+    def __init__(self, bits: np.ndarray, shape: Tuple[int, ...]):
+        self.bits = bits
+        self.bits.setflags(write=False)
+        self.shape = tuple(shape)
+
+    @staticmethod
+    def pack(array: np.ndarray) -> "Canvas":
+        array = np.asarray(array, dtype=np.bool)
+        bits = np.packbits(array, axis=None)
+        if len(bits) % 2 == 1:
+            bits = np.append(bits, np.uint8(0))
+        return Canvas(bits, array.shape)
+
+    def unpack(self) -> np.ndarray:
+        pixels = np.unpackbits(self.bits, count=self.size)
+        return pixels.reshape(self.shape).astype(np.bool)
+
+    @property
+    def size(self) -> int:
+        return int(np.prod(self.shape))
+
+    @property
+    def nbytes(self) -> int:
+        return self.bits.nbytes
+
+    def sum(self) -> int:
+        return int(_POPCOUNT[self.bits.view(np.uint16)].sum(dtype=np.int64))
+
+    def _check_shape(self, other: "Canvas") -> None:
+        if self.shape != other.shape:
+            raise ValueError(
+                f"shape mismatch: {self.shape} and {other.shape}")
+
+    def __and__(self, other: "Canvas") -> "Canvas":
+        self._check_shape(other)
+        return Canvas(np.bitwise_and(self.bits, other.bits), self.shape)
+
+    def __or__(self, other: "Canvas") -> "Canvas":
+        self._check_shape(other)
+        return Canvas(np.bitwise_or(self.bits, other.bits), self.shape)
+
+    def __sub__(self, other: "Canvas") -> "Canvas":
+        self._check_shape(other)
+        # The padding bits remain zero because the bits of self are zero
+        return Canvas(np.bitwise_and(self.bits, np.invert(other.bits)),
+                      self.shape)
+
+    def __array__(self, dtype: Optional[Any] = None) -> np.ndarray:
+        array = self.unpack()
+        if dtype is not None:
+            array = array.astype(dtype)
+        return array
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, Canvas):
+            return False
+        return self.shape == other.shape and \
+            np.array_equal(self.bits, other.bits)
+
+    def __hash__(self) -> int:
+        return hash((self.shape, self.bits.tobytes()))
+
+    def __repr__(self) -> str:
+        return f"Canvas(shape={self.shape})"
@@ -38,6 +38,10 @@ class Dataset(IterableDataset):
         self.node_candidates = ["Translation", "Rotation"]
         self.seed = \
             seed if seed is not None else np.random.randint(0, 2 ** 32 - 1)
+        # The number of the iterators created in this process. Persistent
+        # DataLoader workers keep their copies of the dataset, so this is
+        # the epoch in each worker.
+        self.epoch = 0
 
     def sample_ast(self, rng: np.random.RandomState, n_object: int) -> AST:
         objects: Dict[int, AST] = {}
@@ -88,7 +92,11 @@ class Dataset(IterableDataset):
             seed = self.seed
         else:
             seed = (self.seed * (worker_info.id + 1)) % (2 ** 32 - 1)
-        rng = np.random.RandomState(seed)
+        if self.epoch == 0:
+            rng = np.random.RandomState(seed)
+        else:
+            rng = np.random.RandomState([seed, self.epoch])
+        self.epoch += 1
 
         class InternalIterator:
             def __init__(self, parent: Dataset):
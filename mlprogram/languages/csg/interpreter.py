@@ -1,6 +1,8 @@
 import math
+import threading
+from collections import OrderedDict
 from functools import lru_cache
-from typing import Callable, List, cast
+from typing import Any, Callable, Dict, List, Optional, Tuple, cast
 
 import numpy as np
 
@@ -17,12 +19,14 @@ from mlprogram.languages.csg import (
     Translation,
     Union,
 )
+from mlprogram.languages.csg.canvas import Canvas
 from mlprogram.languages.csg.expander import Expander
 
 logger = logging.Logger(__name__)
 
 
 def show(canvas: np.array) -> str:
+    canvas = np.asarray(canvas)
     retval = ""
     for y in range(canvas.shape[0]):
         for x in range(canvas.shape[1]):
@@ -32,47 +36,151 @@ def show(canvas: np.array) -> str:
 
 
 class Shape:
-    def __init__(self, is_filled: Callable[[float, float], bool]):
+    """
+    The shape that is represented by a function from a coordinate to a
+    boolean value. The function should accept both scalars and numpy arrays
+    (of the same shape) as the coordinate, so a whole canvas can be rendered
+    by one call.
+    """
+
+    def __init__(self, is_filled: Callable[[Any, Any], Any]):
         self.is_filled = is_filled
 
-    def __call__(self, x: float, y: float) -> bool:
+    def __call__(self, x: Any, y: Any) -> Any:
         return self.is_filled(x, y)
 
     def render(self, width: int, height: int, resolution: int = 1) -> np.ndarray:
-        canvas = np.zeros((height * resolution, width * resolution),
-                          dtype=np.bool)
-        for y in range(height * resolution):
-            for x in range(width * resolution):
-                x_ = (x - (width * resolution - 1) / 2) / resolution
-                y_ = (y - (height * resolution - 1) / 2) / resolution
-                y_ *= -1
-                if self(x_, y_):
-                    canvas[y, x] = True
+        w = width * resolution
+        h = height * resolution
+        x = (np.arange(w) - (w - 1) / 2) / resolution
+        y = (np.arange(h) - (h - 1) / 2) / resolution
+        y *= -1
+        x, y = np.meshgrid(x, y)
+        try:
+            canvas = np.asarray(self(x, y))
+        except (TypeError, ValueError):
+            # is_filled does not support numpy arrays
+            canvas = None
+        if canvas is not None and canvas.shape == (h, w):
+            return canvas.astype(np.bool)
+
+        canvas = np.zeros((h, w), dtype=np.bool)
+        for i in range(h):
+            for j in range(w):
+                if self(x[i, j], y[i, j]):
+                    canvas[i, j] = True
         return canvas
 
 
+CacheKey = Tuple[AST, int, int, int]
+
+
+class CanvasCache:
+    """
+    The size-bounded cache of rendered canvases.
+
+    The key is the structure of the AST (not the identity of the object), the
+    canvas size, and the resolution, so the canvases can be shared among
+    interpreters, search steps, and metrics. The least recently used
+    canvases are evicted when the total size exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.n_hit = 0
+        self.n_miss = 0
+        self._canvases: OrderedDict[CacheKey, Canvas] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self) -> float:
+        n = self.n_hit + self.n_miss
+        return self.n_hit / n if n != 0 else 0.0
+
+    def get(self, key: CacheKey) -> Optional[Canvas]:
+        with self._lock:
+            canvas = self._canvases.get(key)
+            if canvas is None:
+                self.n_miss += 1
+                return None
+            self.n_hit += 1
+            self._canvases.move_to_end(key)
+            return canvas
+
+    def put(self, key: CacheKey, canvas: Canvas) -> None:
+        with self._lock:
+            if key in self._canvases or canvas.nbytes > self.max_bytes:
+                return
+            self._canvases[key] = canvas
+            self.n_bytes += canvas.nbytes
+            while self.n_bytes > self.max_bytes:
+                _, evicted = self._canvases.popitem(last=False)
+                self.n_bytes -= evicted.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._canvases.clear()
+            self.n_bytes = 0
+            self.n_hit = 0
+            self.n_miss = 0
+
+    def __len__(self) -> int:
+        return len(self._canvases)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The cached canvases and the lock are not sent to other processes
+        return {"max_bytes": self.max_bytes}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["max_bytes"])
+
+
+# The cache shared by the interpreters that do not specify their own cache
+shared_canvas_cache = CanvasCache()
+
+
 class InvalidNodeTypeException(BaseException):
     def __init__(self, type_name: str):
         super().__init__(f"Invalid node type: {type_name}")
 
 
-class Interpreter(BaseInterpreter[AST, None, np.ndarray, str, None]):
+class Interpreter(BaseInterpreter[AST, None, Canvas, str, None]):
     def __init__(self, width: int, height: int, resolution: int,
-                 delete_used_reference: bool):
+                 delete_used_reference: bool,
+                 canvas_cache: Optional[CanvasCache] = None):
         self.width = width
         self.height = height
         self.resolution = resolution
         self.delete_used_reference = delete_used_reference
+        if canvas_cache is None:
+            canvas_cache = shared_canvas_cache
+        self.canvas_cache = canvas_cache
         self._expander = Expander()
 
-    def _render(self, shape: Shape) -> np.ndarray:
-        return shape.render(self.width, self.height, self.resolution)
+    def _render(self, code: AST) -> Canvas:
+        key = (code, self.width, self.height, self.resolution)
+        canvas = self.canvas_cache.get(key)
+        if canvas is not None:
+            return canvas
+
+        if isinstance(code, Union):
+            # Reuse the canvases of the subtrees
+            canvas = self._render(code.a) | self._render(code.b)
+        elif isinstance(code, Difference):
+            canvas = self._render(code.b) - self._render(code.a)
+        else:
+            canvas = Canvas.pack(self._cached_eval(code).render(
+                self.width, self.height, self.resolution))
+        self.canvas_cache.put(key, canvas)
+        return canvas
 
-    def eval(self, code: AST, inputs: List[None]) -> List[np.ndarray]:
-        return [self._render(self._cached_eval(code)) for _ in inputs]
+    def eval(self, code: AST, inputs: List[None]) -> List[Canvas]:
+        canvas = self._render(code)
+        return [canvas for _ in inputs]
 
     def create_state(self, inputs: List[None]) \
-            -> BatchedState[AST, np.ndarray, str, None]:
+            -> BatchedState[AST, Canvas, str, None]:
         return BatchedState(
             type_environment={},
             environment={},
@@ -80,13 +188,13 @@ class Interpreter(BaseInterpreter[AST, None, np.ndarray, str, None]):
             context=inputs,
         )
 
-    def execute(self, code: AST, state: BatchedState[AST, np.ndarray, str, None]) \
-            -> BatchedState[AST, np.ndarray, str, None]:
-        next = cast(BatchedState[AST, np.ndarray, str, None], state.clone())
+    def execute(self, code: AST, state: BatchedState[AST, Canvas, str, None]) \
+            -> BatchedState[AST, Canvas, str, None]:
+        next = cast(BatchedState[AST, Canvas, str, None], state.clone())
         next.history.append(code)
         ref = Reference(len(next.history) - 1)
         next.type_environment[ref] = code.type_name()
-        v = self._render(self._cached_eval(self._expander.unexpand(next.history)))
+        v = self._render(self._expander.unexpand(next.history))
         value = [v for _ in state.context]
         next.environment[ref] = value
 
@@ -125,7 +233,7 @@ class Interpreter(BaseInterpreter[AST, None, np.ndarray, str, None]):
             def rectangle(x, y):
                 x = abs(x)
                 y = abs(y)
-                return x <= code.w / 2 and y <= code.h / 2
+                return np.logical_and(x <= code.w / 2, y <= code.h / 2)
             return Shape(rectangle)
         elif isinstance(code, Translation):
             child = self._cached_eval(code.child)
@@ -137,11 +245,11 @@ class Interpreter(BaseInterpreter[AST, None, np.ndarray, str, None]):
             return Shape(translate)
         elif isinstance(code, Rotation):
             child = self._cached_eval(code.child)
+            theta = math.radians(code.theta_degree)
+            cos = math.cos(-theta)
+            sin = math.sin(-theta)
 
             def rotate(x, y):
-                theta = math.radians(code.theta_degree)
-                cos = math.cos(-theta)
-                sin = math.sin(-theta)
                 x_ = cos * x - sin * y
                 y_ = sin * x + cos * y
                 x, y = x_, y_
@@ -152,13 +260,13 @@ class Interpreter(BaseInterpreter[AST, None, np.ndarray, str, None]):
             b = self._cached_eval(code.b)
 
             def union(x, y):
-                return a(x, y) or b(x, y)
+                return np.logical_or(a(x, y), b(x, y))
             return Shape(union)
         elif isinstance(code, Difference):
             a = self._cached_eval(code.a)
             b = self._cached_eval(code.b)
 
             def difference(x, y):
-                return not a(x, y) and b(x, y)
+                return np.logical_and(np.logical_not(a(x, y)), b(x, y))
             return Shape(difference)
         raise InvalidNodeTypeException(code.type_name())
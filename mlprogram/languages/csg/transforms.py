@@ -4,23 +4,25 @@ import numpy as np
 import torch
 from torch import nn
 
-from mlprogram.languages.csg import AST, Interpreter
+from mlprogram.languages.csg import AST, Canvas, Interpreter
 
 
-def per_canvas(variable: List[np.array]) -> torch.Tensor:
-    return torch.stack([torch.tensor(canvas).unsqueeze(0).float() - 0.5
-                        for canvas in variable], dim=0)
+def per_canvas(variable: List[Canvas]) -> torch.Tensor:
+    # The canvases are unpacked only here (i.e., when they are fed to models)
+    return torch.stack([
+        torch.tensor(np.asarray(canvas)).unsqueeze(0).float() - 0.5
+        for canvas in variable], dim=0)
 
 
 class TransformInputs(nn.Module):
-    def forward(self, test_cases: List[Tuple[None, np.array]]) -> torch.Tensor:
+    def forward(self, test_cases: List[Tuple[None, Canvas]]) -> torch.Tensor:
         outputs = [output for _, output in test_cases]
         out = per_canvas(outputs)
         return out
 
 
 class TransformVariables(nn.Module):
-    def forward(self, variables: List[np.array],
+    def forward(self, variables: List[List[Canvas]],
                 test_case_tensor: torch.Tensor) -> torch.Tensor:
         s = test_case_tensor.shape  # (N, C)
         if len(variables) == 0:
@@ -36,7 +38,7 @@ class AddTestCases(nn.Module):
         super().__init__()
         self.interpreter: Interpreter = interpreter
 
-    def __call__(self, ground_truth: AST) -> List[Tuple[None, np.array]]:
+    def __call__(self, ground_truth: AST) -> List[Tuple[None, Canvas]]:
         return[
             (None, output)
             for output in self.interpreter.eval(ground_truth, [None])]
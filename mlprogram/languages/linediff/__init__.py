@@ -4,6 +4,7 @@ from mlprogram.languages.linediff.ast import Diff  # noqa
 from mlprogram.languages.linediff.ast import Insert  # noqa
 from mlprogram.languages.linediff.ast import Remove  # noqa
 from mlprogram.languages.linediff.ast import Replace  # noqa
+from mlprogram.languages.linediff.buffer import LineBuffer  # noqa
 from mlprogram.languages.linediff.expander import Expander  # noqa
 from mlprogram.languages.linediff.functions import AddTestCases  # noqa
 from mlprogram.languages.linediff.functions import IsSubtype  # noqa
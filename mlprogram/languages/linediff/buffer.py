@@ -0,0 +1,278 @@
+from itertools import chain
+from typing import Any, Iterator, List, Optional, Tuple
+
+# The maximum number of the lines in a chunk. The chunks are copied when
+# they are edited, so small programs are edited as one tuple.
+CHUNK_SIZE = 64
+
+
+class _Node(object):
+    """
+    The node of the rope. Each node has a chunk of the lines and the
+    nodes are balanced as an AVL tree.
+    """
+    __slots__ = ["left", "chunk", "right", "size", "height"]
+
+    def __init__(self, left: Optional["_Node"], chunk: Tuple[str, ...],
+                 right: Optional["_Node"]):
+        self.left = left
+        self.chunk = chunk
+        self.right = right
+        if left is None:
+            size, height = 0, 0
+        else:
+            size, height = left.size, left.height
+        if right is None:
+            r_size, r_height = 0, 0
+        else:
+            r_size, r_height = right.size, right.height
+        self.size = size + len(chunk) + r_size
+        self.height = (height if height > r_height else r_height) + 1
+
+
+def _size(node: Optional[_Node]) -> int:
+    return 0 if node is None else node.size
+
+
+def _height(node: Optional[_Node]) -> int:
+    return 0 if node is None else node.height
+
+
+def _balance(left: Optional[_Node], chunk: Tuple[str, ...],
+             right: Optional[_Node]) -> _Node:
+    # The heights of the subtrees differ by at most 2
+    if _height(left) > _height(right) + 1:
+        assert left is not None
+        if _height(left.left) >= _height(left.right):
+            return _Node(left.left, left.chunk,
+                         _Node(left.right, chunk, right))
+        assert left.right is not None
+        return _Node(_Node(left.left, left.chunk, left.right.left),
+                     left.right.chunk,
+                     _Node(left.right.right, chunk, right))
+    if _height(right) > _height(left) + 1:
+        assert right is not None
+        if _height(right.right) >= _height(right.left):
+            return _Node(_Node(left, chunk, right.left), right.chunk,
+                         right.right)
+        assert right.left is not None
+        return _Node(_Node(left, chunk, right.left.left),
+                     right.left.chunk,
+                     _Node(right.left.right, right.chunk, right.right))
+    return _Node(left, chunk, right)
+
+
+def _build(chunks: List[Tuple[str, ...]], begin: int, end: int) \
+        -> Optional[_Node]:
+    if begin >= end:
+        return None
+    mid = (begin + end) // 2
+    return _Node(_build(chunks, begin, mid), chunks[mid],
+                 _build(chunks, mid + 1, end))
+
+
+def _from_lines(lines: List[str]) -> Optional[_Node]:
+    chunks = [tuple(lines[i:i + CHUNK_SIZE])
+              for i in range(0, len(lines), CHUNK_SIZE)]
+    return _build(chunks, 0, len(chunks))
+
+
+def _get(node: _Node, index: int) -> str:
+    while True:
+        n_left = _size(node.left)
+        if index < n_left:
+            assert node.left is not None
+            node = node.left
+        elif index < n_left + len(node.chunk):
+            return node.chunk[index - n_left]
+        else:
+            assert node.right is not None
+            index -= n_left + len(node.chunk)
+            node = node.right
+
+
+def _prepend(node: Optional[_Node], chunk: Tuple[str, ...]) -> _Node:
+    if node is None:
+        return _Node(None, chunk, None)
+    return _balance(_prepend(node.left, chunk), node.chunk, node.right)
+
+
+def _insert(node: _Node, index: int, line: str) -> _Node:
+    n_left = _size(node.left)
+    if index < n_left:
+        assert node.left is not None
+        return _balance(_insert(node.left, index, line), node.chunk,
+                        node.right)
+    offset = index - n_left
+    if offset <= len(node.chunk):
+        chunk = node.chunk[:offset] + (line,) + node.chunk[offset:]
+        if len(chunk) <= CHUNK_SIZE:
+            return _Node(node.left, chunk, node.right)
+        # Split the chunk
+        mid = len(chunk) // 2
+        return _balance(node.left, chunk[:mid],
+                        _prepend(node.right, chunk[mid:]))
+    assert node.right is not None
+    return _balance(node.left, node.chunk,
+                    _insert(node.right, offset - len(node.chunk), line))
+
+
+def _replace(node: _Node, index: int, line: str) -> _Node:
+    n_left = _size(node.left)
+    if index < n_left:
+        assert node.left is not None
+        return _Node(_replace(node.left, index, line), node.chunk, node.right)
+    offset = index - n_left
+    if offset < len(node.chunk):
+        return _Node(node.left,
+                     node.chunk[:offset] + (line,) + node.chunk[offset + 1:],
+                     node.right)
+    assert node.right is not None
+    return _Node(node.left, node.chunk,
+                 _replace(node.right, offset - len(node.chunk), line))
+
+
+def _remove_first(node: _Node) -> Tuple[Tuple[str, ...], Optional[_Node]]:
+    # Return the first chunk and the tree without it
+    if node.left is None:
+        return node.chunk, node.right
+    chunk, left = _remove_first(node.left)
+    return chunk, _balance(left, node.chunk, node.right)
+
+
+def _join(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if right is None:
+        return left
+    if left is None:
+        return right
+    chunk, right = _remove_first(right)
+    return _balance(left, chunk, right)
+
+
+def _remove(node: _Node, index: int) -> Optional[_Node]:
+    n_left = _size(node.left)
+    if index < n_left:
+        assert node.left is not None
+        return _balance(_remove(node.left, index), node.chunk, node.right)
+    offset = index - n_left
+    if offset < len(node.chunk):
+        chunk = node.chunk[:offset] + node.chunk[offset + 1:]
+        if len(chunk) == 0:
+            return _join(node.left, node.right)
+        return _Node(node.left, chunk, node.right)
+    assert node.right is not None
+    return _balance(node.left, node.chunk,
+                    _remove(node.right, offset - len(node.chunk)))
+
+
+def _chunks(node: Optional[_Node]) -> Iterator[Tuple[str, ...]]:
+    stack: List[_Node] = []
+    while len(stack) != 0 or node is not None:
+        if node is not None:
+            stack.append(node)
+            node = node.left
+        else:
+            node = stack.pop()
+            yield node.chunk
+            node = node.right
+
+
+class LineBuffer(object):
+    """
+    The immutable sequence of the lines of a program.
+
+    The lines are stored in a rope (a balanced tree of the chunks of the
+    lines), so insert, remove, and replace copy only one chunk and
+    O(log n) nodes, and the new buffer shares the other chunks with the
+    original one. The text is materialized (and cached) only when str is
+    called.
+    """
+    __slots__ = ["_root", "_text", "_hash"]
+
+    def __init__(self, root: Optional[_Node] = None):
+        self._root = root
+        self._text: Optional[str] = None
+        self._hash: Optional[int] = None
+
+    @staticmethod
+    def from_text(text: str) -> "LineBuffer":
+        buffer = LineBuffer(_from_lines(text.split("\n")))
+        buffer._text = text
+        return buffer
+
+    def __len__(self) -> int:
+        return _size(self._root)
+
+    def __iter__(self) -> Iterator[str]:
+        return chain.from_iterable(_chunks(self._root))
+
+    def __getitem__(self, index: int) -> str:
+        index = self._normalize(index)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        assert self._root is not None
+        return _get(self._root, index)
+
+    def _normalize(self, index: int) -> int:
+        # Negative indexes count from the end like list
+        return index + len(self) if index < 0 else index
+
+    def insert(self, index: int, line: str) -> "LineBuffer":
+        """
+        Return the buffer in which the line is inserted before index.
+        The index is clipped like list.insert.
+        """
+        index = min(max(self._normalize(index), 0), len(self))
+        if self._root is None:
+            return LineBuffer(_Node(None, (line,), None))
+        return LineBuffer(_insert(self._root, index, line))
+
+    def remove(self, index: int) -> "LineBuffer":
+        index = self._normalize(index)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        assert self._root is not None
+        return LineBuffer(_remove(self._root, index))
+
+    def replace(self, index: int, line: str) -> "LineBuffer":
+        index = self._normalize(index)
+        if not 0 <= index < len(self):
+            raise IndexError("line index out of range")
+        assert self._root is not None
+        return LineBuffer(_replace(self._root, index, line))
+
+    def __str__(self) -> str:
+        if self._text is None:
+            self._text = "\n".join(self)
+        return self._text
+
+    def __repr__(self) -> str:
+        return f"LineBuffer({str(self)!r})"
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            self._hash = hash(tuple(self))
+        return self._hash
+
+    def __eq__(self, rhs: Any) -> bool:
+        if self is rhs:
+            return True
+        if not isinstance(rhs, LineBuffer):
+            return False
+        if self._root is rhs._root:
+            return True
+        if len(self) != len(rhs) or hash(self) != hash(rhs):
+            return False
+        if self._text is not None and rhs._text is not None:
+            return self._text == rhs._text
+        return all(a == b for a, b in zip(self, rhs))
+
+    def __getstate__(self) -> Tuple[str]:
+        # The tree is flattened to the text (the hash depends on the process)
+        return (str(self),)
+
+    def __setstate__(self, state: Tuple[str]) -> None:
+        text = state[0]
+        self._root = _from_lines(text.split("\n"))
+        self._text = text
+        self._hash = None
@@ -58,7 +58,8 @@ class UpdateInput(nn.Module):
         entry = cast(Environment, entry.clone())
         state = entry["interpreter_state"]
         inputs = state.context
-        code = inputs[0]
+        # The program is materialized because the lexer requires the text
+        code = str(inputs[0])
         entry["code"] = code
 
         return entry
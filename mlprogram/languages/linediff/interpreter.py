@@ -1,61 +1,74 @@
 from functools import lru_cache
-from typing import List, Tuple, cast
+from typing import List, Union, cast
 
 from mlprogram import logging
 from mlprogram.languages import BatchedState
 from mlprogram.languages import Interpreter as BaseInterpreter
 from mlprogram.languages.linediff import AST, Delta, Diff, Insert, Remove, Replace
+from mlprogram.languages.linediff.buffer import LineBuffer
 
 logger = logging.Logger(__name__)
 
 
-class Interpreter(BaseInterpreter[AST, str, str, str, str]):
+class Interpreter(BaseInterpreter[AST, str, LineBuffer, str, LineBuffer]):
+    """
+    The interpreter of linediff.
+
+    The programs in the states are LineBuffers, so the deltas are applied
+    without splitting the programs and the states share the unchanged lines.
+    eval returns the texts.
+    """
+
     def eval(self, code: AST, inputs: List[str]) -> List[str]:
-        if isinstance(code, Delta):
-            code = Diff([code])
-        assert isinstance(code, Diff)
-        return self._eval(code, inputs)
+        return [str(output)
+                for output in self._eval(code, self._to_buffers(inputs))]
 
-    def create_state(self, inputs: List[str]) -> BatchedState[AST, str, str, str]:
+    def create_state(self, inputs: List[Union[str, LineBuffer]]) \
+            -> BatchedState[AST, LineBuffer, str, LineBuffer]:
         return BatchedState(
             type_environment={},
             environment={},
             history=[],
-            context=inputs,
+            context=self._to_buffers(inputs),
         )
 
-    def execute(self, code: AST, state: BatchedState[AST, str, str, str]) \
-            -> BatchedState[AST, str, str, str]:
-        inputs = state.context
-        outputs = self.eval(code, inputs)
-        next = cast(BatchedState[AST, str, str, str], state.clone())
+    def execute(self, code: AST,
+                state: BatchedState[AST, LineBuffer, str, LineBuffer]) \
+            -> BatchedState[AST, LineBuffer, str, LineBuffer]:
+        outputs = self._eval(code, self._to_buffers(state.context))
+        next = cast(BatchedState[AST, LineBuffer, str, LineBuffer],
+                    state.clone())
         next.history.append(code)
         next.type_environment[code] = code.get_type_name()
         next.environment = {code: outputs}
         next.context = outputs
         return next
 
-    def _eval(self, diff: Diff, inputs: List[str]) -> List[str]:
-        for delta in diff.deltas:
-            inputs = self._apply(delta, tuple(inputs))
+    def _to_buffers(self, inputs: List[Union[str, LineBuffer]]) \
+            -> List[LineBuffer]:
+        return [input if isinstance(input, LineBuffer)
+                else LineBuffer.from_text(input)
+                for input in inputs]
+
+    def _eval(self, code: AST, inputs: List[LineBuffer]) -> List[LineBuffer]:
+        if isinstance(code, Delta):
+            code = Diff([code])
+        assert isinstance(code, Diff)
+        for delta in code.deltas:
+            inputs = [self._apply(delta, input) for input in inputs]
         return inputs
 
+    # LineBuffer caches its hash, so the cache probes do not join the lines
     @lru_cache(maxsize=1000)
-    def _apply(self, delta: Delta, inputs: Tuple[str]) -> List[str]:
-        line_inputs = [list(input.split("\n")) for input in inputs]
+    def _apply(self, delta: Delta, input: LineBuffer) -> LineBuffer:
         if isinstance(delta, Insert):
-            for line_input in line_inputs:
-                line_input.insert(delta.line_number, delta.value)
+            return input.insert(delta.line_number, delta.value)
         elif isinstance(delta, Remove):
-            for line_input in line_inputs:
-                del line_input[delta.line_number]
+            return input.remove(delta.line_number)
         elif isinstance(delta, Replace):
-            for line_input in line_inputs:
-                if delta.line_number < len(line_input):
-                    line_input[delta.line_number] = delta.value
-                else:
-                    logger.warning(f"Input has only {len(line_input)} lines, "
-                                   f"{delta} cannot be applied")
-        else:
-            raise AssertionError(f"invalid type: {type(delta)}")
-        return ["\n".join(line_input) for line_input in line_inputs]
+            if delta.line_number < len(input):
+                return input.replace(delta.line_number, delta.value)
+            logger.warning(f"Input has only {len(input)} lines, "
+                           f"{delta} cannot be applied")
+            return input
+        raise AssertionError(f"invalid type: {type(delta)}")
@@ -1,25 +1,25 @@
 import re
 from typing import List
 
-from nltk.translate.bleu_score import SmoothingFunction, sentence_bleu
-from torch import nn
+from mlprogram.metrics import Bleu as BaseBleu
 
+_patterns = [
+    (re.compile(r'([^A-Za-z0-9_])'), r' \1 '),
+    (re.compile(r'([a-z])([A-Z])'), r'\1 \2'),
+    (re.compile(r'\s+'), ' '),
+    (re.compile(r'["\']'), '`'),
+]
 
-class Bleu(nn.Module):
-    def forward(self, expected: str, actual: str) -> float:
-        sm = SmoothingFunction()
 
-        def tokenize(code: str) -> List[str]:
-            code = re.sub(r'([^A-Za-z0-9_])', r' \1 ', code)
-            code = re.sub(r'([a-z])([A-Z])', r'\1 \2', code)
-            code = re.sub(r'\s+', ' ', code)
-            code = re.sub(r'["\']', '`', code)
-            tokens = [t for t in code.split(' ') if t]
-            return tokens
+def tokenize(code: str) -> List[str]:
+    for pattern, repl in _patterns:
+        code = pattern.sub(repl, code)
+    return [t for t in code.split(' ') if t]
 
-        ref = [tokenize(expected)]
-        cand = tokenize(actual)
-        return float(sentence_bleu(ref,
-                                   cand,
-                                   weights=[0.25] * min(4, len(ref)),
-                                   smoothing_function=sm.method3))
+
+class Bleu(BaseBleu):
+    def __init__(self, cache_size: int = 10000):
+        # Only 1-gram is used because the weights have been
+        # [0.25] * min(4, the number of the references)
+        super().__init__(tokenize=tokenize, weights=[0.25], smoothing=True,
+                         cache_size=cache_size)
@@ -1,12 +1,11 @@
 import ast as python_ast
 from typing import Callable, List, Optional, cast
 
-import transpyle
-
 from mlprogram.languages import AST
 from mlprogram.languages import Parser as BaseParser
 from mlprogram.languages.python.ast_to_python_ast import to_python_ast
 from mlprogram.languages.python.python_ast_to_ast import to_ast
+from mlprogram.transpyle import transpyle
 
 
 class Parser(BaseParser[str]):
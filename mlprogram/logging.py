@@ -1,15 +1,16 @@
+import itertools
+import json
 import logging
 import sys
+import threading
 import time
-from contextlib import contextmanager
-from typing import Callable, Dict, Iterable, Optional, Tuple
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import torch
 from pytorch_pfn_extras.reporting import report
 from torch.autograd.profiler import record_function
 
-from mlprogram import transpyle  # noqa
-
 
 def set_level(level):
     if sys.version_info[:2] >= (3, 8):
@@ -20,6 +21,251 @@ def set_level(level):
         logging.root.handlers[0].setLevel(level)
 
 
+class ProfileNode(object):
+    """
+    A node of the call tree. The node corresponds to a block of a logger
+    and the path from the root.
+    """
+    __slots__ = ["name", "parent", "children", "durations"]
+
+    def __init__(self, name: str, parent: Optional["ProfileNode"]):
+        self.name = name
+        self.parent = parent
+        self.children: Dict[str, ProfileNode] = {}
+        self.durations: List[float] = []
+
+    def child(self, name: str) -> "ProfileNode":
+        node = self.children.get(name)
+        if node is None:
+            node = ProfileNode(name, self)
+            self.children[name] = node
+        return node
+
+    @property
+    def count(self) -> int:
+        return len(self.durations)
+
+    @property
+    def total_time(self) -> float:
+        if self.parent is None:
+            return sum(child.total_time for child in self.children.values())
+        return sum(self.durations)
+
+    @property
+    def self_time(self) -> float:
+        return self.total_time - \
+            sum(child.total_time for child in self.children.values())
+
+    def percentile(self, q: float) -> float:
+        if len(self.durations) == 0:
+            return 0.0
+        return float(np.percentile(self.durations, q))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "count": self.count,
+            "total_time": self.total_time,
+            "self_time": self.self_time,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "children": [child.to_dict() for child in self.children.values()],
+        }
+
+
+class Profiler(object):
+    """
+    Aggregate the blocks of all loggers into a call tree.
+
+    The tree is kept per thread, so the blocks in the worker threads do not
+    break the nesting of the main thread. The threads are identified by
+    their own sequential ids (not threading.get_ident, which is reused after
+    a thread exits), so the trees of the short-lived threads are not lost.
+    """
+
+    def __init__(self, trace: bool = False):
+        """
+        Parameters
+        ----------
+        trace: bool
+            If True, every block is recorded as an event of Chrome trace.
+        """
+        self.trace = trace
+        self.roots: Dict[int, ProfileNode] = {}
+        # (name, thread id, begin, duration)
+        self.events: List[Tuple[str, int, float, float]] = []
+        self._local = threading.local()
+        self._thread_ids = itertools.count()
+        self._begin = time.perf_counter()
+
+    @property
+    def stack(self) -> List[ProfileNode]:
+        """
+        The nodes of the active blocks in this thread. The first element is
+        the root of the thread.
+        """
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            thread_id = next(self._thread_ids)
+            self._local.thread_id = thread_id
+            root = ProfileNode(f"thread-{thread_id}", None)
+            self.roots[thread_id] = root
+            stack = [root]
+            self._local.stack = stack
+        return stack
+
+    def enter(self, name: str) -> ProfileNode:
+        stack = self.stack
+        node = stack[-1].child(name)
+        stack.append(node)
+        return node
+
+    def exit(self, node: ProfileNode, begin: float, elapsed_time: float) \
+            -> None:
+        node.durations.append(elapsed_time)
+        stack = self.stack
+        if stack[-1] is node:
+            stack.pop()
+        else:
+            # The blocks in the interleaved generators exit out of order
+            for i in range(len(stack) - 1, 0, -1):
+                if stack[i] is node:
+                    del stack[i]
+                    break
+        if self.trace:
+            self.events.append(
+                (node.name, self._local.thread_id, begin, elapsed_time))
+
+    def to_dict(self) -> List[Dict[str, Any]]:
+        return [root.to_dict() for root in self.roots.values()]
+
+    def format(self) -> str:
+        """
+        Return the call tree as a table
+        """
+        lines = [f"{'name':60} {'count':>8} {'total[s]':>10} {'self[s]':>10} "
+                 f"{'p50[ms]':>10} {'p90[ms]':>10} {'p99[ms]':>10}"]
+
+        def visit(node: ProfileNode, depth: int) -> None:
+            name = "  " * depth + node.name
+            lines.append(
+                f"{name:60} {node.count:8} {node.total_time:10.3f} "
+                f"{node.self_time:10.3f} {node.percentile(50) * 1e3:10.3f} "
+                f"{node.percentile(90) * 1e3:10.3f} "
+                f"{node.percentile(99) * 1e3:10.3f}")
+            for child in sorted(node.children.values(),
+                                key=lambda x: -x.total_time):
+                visit(child, depth + 1)
+        for root in self.roots.values():
+            visit(root, 0)
+        return "\n".join(lines)
+
+    def export_chrome_trace(self, path: str) -> None:
+        """
+        Write the events in Chrome trace format. It requires trace=True.
+        """
+        events = [
+            {"name": name, "ph": "X", "pid": 0, "tid": thread_id,
+             "ts": (begin - self._begin) * 1e6, "dur": duration * 1e6}
+            for name, thread_id, begin, duration in self.events
+        ]
+        with open(path, "w") as file:
+            json.dump(events, file)
+
+    def export_flamegraph(self, path: str) -> None:
+        """
+        Write the self time of each call path in microseconds in the
+        collapsed stack format of flamegraph.pl and speedscope.
+        """
+        with open(path, "w") as file:
+            def visit(node: ProfileNode, stack: str) -> None:
+                stack = f"{stack};{node.name}" if stack else node.name
+                self_time = int(node.self_time * 1e6)
+                if self_time > 0:
+                    file.write(f"{stack} {self_time}\n")
+                for child in node.children.values():
+                    visit(child, stack)
+            for root in self.roots.values():
+                visit(root, "")
+
+
+_profiler: Optional[Profiler] = None
+
+
+def enable_profiler(trace: bool = False) -> Profiler:
+    """
+    Start profiling the blocks of all loggers
+    """
+    global _profiler
+    _profiler = Profiler(trace)
+    return _profiler
+
+
+def disable_profiler() -> Optional[Profiler]:
+    """
+    Stop profiling and return the profiler that has the results
+    """
+    global _profiler
+    profiler = _profiler
+    _profiler = None
+    return profiler
+
+
+def get_profiler() -> Optional[Profiler]:
+    return _profiler
+
+
+class _Block(object):
+    __slots__ = ["logger", "tag", "time_tag", "monitor_gpu_utils", "begin",
+                 "debug", "profiler", "node", "record_function"]
+
+    def __init__(self, logger: "Logger", tag: str, time_tag: str,
+                 monitor_gpu_utils: bool):
+        self.logger = logger
+        self.tag = tag
+        self.time_tag = time_tag
+        self.monitor_gpu_utils = monitor_gpu_utils
+
+    def __enter__(self) -> None:
+        logger = self.logger
+        self.debug = logger.logger.isEnabledFor(logging.DEBUG)
+        if self.debug:
+            logger.debug(f"start {self.tag}")
+        self.profiler = _profiler
+        if self.profiler is not None:
+            self.node = self.profiler.enter(f"{logger.name}:{self.time_tag}")
+        # record_function is only needed when torch.autograd.profiler is
+        # running
+        if torch.autograd._profiler_enabled():
+            self.record_function = record_function(f"{logger.name}:{self.tag}")
+            self.record_function.__enter__()
+        else:
+            self.record_function = None
+        if self.monitor_gpu_utils:
+            torch.cuda.synchronize()
+        self.begin = time.perf_counter()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        elapsed_time = time.perf_counter() - self.begin
+        logger = self.logger
+        if self.record_function is not None:
+            self.record_function.__exit__(exc_type, exc_value, traceback)
+        if self.debug:
+            logger.debug(f"finish {self.tag}")
+        log = logger.elapsed_time_log
+        n, t = log.get(self.time_tag, (0, 0.0))
+        log[self.time_tag] = (n + 1, t + elapsed_time)
+        if self.monitor_gpu_utils:
+            torch.cuda.synchronize()
+            gpu_elapsed_time = time.perf_counter() - self.begin
+            log = logger.gpu_elapsed_time_log
+            n, t = log.get(self.time_tag, (0, 0.0))
+            log[self.time_tag] = (n + 1, t + gpu_elapsed_time)
+        if self.profiler is not None:
+            self.profiler.exit(self.node, self.begin, elapsed_time)
+
+
 class Logger(object):
     def __init__(self, name: str):
         self.name = name
@@ -39,34 +285,15 @@ class Logger(object):
         self.elapsed_time_log = {}
         self.gpu_elapsed_time_log = {}
 
-    @contextmanager
     def block(self, tag: str, time_tag: Optional[str] = None,
-              monitor_gpu_utils: bool = False):
-        self.debug(f"start {tag}")
-        time_tag = time_tag or tag
-        if not torch.cuda.is_available():
-            monitor_gpu_utils = False
-        if monitor_gpu_utils:
-            torch.cuda.synchronize()
-        begin = time.time()
-        try:
-            with record_function(f"{self.name}:{tag}"):
-                yield
-        finally:
-            self.debug(f"finish {tag}")
-            if time_tag not in self.elapsed_time_log:
-                self.elapsed_time_log[time_tag] = (0, 0.0)
-            if monitor_gpu_utils and time_tag not in self.gpu_elapsed_time_log:
-                self.gpu_elapsed_time_log[time_tag] = (0, 0.0)
-            elapsed_time = time.time() - begin
-            n, t = self.elapsed_time_log[time_tag]
-            self.elapsed_time_log[time_tag] = (n + 1, t + elapsed_time)
-            if monitor_gpu_utils:
-                torch.cuda.synchronize()
-                gpu_elapsed_time = time.time() - begin
-                n, t = self.gpu_elapsed_time_log[time_tag]
-                self.gpu_elapsed_time_log[time_tag] = \
-                    (n + 1, t + gpu_elapsed_time)
+              monitor_gpu_utils: bool = False) -> _Block:
+        """
+        Return the context manager that measures the elapsed time of the
+        block. The block is also recorded by the profiler if it is enabled
+        (see `enable_profiler`).
+        """
+        return _Block(self, tag, time_tag or tag,
+                      monitor_gpu_utils and torch.cuda.is_available())
 
     def function_block(self, tag: str,
                        monitor_gpu_utils: bool = False) \
@@ -81,8 +308,8 @@ class Logger(object):
     def iterable_block(self, tag: str, iter: Iterable,
                        monitor_gpu_utils: bool = False) -> Iterable:
         def wrapped() -> Iterable:
-            for i, x in enumerate(iter):
-                with self.block(f"{tag}-{i}", tag, monitor_gpu_utils):
+            for x in iter:
+                with self.block(tag, monitor_gpu_utils=monitor_gpu_utils):
                     yield x
         return wrapped()
 
@@ -1,7 +1,188 @@
-from nltk.translate.bleu_score import sentence_bleu
+import math
+import sys
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
 from torch import nn
 
+# The n-gram counts (of 1-gram, 2-gram, ...) and the length of a sequence
+NGrams = Tuple[List[Counter], int]
+
+
+def _is_hashable(value: Any) -> bool:
+    try:
+        hash(value)
+        return True
+    except TypeError:
+        return False
+
+
+def ngrams(tokens: Sequence[Any], max_n: int) -> NGrams:
+    tokens = tuple(tokens)
+    counts = [
+        Counter(tokens[i:i + n] for i in range(len(tokens) - n + 1))
+        for n in range(1, max_n + 1)
+    ]
+    return counts, len(tokens)
+
+
+class Statistics(object):
+    """
+    The sufficient statistics of BLEU: the clipped n-gram matches, the
+    n-grams of the hypotheses, and the lengths of the hypotheses and the
+    references. The statistics of the sentences are summed up to calculate
+    corpus-level BLEU.
+    """
+
+    def __init__(self, max_n: int):
+        self.numerators = [0] * max_n
+        self.denominators = [0] * max_n
+        self.hyp_len = 0
+        self.ref_len = 0
+
+    def add(self, reference: NGrams, hypothesis: NGrams) -> None:
+        ref_counts, ref_len = reference
+        hyp_counts, hyp_len = hypothesis
+        for i, (ref, hyp) in enumerate(zip(ref_counts, hyp_counts)):
+            self.numerators[i] += \
+                sum(min(count, ref[ngram]) for ngram, count in hyp.items())
+            # The denominator is at least 1 (same as NLTK)
+            self.denominators[i] += max(1, sum(hyp.values()))
+        self.hyp_len += hyp_len
+        self.ref_len += ref_len
+
+    def score(self, weights: Sequence[float], smoothing: bool) -> float:
+        """
+        Return BLEU. The result is same as nltk.translate.bleu_score with
+        method0 (smoothing=False) or method3 (smoothing=True).
+        """
+        if self.numerators[0] == 0:
+            return 0.0
+        if self.hyp_len > self.ref_len:
+            bp = 1.0
+        elif self.hyp_len == 0:
+            bp = 0.0
+        else:
+            bp = math.exp(1 - self.ref_len / self.hyp_len)
+
+        ps = []
+        k = 1
+        for numerator, denominator in zip(self.numerators, self.denominators):
+            if numerator != 0:
+                ps.append(numerator / denominator)
+            elif smoothing:
+                # NIST geometric sequence smoothing
+                ps.append(1 / (2 ** k * denominator))
+                k += 1
+            else:
+                ps.append(sys.float_info.min)
+        return bp * math.exp(math.fsum(w * math.log(p)
+                                       for w, p in zip(weights, ps)))
+
 
 class Bleu(nn.Module):
-    def forward(self, expected: str, actual: str) -> float:
-        return float(sentence_bleu([expected], actual))
+    """
+    BLEU of the sentence with one reference.
+
+    The n-grams of the references are counted once and cached (the expected
+    values do not change between evaluations), and all the candidates of a
+    sample can be scored in one call of `batch`. `corpus` returns
+    corpus-level BLEU.
+    """
+
+    def __init__(self, tokenize: Optional[Callable[[Any], Sequence[Any]]] = None,
+                 weights: Sequence[float] = (0.25, 0.25, 0.25, 0.25),
+                 smoothing: bool = False,
+                 cache_size: int = 10000):
+        """
+        Parameters
+        ----------
+        tokenize: Optional[Callable[[Any], Sequence[Any]]]
+            The function that splits the code into the tokens. If None, the
+            code itself is used as the sequence (e.g., the characters of str).
+        weights: Sequence[float]
+            The weights of the n-gram precisions
+        smoothing: bool
+            Whether to use NIST geometric sequence smoothing
+        cache_size: int
+            The number of the references cached
+        """
+        super().__init__()
+        self.tokenize = tokenize
+        self.weights = tuple(weights)
+        self.smoothing = smoothing
+        self.cache_size = cache_size
+        self._init()
+
+    def _init(self) -> None:
+        # The metric is shared by the worker threads of BatchedSynthesizer
+        self._lock = threading.Lock()
+        self._references: "OrderedDict[Any, NGrams]" = OrderedDict()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The lock is not picklable. The cached references are not sent to
+        # other processes.
+        state = self.__dict__.copy()
+        for key in ["_lock", "_references"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        super().__setstate__(state)
+        self._init()
+
+    def _ngrams(self, code: Any) -> NGrams:
+        tokens = self.tokenize(code) if self.tokenize is not None else code
+        return ngrams(tokens, len(self.weights))
+
+    def _reference(self, expected: Any) -> NGrams:
+        if not _is_hashable(expected):
+            return self._ngrams(expected)
+        with self._lock:
+            reference = self._references.get(expected)
+            if reference is not None:
+                self._references.move_to_end(expected)
+                return reference
+        # The n-grams are counted outside the lock
+        reference = self._ngrams(expected)
+        with self._lock:
+            self._references[expected] = reference
+            while len(self._references) > self.cache_size:
+                self._references.popitem(last=False)
+        return reference
+
+    def forward(self, expected: Any, actual: Any) -> float:
+        return self.batch(expected, [actual])[0]
+
+    def batch(self, expected: Any, actual: List[Any]) -> List[float]:
+        """
+        Return BLEU of each candidate
+        """
+        reference = self._reference(expected)
+        scores: Dict[Any, float] = {}
+        retval = []
+        for code in actual:
+            hashable = _is_hashable(code)
+            if hashable and code in scores:
+                retval.append(scores[code])
+                continue
+            stats = Statistics(len(self.weights))
+            stats.add(reference, self._ngrams(code))
+            score = stats.score(self.weights, self.smoothing)
+            if hashable:
+                scores[code] = score
+            retval.append(score)
+        return retval
+
+    def corpus(self, expected: List[Any], actual: List[Optional[Any]]) -> float:
+        """
+        Return corpus-level BLEU. None in actual (i.e., no outputs) is
+        treated as the empty sequence.
+        """
+        stats = Statistics(len(self.weights))
+        for ref, code in zip(expected, actual):
+            hypothesis = self._ngrams(code) if code is not None \
+                else ngrams([], len(self.weights))
+            stats.add(self._reference(ref), hypothesis)
+        return stats.score(self.weights, self.smoothing)
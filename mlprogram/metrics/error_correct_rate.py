@@ -20,10 +20,11 @@ class ErrorCorrectRate(nn.Module, Generic[Code, Error, Diff, Kind, Context]):
 
     def forward(self, test_cases: List[Tuple[Code, Any]], actual: Diff) -> float:
         original = test_cases[0][0]
-        n_orig_error = len(self.analyzer(original))
         fixed = self.interpreter.eval(actual, [original])[0]
-
-        n_error = len(self.analyzer(fixed))
+        # The analyzer can analyze the codes concurrently (and the result of
+        # the original code is usually cached)
+        n_orig_error, n_error = \
+            [len(errors) for errors in self.analyzer.batch([original, fixed])]
 
         if n_orig_error == 0:
             return 1.0 if n_error == 0 else 0.0
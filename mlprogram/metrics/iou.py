@@ -3,11 +3,19 @@ from torch import nn
 
 
 class Iou(nn.Module):
+    """
+    The images are numpy boolean arrays or bit-packed canvases
+    (mlprogram.languages.csg.Canvas). The canvases are compared without
+    unpacking.
+    """
+
     def forward(self, expected: np.array, actual: np.array) -> float:
-        if expected.sum() == 0:
-            iou = float(1.0 - actual.sum() / np.prod(actual.shape))
+        n_expected = float(expected.sum())
+        n_actual = float(actual.sum())
+        if n_expected == 0:
+            iou = 1.0 - n_actual / actual.size
         else:
-            intersection = (expected & actual).astype(np.float).sum()
-            union = (expected | actual).astype(np.float).sum()
-            iou = (intersection / union).item()
+            intersection = float((expected & actual).sum())
+            union = n_expected + n_actual - intersection
+            iou = intersection / union
         return iou
@@ -1,5 +1,5 @@
 from collections import OrderedDict
-from typing import Callable, Generic, Optional, TypeVar, cast
+from typing import Any, Callable, Dict, Generic, List, Optional, TypeVar, cast
 
 from torch import nn
 
@@ -15,6 +15,8 @@ class Metric(nn.Module, Generic[Value]):
                  transform: Optional[Callable[[float], float]] = None):
         super().__init__()
         self.value_key = value_key
+        self.in_keys = in_keys
+        self._f = metric
         self.metric = Sequence(OrderedDict([
             ("metric", Apply(
                 module=Function(metric),
@@ -32,6 +34,48 @@ class Metric(nn.Module, Generic[Value]):
             out = self.transform(out)
         return out
 
+    def _kwargs(self, envs: List[Environment], values: List[Value],
+                batched: bool) -> Dict[str, Any]:
+        kwargs = {}
+        for in_key in self.in_keys:
+            if isinstance(in_key, str):
+                original_key, renamed_key = in_key, in_key
+            else:
+                original_key, renamed_key = in_key
+            if original_key == self.value_key:
+                kwargs[renamed_key] = values
+            elif batched:
+                kwargs[renamed_key] = [env[original_key] for env in envs]
+            else:
+                kwargs[renamed_key] = envs[0][original_key]
+        return kwargs
+
+    def batch(self, env: Environment, values: List[Value]) -> List[float]:
+        """
+        Return the metric of each value. The metric is calculated in one call
+        if the metric has the batch method (e.g., Bleu).
+        """
+        if not hasattr(self._f, "batch"):
+            return [self(cast(Environment, env.clone()), value)
+                    for value in values]
+        outs = self._f.batch(**self._kwargs([env], values, False))
+        if self.transform is not None:
+            outs = [self.transform(out) for out in outs]
+        return outs
+
+    def corpus(self, envs: List[Environment], values: List[Value]) \
+            -> Optional[float]:
+        """
+        Return the corpus-level metric, or None if the metric does not have
+        the corpus method
+        """
+        if not hasattr(self._f, "corpus"):
+            return None
+        out = self._f.corpus(**self._kwargs(envs, values, True))
+        if self.transform is not None:
+            out = self.transform(out)
+        return out
+
 
 def use_environment(metric: Callable, in_keys, value_key: str,
                     transform: Optional[Callable[[float], float]] = None):
@@ -4,6 +4,12 @@ import torch.nn as nn
 from mlprogram.nn.utils.rnn import PaddedSequenceWithMask
 
 
+def _to_float(probs: PaddedSequenceWithMask) -> PaddedSequenceWithMask:
+    if probs.data.dtype in (torch.float16, torch.bfloat16):
+        return PaddedSequenceWithMask(probs.data.float(), probs.mask)
+    return probs
+
+
 class Loss(nn.Module):
     def __init__(self, reduction: str = "mean"):
         super(Loss, self).__init__()
@@ -33,6 +39,12 @@ class Loss(nn.Module):
             the index of the word copied from the reference).
             The padding value should be -1.
         """
+        # The probabilities are upcasted because 1e-7 and the log of the
+        # small probabilities are not representable in half precision
+        rule_probs = _to_float(rule_probs)
+        token_probs = _to_float(token_probs)
+        reference_probs = _to_float(reference_probs)
+
         L_a, B, num_rules = rule_probs.data.shape
         _, _, num_tokens = token_probs.data.shape
         _, _, reference_length = reference_probs.data.shape
@@ -110,6 +122,10 @@ class EntropyLoss(nn.Module):
             The probabilities of reference-token. The shape is
             (L_a, B, reference_length).
         """
+        rule_probs = _to_float(rule_probs)
+        token_probs = _to_float(token_probs)
+        reference_probs = _to_float(reference_probs)
+
         def entropy(p: PaddedSequenceWithMask) -> torch.Tensor:
             log_p = torch.log(
                 torch.where(p.mask[:, :, None], p.data, torch.zeros_like(p.data)) + 1e-7
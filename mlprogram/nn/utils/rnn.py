@@ -17,6 +17,10 @@ class PaddedSequenceWithMask:
     def cuda(self):
         return PaddedSequenceWithMask(self.data.cuda(), self.mask.cuda())
 
+    def pin_memory(self):
+        return PaddedSequenceWithMask(self.data.pin_memory(),
+                                      self.mask.pin_memory())
+
 
 def pad_sequence(sequences: List[torch.FloatTensor],
                  padding_value: float = 0.0) -> PaddedSequenceWithMask:
@@ -36,10 +40,11 @@ def pad_sequence(sequences: List[torch.FloatTensor],
     """
     data = torch.nn.utils.rnn.pad_sequence(sequences,
                                            padding_value=padding_value)
-    L, B = data.shape[:2]
-    mask = torch.zeros(L, B, device=data.device, dtype=torch.bool)
-    for i in range(B):
-        mask[:len(sequences[i]), i] = True
+    L = data.shape[0]
+    lengths = torch.tensor([len(sequence) for sequence in sequences],
+                           device=data.device)
+    mask = torch.arange(L, device=data.device).unsqueeze(1) < \
+        lengths.unsqueeze(0)
     return PaddedSequenceWithMask(data, mask)
 
 
@@ -6,6 +6,7 @@ from typing import (
     Generic,
     List,
     Optional,
+    Sequence,
     Tuple,
     TypeVar,
     Union,
@@ -25,11 +26,12 @@ from mlprogram.actions import (
     GenerateToken,
     NodeConstraint,
     NodeType,
+    PersistentActionSequence,
 )
 from mlprogram.builtins import Environment
 from mlprogram.collections import TopKElement
 from mlprogram.encoders import ActionSequenceEncoder
-from mlprogram.languages import AST, Node, Root, Token
+from mlprogram.languages import AST, Node, Root, Token, intern
 from mlprogram.nn.utils.rnn import PaddedSequenceWithMask
 from mlprogram.samplers.sampler import DuplicatedSamplerState, Sampler, SamplerState
 from mlprogram.utils.data import Collate
@@ -112,6 +114,21 @@ class ActionSequenceSampler(Sampler[Environment, AST, Environment],
                 self.rule_kind_to_idx[kind].append(
                     self.encoder._rule_encoder.encode(rule).item()
                 )
+        self._n_rule = self.encoder._rule_encoder.vocab_size
+        self._n_token = self.encoder._token_encoder.vocab_size
+        self._close_rule_idx = \
+            self.encoder._rule_encoder.encode(CloseVariadicFieldRule()).item()
+        # The type-compatibility masks are precomputed lazily for each head type
+        self._subtype_cache: Dict[Tuple[Union[str, Root], Union[str, Root]],
+                                  bool] = {}
+        self._rule_masks: Dict[NodeType, torch.Tensor] = {}
+        self._token_masks: Dict[Union[str, Root], torch.Tensor] = {}
+        # The function to run `decode` together with the other problems.
+        # (see mlprogram.synthesizers.BatchedSynthesizer)
+        self.batcher: Optional[Callable[
+            [List[Environment]],
+            Tuple[torch.Tensor, torch.Tensor, torch.Tensor, List[Environment]]
+        ]] = None
 
     def _to(self, x: Environment) -> Environment:
         params = list(self.module.parameters())
@@ -129,8 +146,9 @@ class ActionSequenceSampler(Sampler[Environment, AST, Environment],
             state_tensor = self.module.encoder(state_tensor)
         state = self.collate.split(state_tensor)[0]
 
-        # Add initial rule
-        action_sequence = ActionSequence()
+        # Add initial rule. The hypotheses forked from this state share the
+        # prefix of the action sequence, so cloning them does not copy it.
+        action_sequence = PersistentActionSequence()
         action_sequence.eval(ApplyRule(
             ExpandTreeRule(NodeType(None, NodeConstraint.Node, False),
                            [("root",
@@ -144,14 +162,14 @@ class ActionSequenceSampler(Sampler[Environment, AST, Environment],
         if state["action_sequence"].head is None:
             # complete
             ast = cast(Node, state["action_sequence"].generate())
-            return cast(AST, ast.fields[0].value), True
+            # The outputs are used as the keys of the caches and
+            # environments, so they are interned to hash them once
+            return intern(cast(AST, ast.fields[0].value)), True
         return None
 
     @ logger.function_block("batch_infer")
     def batch_infer(self,
                     states: List[SamplerState[Environment]]):
-        N = len(states)
-
         state_list: List[Environment] = []
         for s in logger.iterable_block("transform_state", states):
             tmp = self.transform_action_sequence(s.state)
@@ -161,6 +179,30 @@ class ActionSequenceSampler(Sampler[Environment, AST, Environment],
                 logger.warning(
                     "Invalid action_sequence is in the set of hypothesis" +
                     str(s.state["action_sequence"]))
+        if self.batcher is not None:
+            return self.batcher(state_list)
+        return self.decode(state_list)
+
+    def decode(self, state_list: List[Environment]) \
+            -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor,
+                     List[Environment]]:
+        """
+        Run the decoder with the transformed states
+
+        Parameters
+        ----------
+        state_list: List[Environment]
+            The states that are already transformed by
+            `transform_action_sequence`
+
+        Returns
+        -------
+        rule_pred: torch.Tensor
+        token_pred: torch.Tensor
+        reference_pred: torch.Tensor
+        next_state_list: List[Environment]
+        """
+        N = len(state_list)
         states_tensor = self.collate.collate(state_list)
         states_tensor = self._to(states_tensor)
 
@@ -175,176 +217,277 @@ class ActionSequenceSampler(Sampler[Environment, AST, Environment],
         next_state_list = self.collate.split(next_states)
         return rule_pred, token_pred, reference_pred, next_state_list
 
-    def enumerate_samples_per_state(self,
-                                    rule_pred: torch.Tensor,
-                                    token_pred: torch.Tensor,
-                                    reference_pred: torch.Tensor,
-                                    next_state: Environment,
-                                    state: SamplerState[Environment],
-                                    enumeration: Enumeration,
-                                    k: Optional[int]) \
-            -> Generator[DuplicatedSamplerState[Environment], None, None]:
-        def indices(pred: torch.Tensor):
+    def _is_subtype(self, subtype: Union[str, Root],
+                    basetype: Union[str, Root]) -> bool:
+        key = (subtype, basetype)
+        if key not in self._subtype_cache:
+            self._subtype_cache[key] = self.is_subtype(subtype, basetype)
+        return self._subtype_cache[key]
+
+    def _rule_mask(self, head_field: NodeType) -> torch.Tensor:
+        """
+        Return the boolean mask of the rules that can be applied to head_field
+        """
+        if head_field not in self._rule_masks:
+            mask = torch.ones(self._n_rule, dtype=torch.bool)
+            # 0 is unknown rule
+            mask[0] = False
+            for kind, idxes in self.rule_kind_to_idx.items():
+                if not (kind is not None and
+                        self._is_subtype(kind, head_field.type_name)):
+                    mask[idxes] = False
+            if not head_field.is_variadic:
+                mask[self._close_rule_idx] = False
+            self._rule_masks[head_field] = mask
+        return self._rule_masks[head_field]
+
+    def _token_mask(self, type_name: Union[str, Root]) -> torch.Tensor:
+        """
+        Return the boolean mask of the tokens that can be generated as type_name
+        """
+        if type_name not in self._token_masks:
+            mask = torch.ones(self._n_token, dtype=torch.bool)
             # 0 is unknown token
-            if enumeration == Enumeration.Top:
-                _, indices = torch.sort(pred[1:], descending=True)
-                if k is not None:
-                    indices = indices[:k]
-                for index in indices:
-                    yield index + 1, 1
-            elif enumeration == Enumeration.Random:
-                indices = list(range(1, len(pred)))
-                if k is not None:
-                    indices = indices[:k]
-                for index in indices:
-                    yield index, 1
+            mask[0] = False
+            for kind, idxes in self.token_kind_to_idx.items():
+                if kind is not None and not self._is_subtype(kind, type_name):
+                    mask[idxes] = False
+            self._token_masks[type_name] = mask
+        return self._token_masks[type_name]
+
+    def _reference_mask(self, reference: List[Token],
+                        type_name: Union[str, Root]) -> torch.Tensor:
+        def is_valid(token) -> bool:
+            if isinstance(token, Token):
+                t = token.kind
             else:
+                t = token[0]
+            return t is None or self._is_subtype(t, type_name)
+        return torch.tensor([is_valid(token) for token in reference],
+                            dtype=torch.bool)
+
+    def _rule_probs(self, rule_pred: torch.Tensor,
+                    head_fields: List[NodeType]) -> torch.Tensor:
+        masks = torch.stack([self._rule_mask(field) for field in head_fields])
+        return rule_pred.masked_fill(~masks, 0.0)
+
+    def _token_probs(self, rule_pred: torch.Tensor, token_pred: torch.Tensor,
+                     reference_pred: torch.Tensor,
+                     references: List[List[Token]],
+                     head_fields: List[NodeType]) -> torch.Tensor:
+        """
+        Return the probabilities of the token candidates.
+        The columns are (token vocabulary, references, CloseVariadicField).
+        """
+        T, n_ref = reference_pred.shape
+        # The ids of the predefined token corresponding to each reference,
+        # and the masks of the references.
+        ref_ids = torch.zeros(T, n_ref, dtype=torch.long)
+        ref_masks = torch.zeros(T, n_ref, dtype=torch.bool)
+        lengths = torch.zeros(T, n_ref, dtype=torch.bool)
+        encoded: Dict[int, torch.Tensor] = {}
+        validated: Dict[Tuple[int, Union[str, Root]], torch.Tensor] = {}
+        # hypotheses of the same input share the same reference object
+        for i, (reference, field) in enumerate(zip(references, head_fields)):
+            if len(reference) == 0:
+                continue
+            key = id(reference)
+            if key not in encoded:
+                encoded[key] = torch.tensor([
+                    ids[0] for ids in self.encoder.batch_encode_raw_value(
+                        [x.raw_value for x in reference])])
+            vkey = (key, field.type_name)
+            if vkey not in validated:
+                validated[vkey] = \
+                    self._reference_mask(reference, field.type_name)
+            ref_ids[i, :len(reference)] = encoded[key]
+            ref_masks[i, :len(reference)] = validated[vkey]
+            lengths[i, :len(reference)] = True
+
+        # the score will be merged into predefined token
+        # Add to unknown probability if there is not the corresponding token.
+        reference_pred = reference_pred.masked_fill(~lengths, 0.0)
+        token_pred = token_pred.scatter_add(1, ref_ids, reference_pred)
+        reference_pred = reference_pred.masked_fill(ref_ids != 0, 0.0)
+
+        token_masks = torch.stack([
+            self._token_mask(field.type_name) for field in head_fields])
+        token_pred = token_pred.masked_fill(~token_masks, 0.0)
+        reference_pred = reference_pred.masked_fill(~ref_masks, 0.0)
+        # CloseVariadicFieldRule is a candidate if variadic fields
+        is_variadic = torch.tensor([field.is_variadic for field in head_fields],
+                                   dtype=torch.bool)
+        close_pred = rule_pred[:, self._close_rule_idx].masked_fill(
+            ~is_variadic, 0.0)
+        return torch.cat([token_pred, reference_pred, close_pred.view(-1, 1)],
+                         dim=1)
+
+    def _select(self, probs: torch.Tensor, enumeration: Enumeration,
+                ks: List[Optional[int]],
+                columns: Optional[List[torch.Tensor]] = None) \
+            -> List[List[Tuple[int, int, float]]]:
+        """
+        Select the candidates of all hypotheses
+
+        Parameters
+        ----------
+        probs: torch.Tensor
+            The probabilities of the candidates. The shape is (N, n_candidate).
+            The invalid candidates should be 0.
+        enumeration: Enumeration
+        ks: List[Optional[int]]
+            The number of the candidates to be selected in each hypothesis
+        columns: Optional[List[torch.Tensor]]
+            The candidate indexes used to draw multinomial samples.
+            All indexes except 0 are used if None.
+
+        Returns
+        -------
+        List[List[Tuple[int, int, float]]]
+            The tuples of (the index of the candidate, the number of samples,
+            the log probability) for each hypothesis
+        """
+        N, W = probs.shape
+        retval: List[List[Tuple[int, int, float]]] = [[] for _ in range(N)]
+        if N == 0:
+            return retval
+        if enumeration == Enumeration.Multinomial:
+            with logger.block("normalize_prob"):
+                s = probs[:, 1:].sum(dim=1)
+                normalized = \
+                    (probs / s.view(-1, 1) - self.eps).clamp(min=0.0)
+            rows: List[int] = []
+            cols: List[int] = []
+            ns: List[int] = []
+            for i, (k, total) in enumerate(zip(ks, s.tolist())):
                 assert k is not None
-                with logger.block("normalize_prob"):
-                    s = pred[1:].sum().item()
-                    if s < self.eps:
-                        return
-                    ps = (pred[1:] / s - self.eps).numpy()
-                    npred = [max(0, p) for p in ps]
-                for i, n in enumerate(self.rng.multinomial(k, npred)):
-                    if n == 0:
-                        continue
-                    yield i + 1, n
-
-        with logger.block("enumerate_samples_per_state"):
-            head = state.state["action_sequence"].head
-            assert head is not None
-            head_field = \
-                cast(ExpandTreeRule, cast(
-                    ApplyRule,
-                    state.state["action_sequence"]
-                    .action_sequence[head.action]
-                ).rule).children[head.field][1]
-            if head_field.constraint == NodeConstraint.Token:
-                # Generate token
-                ref_ids = self.encoder.batch_encode_raw_value(
-                    [x.raw_value for x in state.state["reference"]]
-                )
-                tokens = list(self.encoder._token_encoder.vocab) + \
-                    state.state["reference"]
-                # the score will be merged into predefined token
-                for i, ids in enumerate(ref_ids):
-                    for ref_id in ids:
-                        # merge token and reference pred
-                        # Add to unknown probability
-                        # if there is not the corresponding token.
-                        token_pred[ref_id] += reference_pred[i]
-                        if ref_id != 0:
-                            reference_pred[i] = 0.0
-                pred = torch.cat([token_pred, reference_pred], dim=0)
-
-                # CloseVariadicFieldRule is a candidate if variadic fields
-                if head_field.is_variadic:
-                    close_rule_idx = \
-                        self.encoder._rule_encoder.encode(
-                            CloseVariadicFieldRule())
-                    p = rule_pred[close_rule_idx].item()
-                    tokens.append(ApplyRule(CloseVariadicFieldRule()))
-                    pred = torch.cat([pred, torch.tensor([p])], dim=0)
-
+                if total < self.eps:
+                    continue
+                if columns is None:
+                    column = torch.arange(1, W)
+                else:
+                    column = columns[i]
+                counts = self.rng.multinomial(k, normalized[i, column].numpy())
+                for j in np.nonzero(counts)[0]:
+                    rows.append(i)
+                    cols.append(int(column[j]))
+                    ns.append(int(counts[j]))
+            index = (torch.tensor(rows, dtype=torch.long),
+                     torch.tensor(cols, dtype=torch.long))
+        elif enumeration == Enumeration.Top:
+            k = ks[0]
+            if k is None or k >= W:
+                _, indices = torch.sort(probs, dim=1, descending=True)
+            else:
+                _, indices = torch.topk(probs, k, dim=1)
+            ps = probs.gather(1, indices)
+            index = torch.nonzero(ps, as_tuple=True)
+            index = (index[0], indices[index])
+            ns = [1] * len(index[0])
+        else:
+            index = torch.nonzero(probs, as_tuple=True)
+            ns = [1] * len(index[0])
+
+        ps = probs[index]
+        # assign log(eps) to the candidates with very small probability
+        lps = torch.log(ps.double().clamp(min=self.eps))
+        for i, x, n, p, lp in zip(index[0].tolist(), index[1].tolist(), ns,
+                                  ps.tolist(), lps.tolist()):
+            if p == 0.0:
+                continue
+            retval[i].append((x, n, lp))
+        return retval
+
+    def enumerate_samples(self,
+                          rule_pred: torch.Tensor,
+                          token_pred: torch.Tensor,
+                          reference_pred: torch.Tensor,
+                          next_states: Sequence[Environment],
+                          states: List[SamplerState[Environment]],
+                          enumeration: Enumeration,
+                          ks: List[Optional[int]]) \
+            -> Generator[DuplicatedSamplerState[Environment], None, None]:
+        with logger.block("enumerate_samples"):
+            head_fields: List[NodeType] = []
+            for state in states:
+                action_sequence = state.state["action_sequence"]
+                head = action_sequence.head
+                assert head is not None
+                head_fields.append(
+                    cast(ExpandTreeRule, cast(
+                        ApplyRule,
+                        action_sequence.action_sequence[head.action]
+                    ).rule).children[head.field][1])
+            is_token = [field.constraint == NodeConstraint.Token
+                        for field in head_fields]
+            rule_idx = [i for i, t in enumerate(is_token) if not t]
+            token_idx = [i for i, t in enumerate(is_token) if t]
+            references = [state.state["reference"] for state in states]
+            n_rule = rule_pred.shape[1]
+            n_token = token_pred.shape[1]
+            # The columns of token candidates are
+            # (token vocabulary, references, CloseVariadicField)
+            close_idx = n_token + reference_pred.shape[1]
+            probs = torch.zeros(len(states), max(n_rule, close_idx + 1))
+            if len(rule_idx) != 0:
+                with logger.block("exclude_invalid_rules"):
+                    probs[rule_idx, :n_rule] = self._rule_probs(
+                        rule_pred[rule_idx],
+                        [head_fields[i] for i in rule_idx])
+            if len(token_idx) != 0:
                 with logger.block("exclude_invalid_tokens"):
-                    # token
-                    for kind, idxes in self.token_kind_to_idx.items():
-                        if kind is not None and \
-                                not self.is_subtype(kind,
-                                                    head_field.type_name):
-                            pred[idxes] = 0.0
-                    # reference
-                    for x, (p, token) in enumerate(
-                            zip(pred[len(token_pred):],
-                                tokens[len(token_pred):])):
-                        x += len(token_pred)
-                        if not isinstance(token, ApplyRule):
-                            if isinstance(token, Token):
-                                t = token.kind
-                            else:
-                                t = token[0]
-                            if t is not None and \
-                                    not self.is_subtype(t,
-                                                        head_field.type_name):
-                                pred[x] = 0.0
-
-                n_action = 0
-                for x, n in logger.iterable_block("sample-tokens",
-                                                  indices(pred)):
-                    # Finish enumeration
-                    if n_action == k:
-                        return
-
-                    p = pred[x].item()
-                    token = tokens[x]
-
-                    if isinstance(token, ApplyRule):
-                        action: Action = token
-                    elif isinstance(token, Token):
-                        action = GenerateToken(token.kind, token.raw_value)
-                    else:
-                        action = GenerateToken(token[0], token[1])
-
-                    if p == 0.0:
+                    probs[token_idx, :close_idx + 1] = self._token_probs(
+                        rule_pred[token_idx], token_pred[token_idx],
+                        reference_pred[token_idx],
+                        [references[i] for i in token_idx],
+                        [head_fields[i] for i in token_idx])
+
+            columns = None
+            if enumeration == Enumeration.Multinomial:
+                # Keep the order of candidates in each hypothesis
+                columns = []
+                for t, reference, field in zip(is_token, references,
+                                               head_fields):
+                    if not t:
+                        columns.append(torch.arange(1, n_rule))
                         continue
-                    elif p < self.eps:
-                        lp = np.log(self.eps)
+                    column = torch.arange(1, n_token + len(reference))
+                    if field.is_variadic:
+                        column = torch.cat([column, torch.tensor([close_idx])])
+                    columns.append(column)
+
+            candidates: List[List[Tuple[Action, int, float]]] = []
+            for t, reference, selected in zip(
+                    is_token, references,
+                    self._select(probs, enumeration, ks, columns)):
+                cs: List[Tuple[Action, int, float]] = []
+                for x, n, lp in selected:
+                    if not t:
+                        action: Action = \
+                            ApplyRule(self.encoder._rule_encoder.vocab[x])
+                    elif x == close_idx:
+                        action = ApplyRule(CloseVariadicFieldRule())
+                    elif x < n_token:
+                        kind, value = self.encoder._token_encoder.vocab[x]
+                        action = GenerateToken(kind, value)
                     else:
-                        lp = np.log(p)
-
-                    n_action += n
-                    next_state = next_state.clone()
+                        token = reference[x - n_token]
+                        if isinstance(token, Token):
+                            action = GenerateToken(token.kind, token.raw_value)
+                        else:
+                            action = GenerateToken(token[0], token[1])
+                    cs.append((action, n, lp))
+                candidates.append(cs)
+
+            for state, next_state, cs in zip(states, next_states, candidates):
+                for action, n, lp in cs:
+                    new_state = next_state.clone()
                     # TODO we may have to clear outputs
-                    next_state["action_sequence"] = \
+                    new_state["action_sequence"] = \
                         LazyActionSequence(
                             state.state["action_sequence"], action)
                     yield DuplicatedSamplerState(
-                        SamplerState(state.score + lp, next_state),
-                        n)
-            else:
-                # Apply rule
-                with logger.block("exclude_invalid_rules"):
-                    # expand tree rule
-                    for kind, idxes in self.rule_kind_to_idx.items():
-                        if not (kind is not None and
-                                self.is_subtype(
-                                    kind,
-                                    head_field.type_name)):
-                            rule_pred[idxes] = 0.0
-                    # CloseVariadicField
-                    idx = self.encoder._rule_encoder.encode(
-                        CloseVariadicFieldRule())
-                    if not(head_field is not None and
-                           head_field.is_variadic):
-                        rule_pred[idx] = 0.0
-
-                n_rule = 0
-                for x, n in logger.iterable_block("sample-rule",
-                                                  indices(rule_pred)):
-                    # Finish enumeration
-                    if n_rule == k:
-                        return
-
-                    p = rule_pred[x].item()
-                    if p == 0.0:
-                        continue
-                    elif p < self.eps:
-                        lp = np.log(self.eps)
-                    else:
-                        lp = np.log(p)
-
-                    n_rule += n
-                    rule = self.encoder._rule_encoder.vocab[x]
-
-                    next_state = next_state.clone()
-                    next_state["action_sequence"] = \
-                        LazyActionSequence(
-                            state.state["action_sequence"],
-                            ApplyRule(rule))
-                    yield DuplicatedSamplerState(
-                        SamplerState(state.score + lp, next_state),
-                        n)
+                        SamplerState(state.score + lp, new_state), n)
 
     def all_samples(
         self, states: List[SamplerState[Environment]], sorted: bool = True) \
@@ -361,34 +504,23 @@ class ActionSequenceSampler(Sampler[Environment, AST, Environment],
             self.module.eval()
             rule_pred, token_pred, reference_pred, next_states = \
                 self.batch_infer(states)
+            samples = self.enumerate_samples(
+                rule_pred, token_pred, reference_pred, next_states, states,
+                enumeration=Enumeration.Random, ks=[None] * len(states))
             if sorted:
-                samples = []
-                for i, state in logger.iterable_block(
-                        "enumerate_samples_per_state", enumerate(states)):
-                    for state in self.enumerate_samples_per_state(
-                            rule_pred[i], token_pred[i], reference_pred[i],
-                            next_states[i], state,
-                            enumeration=Enumeration.Random,
-                            k=None):
-                        samples.append(state)
-
                 with logger.block("sort_among_all_states"):
-                    samples.sort(key=lambda x: -x.state.score)  # type: ignore
-                    for state in samples:
+                    samples_list = list(samples)
+                    samples_list.sort(
+                        key=lambda x: -x.state.score)  # type: ignore
+                    for state in samples_list:
                         state.state.state["action_sequence"] = \
                             state.state.state["action_sequence"]()
                         yield state
             else:
-                for i, state in logger.iterable_block(
-                        "enumerate_samples_per_state", enumerate(states)):
-                    for state in self.enumerate_samples_per_state(
-                            rule_pred[i], token_pred[i], reference_pred[i],
-                            next_states[i], state,
-                            enumeration=Enumeration.Random,
-                            k=None):
-                        state.state.state["action_sequence"] = \
-                            state.state.state["action_sequence"]()
-                        yield state
+                for state in samples:
+                    state.state.state["action_sequence"] = \
+                        state.state.state["action_sequence"]()
+                    yield state
 
     def top_k_samples(
         self, states: List[SamplerState[Environment]], k: int) \
@@ -406,13 +538,14 @@ class ActionSequenceSampler(Sampler[Environment, AST, Environment],
             rule_pred, token_pred, reference_pred, next_states = \
                 self.batch_infer(states)
             topk = TopKElement(k)
-            for i, state in logger.iterable_block("find_top_k_per_state",
-                                                  enumerate(states)):
-                for state in self.enumerate_samples_per_state(
-                        rule_pred[i], token_pred[i], reference_pred[i],
-                        next_states[i], state, enumeration=Enumeration.Top,
-                        k=k):
-                    topk.add(state.state.score, state)
+            with logger.block("find_top_k_per_state"):
+                samples = list(self.enumerate_samples(
+                    rule_pred, token_pred, reference_pred, next_states,
+                    states, enumeration=Enumeration.Top,
+                    ks=[k] * len(states)))
+                topk.add_many(
+                    np.array([sample.state.score for sample in samples]),
+                    samples)
 
             # Instantiate top-k hypothesis
             with logger.block("find_top_k_among_all_states"):
@@ -441,10 +574,9 @@ class ActionSequenceSampler(Sampler[Environment, AST, Environment],
             rule_pred, token_pred, reference_pred, next_states = \
                 self.batch_infer(states)
 
-            for r, t, c, ns, s, k in zip(rule_pred, token_pred, reference_pred,
-                                         next_states, states, ks):
-                for state in self.enumerate_samples_per_state(
-                        r, t, c, ns, s, Enumeration.Multinomial, k=k):
-                    state.state.state["action_sequence"] = \
-                        state.state.state["action_sequence"]()
-                    yield state
+            for state in self.enumerate_samples(
+                    rule_pred, token_pred, reference_pred, next_states, states,
+                    Enumeration.Multinomial, ks=list(ks)):
+                state.state.state["action_sequence"] = \
+                    state.state.state["action_sequence"]()
+                yield state
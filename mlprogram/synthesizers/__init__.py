@@ -1,3 +1,4 @@
+from mlprogram.synthesizers.batched_synthesizer import BatchedSynthesizer  # noqa
 from mlprogram.synthesizers.beam_search import BeamSearch  # noqa
 from mlprogram.synthesizers.dfs import DFS  # noqa
 from mlprogram.synthesizers.filtered_synthesizer import FilteredSynthesizer  # noqa
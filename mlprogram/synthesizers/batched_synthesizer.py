@@ -0,0 +1,322 @@
+import threading
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Generic,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+import numpy as np
+import torch
+
+from mlprogram import logging
+from mlprogram.builtins import Environment
+from mlprogram.samplers import ActionSequenceSampler, Sampler
+from mlprogram.synthesizers.synthesizer import Result, Synthesizer
+
+logger = logging.Logger(__name__)
+
+Input = TypeVar("Input")
+Output = TypeVar("Output")
+Elem = TypeVar("Elem")
+Value = TypeVar("Value")
+
+DecodeResult = Tuple[torch.Tensor, torch.Tensor, torch.Tensor,
+                     List[Environment]]
+
+
+class _Request(object):
+    def __init__(self, state_list: List[Environment]):
+        self.state_list = state_list
+        self.result: Optional[DecodeResult] = None
+        self.error: Optional[BaseException] = None
+
+
+class LockstepDecoder(object):
+    """
+    Merge the decoder calls of the concurrent searches into one batch.
+
+    Each active search blocks in `__call__` until all the other active
+    searches also request decoding (or become inactive). Then the requests
+    are decoded as one batch and the results are routed back to each search.
+    A search should be active (`enter`) only while it runs the search, so the
+    other work of the thread (e.g., calculating metrics) does not block the
+    other searches.
+    """
+
+    def __init__(self,
+                 decode: Callable[[List[Environment]], DecodeResult]):
+        self.decode = decode
+        self._cond = threading.Condition()
+        self._n_active = 0
+        self._requests: List[_Request] = []
+
+    def enter(self) -> None:
+        with self._cond:
+            self._n_active += 1
+
+    def exit(self) -> None:
+        with self._cond:
+            self._n_active -= 1
+            self._flush()
+
+    def __call__(self, state_list: List[Environment]) -> DecodeResult:
+        request = _Request(state_list)
+        with self._cond:
+            self._requests.append(request)
+            self._flush()
+            while request.result is None and request.error is None:
+                self._cond.wait()
+        if request.error is not None:
+            raise request.error
+        assert request.result is not None
+        return request.result
+
+    def _flush(self) -> None:
+        # This method should be called with the lock
+        if len(self._requests) == 0 or len(self._requests) < self._n_active:
+            return
+        requests = self._requests
+        self._requests = []
+
+        state_list: List[Environment] = []
+        for request in requests:
+            state_list.extend(request.state_list)
+        try:
+            with logger.block("decode_lockstep"):
+                logger.debug(f"decode {len(state_list)} states of " +
+                             f"{len(requests)} searches")
+                rule_pred, token_pred, reference_pred, next_states = \
+                    self.decode(state_list)
+        except BaseException as e:  # noqa
+            for request in requests:
+                request.error = e
+            self._cond.notify_all()
+            return
+
+        offset = 0
+        for request in requests:
+            n = len(request.state_list)
+            request.result = (rule_pred[offset:offset + n],
+                              token_pred[offset:offset + n],
+                              reference_pred[offset:offset + n],
+                              next_states[offset:offset + n])
+            offset += n
+        self._cond.notify_all()
+
+
+def _wrapped_objects(sampler: Union[Sampler, Synthesizer]) \
+        -> Generator[Any, None, None]:
+    # Follow the wrapped samplers and synthesizers (e.g., TransformedSampler,
+    # FilteredSampler, SequentialProgramSampler, SMC, FilteredSynthesizer)
+    visited = set()
+    obj: Any = sampler
+    while obj is not None and id(obj) not in visited:
+        visited.add(id(obj))
+        yield obj
+        if hasattr(obj, "sampler"):
+            obj = obj.sampler
+        else:
+            obj = getattr(obj, "synthesizer", None)
+
+
+def _find_action_sequence_sampler(
+        sampler: Union[Sampler, Synthesizer]) \
+        -> Optional[ActionSequenceSampler]:
+    for obj in _wrapped_objects(sampler):
+        if isinstance(obj, ActionSequenceSampler):
+            return obj
+    return None
+
+
+class _ProblemRandomState(object):
+    """
+    The RandomState that delegates to the random stream of the problem
+    solved in the current thread. The streams are derived from the seed and
+    the index of the problem, so the samples do not depend on the thread
+    scheduling.
+    """
+
+    def __init__(self, rng: np.random.RandomState):
+        self.rng = rng
+        self.seed = int(rng.randint(0, 2 ** 31 - 1))
+        self._local = threading.local()
+
+    def set_problem(self, index: int) -> None:
+        self._local.rng = np.random.RandomState([self.seed, index])
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(getattr(self._local, "rng", self.rng), name)
+
+
+class BatchedSynthesizer(Synthesizer[Input, Output], Generic[Input, Output]):
+    """
+    The synthesizer that solves many problems in lockstep.
+
+    `map` runs the wrapped synthesizer for `n_parallel` problems in
+    threads. The decoder calls of all the running searches are merged into
+    one batch, so the decoder runs with large batches even if each search
+    has only a few hypotheses. The beam sizes, step limits and timeouts of
+    the wrapped synthesizer are kept for each problem.
+    Calling this synthesizer with a single input is the same as calling the
+    wrapped synthesizer.
+    """
+
+    def __init__(self, synthesizer: Synthesizer[Input, Output],
+                 sampler: Union[Sampler, Synthesizer],
+                 n_parallel: int):
+        """
+        Parameters
+        ----------
+        synthesizer: Synthesizer[Input, Output]
+        sampler: Union[Sampler, Synthesizer]
+            The sampler used by the synthesizer. The ActionSequenceSampler is
+            searched through the wrapped samplers and synthesizers, so the
+            synthesizer itself can be passed.
+        n_parallel: int
+            The number of the problems solved in lockstep
+        """
+        self.synthesizer = synthesizer
+        self.sampler = _find_action_sequence_sampler(sampler)
+        if self.sampler is None:
+            logger.warning(
+                f"{type(sampler)} does not support batched decoding. " +
+                "The problems are solved in parallel without batching")
+        self.n_parallel = n_parallel
+        self._init()
+
+    def _init(self) -> None:
+        self._decoder: Optional[LockstepDecoder] = None
+        self._local = threading.local()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The decoder and the thread local state are not picklable
+        state = self.__dict__.copy()
+        for key in ["_decoder", "_local"]:
+            del state[key]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._init()
+
+    def _enter(self) -> None:
+        # This thread may request decoding, so the others wait for it
+        if self._decoder is not None and \
+                not getattr(self._local, "active", False):
+            self._local.active = True
+            self._decoder.enter()
+
+    def _exit(self) -> None:
+        if self._decoder is not None and getattr(self._local, "active", False):
+            self._local.active = False
+            self._decoder.exit()
+
+    def _synthesize(self, input: Input, n_required_output: Optional[int] = None) \
+            -> Generator[Result[Output], None, None]:
+        self._enter()
+        try:
+            yield from self.synthesizer(input, n_required_output)
+        finally:
+            # The work after the search (e.g., calculating metrics) does not
+            # block the other searches
+            self._exit()
+
+    def _random_states(self) -> List[Tuple[Any, np.random.RandomState]]:
+        retval: Dict[int, Tuple[Any, np.random.RandomState]] = {}
+        for root in [self.synthesizer, self.sampler]:
+            for obj in _wrapped_objects(root):
+                rng = getattr(obj, "rng", None)
+                if isinstance(rng, np.random.RandomState):
+                    retval[id(obj)] = (obj, rng)
+        return list(retval.values())
+
+    def map(self, f: Callable[[Elem], Value], elems: Iterable[Elem]) \
+            -> List[Value]:
+        """
+        Apply f to each element in lockstep
+
+        Parameters
+        ----------
+        f: Callable[[Elem], Value]
+            The function that calls this synthesizer. The decoder calls are
+            merged only if f calls this synthesizer (not the wrapped one).
+        elems: Iterable[Elem]
+
+        Returns
+        -------
+        List[Value]
+            The return values of f in the same order as elems.
+        """
+        iterator = enumerate(elems)
+        iterator_lock = threading.Lock()
+        results: List[Any] = []
+        errors: List[BaseException] = []
+        random_states = self._random_states()
+        problem_rngs = [_ProblemRandomState(rng) for _, rng in random_states]
+
+        def next_elem() -> Optional[Tuple[int, Elem]]:
+            with iterator_lock:
+                if len(errors) != 0:
+                    return None
+                try:
+                    return next(iterator)
+                except StopIteration:
+                    return None
+
+        def worker() -> None:
+            # The thread has already entered the decoder (see below)
+            self._local.active = self._decoder is not None
+            try:
+                while True:
+                    elem = next_elem()
+                    if elem is None:
+                        return
+                    i, x = elem
+                    for rng in problem_rngs:
+                        rng.set_problem(i)
+                    # The search of this problem is going to start
+                    self._enter()
+                    value = f(x)
+                    with iterator_lock:
+                        while len(results) <= i:
+                            results.append(None)
+                        results[i] = value
+            except BaseException as e:  # noqa
+                with iterator_lock:
+                    errors.append(e)
+            finally:
+                self._exit()
+
+        threads = [threading.Thread(target=worker)
+                   for _ in range(self.n_parallel)]
+        if self.sampler is not None:
+            self._decoder = LockstepDecoder(self.sampler.decode)
+            # Enter before starting the threads, so the first search does not
+            # decode alone
+            for _ in threads:
+                self._decoder.enter()
+            self.sampler.batcher = self._decoder
+        for (obj, _), rng in zip(random_states, problem_rngs):
+            obj.rng = rng
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            for obj, rng in random_states:
+                obj.rng = rng
+            self._decoder = None
+            if self.sampler is not None:
+                self.sampler.batcher = None
+        if len(errors) != 0:
+            raise errors[0]
+        return results
@@ -64,7 +64,14 @@ class AddPreviousActions(nn.Module, Generic[Kind, Value]):
                 reference: List[Token[Kind, Value]],
                 train: bool) -> torch.Tensor:
         # TODO use self.training instead of train argument
-        a = self.action_sequence_encoder.encode_action(action_sequence, reference)
+        start = 0
+        if not train and self.n_dependent is not None:
+            # Only the last n_dependent actions are fed to the decoder, so
+            # the preceding actions do not have to be encoded.
+            start = max(
+                len(action_sequence.action_sequence) - self.n_dependent, 0)
+        a = self.action_sequence_encoder.encode_action(
+            action_sequence, reference, start)
         if a is None:
             raise RuntimeError("cannot encode ActionSequence")
         if train:
@@ -73,8 +80,6 @@ class AddPreviousActions(nn.Module, Generic[Kind, Value]):
             prev_action = a[:-2, 1:]
         else:
             prev_action = a[:-1, 1:]
-            if self.n_dependent is not None:
-                prev_action = prev_action[-self.n_dependent:, :]
 
         return prev_action
 
@@ -91,9 +96,14 @@ class AddActions(nn.Module, Generic[Kind, Value]):
                 action_sequence: ActionSequence,
                 reference: List[Token[Kind, Value]],
                 train: bool) -> torch.Tensor:
+        start = 0
+        if not train and self.n_dependent is not None:
+            start = max(
+                len(action_sequence.action_sequence) + 1 - self.n_dependent,
+                0)
         a = self.action_sequence_encoder.encode_action(
-            action_sequence, reference)
-        p = self.action_sequence_encoder.encode_parent(action_sequence)
+            action_sequence, reference, start)
+        p = self.action_sequence_encoder.encode_parent(action_sequence, start)
         if a is None:
             raise RuntimeError("cannot encode ActionSequence")
         if train:
@@ -103,10 +113,11 @@ class AddActions(nn.Module, Generic[Kind, Value]):
                 [a[1:-1, 0].view(-1, 1), p[1:-1, 1:3].view(-1, 2)],
                 dim=1)
         else:
+            # The first action (the root) has no parent
+            offset = 1 if start == 0 else 0
             action_tensor = torch.cat(
-                [a[1:, 0].view(-1, 1), p[1:, 1:3].view(-1, 2)], dim=1)
-            if self.n_dependent is not None:
-                action_tensor = action_tensor[-self.n_dependent:, :]
+                [a[offset:, 0].view(-1, 1), p[offset:, 1:3].view(-1, 2)],
+                dim=1)
 
         return action_tensor
 
@@ -125,14 +136,15 @@ class AddPreviousActionRules(nn.Module, Generic[Kind, Value]):
                 action_sequence: ActionSequence,
                 reference: List[Token[Kind, Value]],
                 train: bool) -> torch.Tensor:
+        start = 0
+        if not train and self.n_dependent is not None:
+            start = max(
+                len(action_sequence.action_sequence) - self.n_dependent, 0)
         rule_prev_action = \
             self.action_sequence_encoder.encode_each_action(
-                action_sequence, reference, self.max_arity)
+                action_sequence, reference, self.max_arity, start)
         if train:
             rule_prev_action = rule_prev_action[:-1]
-        else:
-            if self.n_dependent is not None:
-                rule_prev_action = rule_prev_action[-self.n_dependent:, :]
 
         return rule_prev_action
 
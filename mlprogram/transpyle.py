@@ -1,6 +1,22 @@
 import logging
 
-import transpyle  # noqa
+# transpyle replaces the handlers of the root logger (a stream handler and a
+# handler logging to a file) when it is imported. It is imported lazily (only
+# by the python language), so the configuration set before is kept.
+_handlers = list(logging.root.handlers)
+_level = logging.root.level
 
-# Disable logging to file
-del logging.root.handlers[1]
+import transpyle  # noqa: E402,F401
+
+if len(_handlers) != 0:
+    logging.root.handlers = _handlers
+    logging.root.setLevel(_level)
+else:
+    # Disable logging to file
+    del logging.root.handlers[1]
+    # transpyle lowers the level of the root logger for its file handler.
+    # Restore the level of the remaining handlers, so that the messages that
+    # are not printed are not created either.
+    logging.root.setLevel(
+        min([handler.level for handler in logging.root.handlers] +
+            [logging.WARNING]))
@@ -7,6 +7,12 @@ from mlprogram.utils.data.functions import (  # noqa
     split_by_n_error,
 )
 from mlprogram.utils.data.random import random_split  # noqa
+from mlprogram.utils.data.sampler import BucketBatchSampler  # noqa
+from mlprogram.utils.data.store import (  # noqa
+    MaterializedDataset,
+    materialize,
+    store_key,
+)
 from mlprogram.utils.data.utils import (  # noqa
     ListDataset,
     to_map_style_dataset,
@@ -3,7 +3,6 @@ from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import torch
-from torch.nn import functional as F
 from tqdm import tqdm
 
 from mlprogram import logging
@@ -106,26 +105,37 @@ class Collate:
                     rnn.pad_sequence(values,
                                      padding_value=option.padding_value)
             else:
-                # pad tensors
-                shape: List[int] = []
-                for item in values:
-                    if len(shape) == 0:
-                        for x in item.shape:
-                            shape.append(x)
-                    else:
-                        for i, x in enumerate(item.shape):
-                            shape[i] = max(shape[i], x)
-                padded_ts = []
-                for item in values:
-                    p = []
-                    for dst, src in zip(shape, item.shape):
-                        p.append(dst - src)
-                        p.append(0)
-                    p.reverse()
-                    padded_ts.append(F.pad(item, p,
-                                           value=option.padding_value))
-
-                retval[key] = torch.stack(padded_ts, dim=option.dim)
+                retval[key] = self._stack(values, option)
+        return retval
+
+    @staticmethod
+    def _stack(values: List[torch.Tensor],
+               option: CollateOptions) -> torch.Tensor:
+        shape = list(values[0].shape)
+        if all([item.shape == values[0].shape for item in values]):
+            return torch.stack(values, dim=option.dim)
+
+        dim = option.dim
+        if dim < 0:
+            dim += len(shape) + 1
+        if all([item.shape[1:] == values[0].shape[1:] for item in values]):
+            # Only the first dimensions differ
+            retval = torch.nn.utils.rnn.pad_sequence(
+                values, batch_first=True, padding_value=option.padding_value)
+            if dim != 0:
+                retval = retval.movedim(0, dim).contiguous()
+            return retval
+
+        # pad tensors
+        for item in values:
+            for i, x in enumerate(item.shape):
+                shape[i] = max(shape[i], x)
+        shape.insert(dim, len(values))
+        # Allocate the output once and copy each item into its slice
+        retval = values[0].new_full(shape, option.padding_value)
+        for i, item in enumerate(values):
+            retval.select(dim, i)[tuple(slice(0, x) for x in item.shape)] = \
+                item
         return retval
 
     def split(self, values: Environment) -> Sequence[Environment]:
@@ -158,6 +168,17 @@ class Collate:
             if key in self.options:
                 option = self.options[key]
                 if option.use_pad_sequence:
+                    lengths = t.mask.sum(dim=0)
+                    prefix = \
+                        torch.arange(t.mask.shape[0],
+                                     device=t.mask.device).unsqueeze(1) < \
+                        lengths.unsqueeze(0)
+                    if torch.equal(prefix, t.mask):
+                        # The valid elements are at the head of each
+                        # sequence, so each sequence is a view of t.data
+                        for b, length in enumerate(lengths.tolist()):
+                            retval[b][key] = t.data[:length, b]
+                        continue
                     for b in range(B):
                         inds = torch.nonzero(t.mask[:, b], as_tuple=False)
                         data = t.data[:, b]
@@ -166,15 +187,7 @@ class Collate:
                         data = data.reshape(-1, *shape)
                         retval[b][key] = data
                 else:
-                    shape = list(t.data.shape)
-                    del shape[option.dim]
-                    data = torch.split(t, 1, dim=option.dim)
-                    for b in range(B):
-                        d = data[b]
-                        if len(shape) == 0:
-                            d = d.reshape(())
-                        else:
-                            d = d.reshape(*shape)
+                    for b, d in enumerate(torch.unbind(t, dim=option.dim)):
                         retval[b][key] = d
             elif isinstance(t, list):
                 for b in range(B):
@@ -203,7 +216,18 @@ def split_by_n_error(dataset: torch.utils.data.Dataset,
     with_error = []
     calc_n_error = _CalcNError(analyzer)
     if n_process == 0:
-        n_errors = [calc_n_error(data) for data in enumerate(tqdm(dataset))]
+        n_errors = []
+        codes = []
+        for i, data in enumerate(tqdm(dataset)):
+            if "n_error" in data:
+                n_errors.append((i, data["n_error"]))
+            else:
+                codes.append((i, data["code"]))
+        # Analyze the codes in one batch, so the analyzer can compile them
+        # concurrently
+        for (i, _), errors in zip(
+                codes, analyzer.batch([code for _, code in codes])):
+            n_errors.append((i, len(errors)))
     else:
         n_errors = []
         with mp.Pool(processes=n_process) as pool:
@@ -0,0 +1,133 @@
+from collections import deque
+from typing import Deque, Iterator, List, Optional, Tuple
+
+import numpy as np
+import torch
+
+from mlprogram import distributed, logging
+
+logger = logging.Logger(__name__)
+
+
+class BucketBatchSampler(torch.utils.data.Sampler):
+    """
+    The batch sampler that groups the entries of similar lengths.
+
+    The entries are sorted by their lengths (the entries of the same lengths
+    are shuffled) and split into batches so that the number of tokens after
+    padding (batch size * the sum of the maximum lengths) does not exceed
+    max_tokens. The order of the batches is shuffled in each epoch. In
+    distributed training, each process takes every world_size-th batch.
+    """
+
+    def __init__(self, dataset: torch.utils.data.Dataset, keys: List[str],
+                 max_tokens: int, shuffle: bool = True, seed: int = 0,
+                 rank: Optional[int] = None,
+                 world_size: Optional[int] = None):
+        """
+        Parameters
+        ----------
+        dataset: torch.utils.data.Dataset
+        keys: List[str]
+            The keys used to compute the lengths. The length of an entry is
+            the tuple of len(entry[key]).
+        max_tokens: int
+            The maximum number of tokens in a batch. An entry longer than
+            max_tokens forms a batch by itself.
+        shuffle: bool
+        seed: int
+        rank: Optional[int]
+            The rank of this process. distributed.rank() is used if None.
+        world_size: Optional[int]
+            The number of processes. distributed.size() is used if None.
+        """
+        self.dataset = dataset
+        self.keys = keys
+        self.max_tokens = max_tokens
+        self.shuffle = shuffle
+        self.seed = seed
+        self.rank = rank if rank is not None else distributed.rank()
+        self.world_size = \
+            world_size if world_size is not None else distributed.size()
+        self.epoch = 0
+        self._lengths: Optional[List[Tuple[int, ...]]] = None
+        self._n_batch: Optional[int] = None
+        self._padding_ratios: Deque[float] = deque()
+
+    @property
+    def lengths(self) -> List[Tuple[int, ...]]:
+        if self._lengths is None:
+            with logger.block("compute_lengths"):
+                self._lengths = [
+                    tuple(len(entry[key]) for key in self.keys)
+                    for entry in (self.dataset[i]
+                                  for i in range(len(self.dataset)))
+                ]
+        return self._lengths
+
+    def _create_batches(self, rng: Optional[np.random.RandomState]) \
+            -> List[List[int]]:
+        lengths = self.lengths
+        order: List[int] = list(range(len(lengths)))
+        if rng is not None:
+            rng.shuffle(order)
+        # The sort is stable, so the entries of the same lengths keep the
+        # shuffled order
+        order.sort(key=lambda i: lengths[i])
+
+        batches: List[List[int]] = []
+        batch: List[int] = []
+        max_lengths: Tuple[int, ...] = ()
+        for i in order:
+            new_max = tuple(max(x, y) for x, y in zip(max_lengths, lengths[i])) \
+                if len(batch) != 0 else lengths[i]
+            if len(batch) != 0 and \
+                    (len(batch) + 1) * sum(new_max) > self.max_tokens:
+                batches.append(batch)
+                batch = []
+                new_max = lengths[i]
+            batch.append(i)
+            max_lengths = new_max
+        if len(batch) != 0:
+            batches.append(batch)
+        return batches
+
+    def padding_ratio(self, batch: List[int]) -> float:
+        """
+        Return the ratio of the padding tokens in the batch
+        """
+        lengths = [self.lengths[i] for i in batch]
+        n_padded = len(batch) * sum(max(xs) for xs in zip(*lengths))
+        if n_padded == 0:
+            return 0.0
+        n_token = sum(sum(x) for x in lengths)
+        return 1.0 - n_token / n_padded
+
+    def pop_padding_ratio(self) -> Optional[float]:
+        """
+        Return the padding ratio of the oldest batch that was sampled but
+        has not been popped. It returns None if there are no such batches.
+        """
+        if len(self._padding_ratios) == 0:
+            return None
+        return self._padding_ratios.popleft()
+
+    def __iter__(self) -> Iterator[List[int]]:
+        rng = np.random.RandomState(self.seed + self.epoch) \
+            if self.shuffle else None
+        self.epoch += 1
+        batches = self._create_batches(rng)
+        if rng is not None:
+            rng.shuffle(batches)
+        # Each process has the same number of batches
+        n = len(batches) // self.world_size * self.world_size
+        self._padding_ratios.clear()
+        for batch in batches[self.rank:n:self.world_size]:
+            self._padding_ratios.append(self.padding_ratio(batch))
+            yield batch
+
+    def __len__(self) -> int:
+        if self._n_batch is None:
+            # The number of batches does not depend on the shuffle
+            self._n_batch = len(self._create_batches(None))
+        return self._n_batch // self.world_size
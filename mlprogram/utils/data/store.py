@@ -0,0 +1,275 @@
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import shutil
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import torch
+
+from mlprogram import distributed, logging
+from mlprogram.builtins import Environment
+
+logger = logging.Logger(__name__)
+
+# The version of the store format. It is a part of the default key, so the
+# stores written in the old format are not reused.
+VERSION = 1
+
+
+def _write_shard(path: str, entries: List[Environment]) -> None:
+    os.makedirs(path)
+    n = len(entries)
+    arrays: Dict[str, List[Optional[np.ndarray]]] = {}
+    objects: List[Tuple[Dict[str, Any], List[str]]] = []
+    for i, entry in enumerate(entries):
+        values = {}
+        for key, value in entry.items():
+            if isinstance(value, torch.Tensor):
+                if key not in arrays:
+                    arrays[key] = [None] * n
+                arrays[key][i] = value.detach().cpu().numpy()
+            else:
+                values[key] = value
+        supervisions = [key for key in entry.keys() if entry.is_supervision(key)]
+        objects.append((values, supervisions))
+
+    columns = []
+    for key, column in arrays.items():
+        dtype = np.result_type(*[x.dtype for x in column if x is not None])
+        ndims = np.array([-1 if x is None else x.ndim for x in column],
+                         dtype=np.int64)
+        shapes = np.zeros((n, max(int(ndims.max()), 0)), dtype=np.int64)
+        offsets = np.zeros((n + 1,), dtype=np.int64)
+        for i, x in enumerate(column):
+            size = 0
+            if x is not None:
+                shapes[i, :x.ndim] = x.shape
+                size = x.size
+            offsets[i + 1] = offsets[i] + size
+        data = np.empty((offsets[-1],), dtype=dtype)
+        for i, x in enumerate(column):
+            if x is not None:
+                data[offsets[i]:offsets[i + 1]] = x.reshape(-1)
+
+        prefix = os.path.join(path, str(len(columns)))
+        np.save(f"{prefix}.data.npy", data)
+        np.save(f"{prefix}.ndims.npy", ndims)
+        np.save(f"{prefix}.shapes.npy", shapes)
+        np.save(f"{prefix}.offsets.npy", offsets)
+        columns.append(key)
+
+    with open(os.path.join(path, "columns.json"), "w") as f:
+        json.dump(columns, f)
+    with open(os.path.join(path, "objects.pkl"), "wb") as f:
+        pickle.dump(objects, f)
+
+
+class _Column:
+    def __init__(self, prefix: str):
+        # mmap_mode="c" maps the file copy-on-write, so the tensors can be
+        # created without copying and the pages are shared among processes
+        self.data = np.load(f"{prefix}.data.npy", mmap_mode="c")
+        self.ndims = np.load(f"{prefix}.ndims.npy")
+        self.shapes = np.load(f"{prefix}.shapes.npy")
+        self.offsets = np.load(f"{prefix}.offsets.npy")
+
+    def __getitem__(self, index: int) -> Optional[torch.Tensor]:
+        ndim = self.ndims[index]
+        if ndim < 0:
+            return None
+        data = self.data[self.offsets[index]:self.offsets[index + 1]]
+        return torch.from_numpy(data.reshape(self.shapes[index, :ndim]))
+
+
+class _Shard:
+    def __init__(self, path: str):
+        with open(os.path.join(path, "columns.json")) as f:
+            keys = json.load(f)
+        self.columns = {key: _Column(os.path.join(path, str(i)))
+                        for i, key in enumerate(keys)}
+        with open(os.path.join(path, "objects.pkl"), "rb") as f:
+            self.objects: List[Tuple[Dict[str, Any], List[str]]] = \
+                pickle.load(f)
+
+    def __getitem__(self, index: int) -> Environment:
+        values, supervisions = self.objects[index]
+        values = dict(values)
+        for key, column in self.columns.items():
+            tensor = column[index]
+            if tensor is not None:
+                values[key] = tensor
+        return Environment(values, set(supervisions))
+
+
+def _digest(value: Any, visiting: Set[int]) -> bytes:
+    # pickle.dumps is not stable among processes because the order of the
+    # elements of a set depends on PYTHONHASHSEED (e.g., the supervisions of
+    # Environment). This function follows the reduce protocol of pickle, but
+    # sorts the elements of sets.
+    h = hashlib.sha256()
+    if value is None or isinstance(value, (bool, int, float, complex, str,
+                                           bytes)):
+        h.update(pickle.dumps(value))
+    elif id(value) in visiting:
+        h.update(b"cycle")
+    elif inspect.ismethod(value):
+        return _digest((value.__self__, value.__func__), visiting)
+    elif isinstance(value, type) or inspect.isroutine(value):
+        # Classes and functions are pickled by their names
+        module = getattr(value, "__module__", None)
+        h.update(f"{module}.{value.__qualname__}".encode())
+    elif isinstance(value, torch.Tensor):
+        return _digest(value.detach().cpu().numpy(), visiting)
+    elif isinstance(value, np.ndarray):
+        h.update(f"ndarray:{value.dtype.str}:{value.shape}:".encode())
+        h.update(np.ascontiguousarray(value).tobytes())
+    else:
+        visiting.add(id(value))
+        if isinstance(value, (set, frozenset)):
+            h.update(f"{type(value).__name__}:".encode())
+            for elem in sorted(_digest(elem, visiting) for elem in value):
+                h.update(elem)
+        elif isinstance(value, (list, tuple)):
+            h.update(f"{type(value).__name__}:{len(value)}:".encode())
+            for elem in value:
+                h.update(_digest(elem, visiting))
+        elif isinstance(value, dict):
+            h.update(f"{type(value).__name__}:{len(value)}:".encode())
+            for k, v in value.items():
+                h.update(_digest(k, visiting))
+                h.update(_digest(v, visiting))
+        else:
+            reduced = value.__reduce_ex__(4)
+            if isinstance(reduced, str):
+                # The global object
+                h.update(f"{type(value).__module__}.{reduced}".encode())
+            else:
+                # The 4th and 5th elements are the iterators of the items
+                reduced = tuple(
+                    list(elem) if i >= 3 and elem is not None else elem
+                    for i, elem in enumerate(reduced))
+                h.update(_digest(reduced, visiting))
+        visiting.remove(id(value))
+    return h.digest()
+
+
+def store_key(dataset: torch.utils.data.Dataset,
+              transform: Callable[[Environment], Optional[Environment]]) \
+        -> str:
+    """
+    Return the default key of the store. The key depends only on the
+    contents of the dataset and transform (and the store format), so it is
+    same in all the processes.
+    """
+    h = hashlib.sha256(f"store-v{VERSION}".encode())
+    h.update(_digest((dataset, transform), set()))
+    return h.hexdigest()
+
+
+class MaterializedDataset(torch.utils.data.Dataset):
+    """
+    The dataset that reads the entries written by `materialize`.
+
+    The tensors are the views of memory-mapped files, so reading an entry
+    does not copy the tensors. The files are opened lazily in each process,
+    so the DataLoader workers share the pages through the page cache.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "metadata.json")) as f:
+            metadata = json.load(f)
+        self.n_entry: int = metadata["n_entry"]
+        self.shard_size: int = metadata["shard_size"]
+        self._shards: Dict[int, _Shard] = {}
+
+    def __len__(self) -> int:
+        return self.n_entry
+
+    def __getitem__(self, index: int) -> Environment:
+        if index < 0:
+            index += self.n_entry
+        if not 0 <= index < self.n_entry:
+            raise IndexError(f"index {index} is out of range")
+        shard_index, index = divmod(index, self.shard_size)
+        if shard_index not in self._shards:
+            self._shards[shard_index] = _Shard(
+                os.path.join(self.path, f"shard_{shard_index}"))
+        return self._shards[shard_index][index]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # The memory-mapped files are reopened in the other processes
+        state = dict(self.__dict__)
+        state["_shards"] = {}
+        return state
+
+
+def materialize(dataset: torch.utils.data.Dataset,
+                transform: Callable[[Environment], Optional[Environment]],
+                path: str,
+                shard_size: int = 10000,
+                key: Optional[str] = None) -> MaterializedDataset:
+    """
+    Apply transform to each entry of the dataset once and store the results
+    in a columnar store. The store is reused if it already exists.
+
+    Parameters
+    ----------
+    dataset: torch.utils.data.Dataset
+        The map-style dataset
+    transform: Callable[[Environment], Optional[Environment]]
+        The transform applied to each entry. The entries that transform
+        returns None are skipped.
+    path: str
+        The directory containing the stores
+    shard_size: int
+        The number of entries in each shard
+    key: Optional[str]
+        The name of the store. `store_key(dataset, transform)` is used if key
+        is None.
+
+    Returns
+    -------
+    MaterializedDataset
+    """
+    if key is None:
+        key = store_key(dataset, transform)
+    # All the processes use the store of the main process
+    key = distributed.all_gather(key)[0]
+    store_path = os.path.join(path, key)
+
+    if distributed.is_main_process() and not os.path.exists(store_path):
+        logger.info(f"Materialize the dataset in {store_path}")
+        os.makedirs(path, exist_ok=True)
+        tmpdir = os.path.join(path, str(uuid.uuid4()))
+        try:
+            n_entry = 0
+            n_shard = 0
+            entries: List[Environment] = []
+            for i in range(len(dataset)):
+                entry = transform(dataset[i])
+                if entry is None:
+                    logger.debug(f"Skip {i}-th entry")
+                    continue
+                entries.append(entry)
+                n_entry += 1
+                if len(entries) == shard_size:
+                    _write_shard(os.path.join(tmpdir, f"shard_{n_shard}"),
+                                 entries)
+                    n_shard += 1
+                    entries = []
+            if len(entries) != 0 or n_shard == 0:
+                _write_shard(os.path.join(tmpdir, f"shard_{n_shard}"), entries)
+            with open(os.path.join(tmpdir, "metadata.json"), "w") as f:
+                json.dump({"n_entry": n_entry, "shard_size": shard_size}, f)
+            os.rename(tmpdir, store_path)
+        finally:
+            if os.path.exists(tmpdir):
+                shutil.rmtree(tmpdir)
+    distributed.call(torch.distributed.barrier)
+    logger.info(f"Materialized dataset found in {store_path}")
+    return MaterializedDataset(store_path)
@@ -64,7 +64,9 @@ def to_map_style_dataset(dataset: torch.utils.data.IterableDataset, n: int) \
 
 def transform(dataset: torch.utils.data.Dataset,
               transform: Callable[[V0], V1]) -> torch.utils.data.Dataset:
-    if hasattr(dataset, "__len__"):
+    # The iterable datasets may have __len__ (e.g., MutationDataset)
+    if hasattr(dataset, "__len__") and \
+            not isinstance(dataset, torch.utils.data.IterableDataset):
         return TransformedDataset(dataset, transform)
     else:
         return TransformedIterableDataset(dataset, transform)
@@ -9,6 +9,7 @@ from mlprogram.actions import (
     InvalidActionException,
     NodeConstraint,
     NodeType,
+    PersistentActionSequence,
 )
 from mlprogram.actions.action_sequence import Parent
 from mlprogram.languages import Field, Leaf, Node, Root
@@ -292,3 +293,78 @@ class TestActionSequence(object):
                     NodeType("str", NodeConstraint.Node, False),
                     [])),
                 ApplyRule(CloseVariadicFieldRule())] == seq.action_sequence
+
+
+class TestPersistentActionSequence(object):
+    def test_eval(self):
+        ast = Node("def", [
+            Field("name", "value", [Leaf("name", "f"), Leaf("name", "0")]),
+            Field("body", "expr", [
+                Node("expr", [Field("op", "value", Leaf("value", "+"))]),
+                Node("pass", [])
+            ])
+        ])
+        expected = ActionSequence.create(ast)
+        action_sequence = PersistentActionSequence()
+        for i, action in enumerate(expected.action_sequence):
+            action_sequence.eval(action)
+            assert action_sequence.parent(i) == expected.parent(i)
+        assert expected.head == action_sequence.head
+        assert expected.action_sequence == action_sequence.action_sequence
+        assert expected.generate() == action_sequence.generate()
+
+    def test_invalid_action(self):
+        action_sequence = PersistentActionSequence()
+        with pytest.raises(InvalidActionException):
+            action_sequence.eval(GenerateToken("kind", ""))
+        action_sequence.eval(ApplyRule(ExpandTreeRule(
+            NodeType("expr", NodeConstraint.Node, False),
+            [("elems", NodeType("value", NodeConstraint.Node, False))])))
+        with pytest.raises(InvalidActionException):
+            action_sequence.eval(ApplyRule(CloseVariadicFieldRule()))
+        with pytest.raises(InvalidActionException):
+            action_sequence.eval(GenerateToken("kind", ""))
+
+    def test_clone(self):
+        action_sequence = PersistentActionSequence()
+        rule = ExpandTreeRule(NodeType("expr", NodeConstraint.Node, False),
+                              [("elems",
+                                NodeType("expr", NodeConstraint.Node, True))])
+        action_sequence.eval(ApplyRule(rule))
+
+        action_sequence2 = action_sequence.clone()
+        assert action_sequence.generate() == action_sequence2.generate()
+
+        action_sequence2.eval(ApplyRule(rule))
+        assert [ApplyRule(rule)] == action_sequence.action_sequence
+        assert Parent(0, 0) == action_sequence.head
+        assert [ApplyRule(rule), ApplyRule(rule)] == \
+            action_sequence2.action_sequence
+        assert Parent(1, 0) == action_sequence2.head
+        assert action_sequence.generate() != action_sequence2.generate()
+
+    def test_long_sequence(self):
+        rule = ExpandTreeRule(NodeType("expr", NodeConstraint.Node, False),
+                              [("elems",
+                                NodeType("expr", NodeConstraint.Node, True))])
+        leaf = ExpandTreeRule(NodeType("expr", NodeConstraint.Node, False), [])
+        action_sequence = PersistentActionSequence()
+        action_sequence.eval(ApplyRule(rule))
+        clones = []
+        for _ in range(2000):
+            clones.append(action_sequence.clone())
+            action_sequence.eval(ApplyRule(leaf))
+        assert 2001 == len(action_sequence.action_sequence)
+        assert 1 == len(clones[0].action_sequence)
+        assert 1001 == len(clones[1000].action_sequence)
+        assert ApplyRule(leaf) == action_sequence.action_sequence[-1]
+        assert Parent(0, 0) == action_sequence.parent(1500)
+
+    def test_create(self):
+        seq = PersistentActionSequence.create(Node("value", [
+            Field("name", "str",
+                  [Leaf("str", "t0"), Leaf("str", "t1")])]))
+        assert isinstance(seq, PersistentActionSequence)
+        assert ActionSequence.create(Node("value", [
+            Field("name", "str",
+                  [Leaf("str", "t0"), Leaf("str", "t1")])])) == seq
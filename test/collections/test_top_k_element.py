@@ -1,3 +1,6 @@
+import numpy as np
+import torch
+
 from mlprogram.collections import TopKElement
 
 
@@ -28,3 +31,24 @@ class TestTopKElement(object):
         topk.add(3.0, "3")
         topk.add(0.0, "0")
         assert ["1", "0"] == callback.elems
+
+    def test_same_score(self):
+        topk = TopKElement(2)
+        topk.add(1.0, "0")
+        topk.add(1.0, "1")
+        topk.add(1.0, "2")
+        assert [(1.0, "2"), (1.0, "1")] == topk.elements
+
+    def test_add_many(self):
+        deleted = []
+        topk = TopKElement(2, deleted.append)
+        topk.add(1.5, "a")
+        topk.add_many(np.array([1.0, 2.0, 3.0, 0.0, 2.0]),
+                      ["0", "1", "2", "3", "4"])
+        assert [(3.0, "2"), (2.0, "4")] == topk.elements
+        assert set(["a", "0", "1", "3"]) == set(deleted)
+
+    def test_add_many_with_tensor(self):
+        topk = TopKElement(2)
+        topk.add_many(torch.tensor([1.0, 3.0, 2.0]), ["0", "1", "2"])
+        assert [(3.0, "1"), (2.0, "2")] == topk.elements
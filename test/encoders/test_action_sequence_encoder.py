@@ -1,3 +1,5 @@
+import pickle
+
 import numpy as np
 import torch
 
@@ -9,6 +11,7 @@ from mlprogram.actions import (
     GenerateToken,
     NodeConstraint,
     NodeType,
+    PersistentActionSequence,
 )
 from mlprogram.encoders import ActionSequenceEncoder, Samples
 from mlprogram.languages import Token
@@ -72,6 +75,136 @@ class TestEncoder(object):
             action.numpy()
         )
 
+    def test_encode_action_with_start(self):
+        funcdef = ExpandTreeRule(
+            NodeType("def", NodeConstraint.Node, False),
+            [("name",
+              NodeType("value", NodeConstraint.Token, True)),
+             ("body",
+              NodeType("expr", NodeConstraint.Node, True))])
+
+        encoder = ActionSequenceEncoder(
+            Samples([funcdef],
+                    [NodeType("def", NodeConstraint.Node, False),
+                     NodeType("value", NodeConstraint.Token, True),
+                     NodeType("expr", NodeConstraint.Node, True)],
+                    [("", "f"), ("", "2")]),
+            0)
+        action_sequence = ActionSequence()
+        action_sequence.eval(ApplyRule(funcdef))
+        action_sequence.eval(GenerateToken("", "f"))
+        action_sequence.eval(GenerateToken("", "1"))
+        action_sequence.eval(GenerateToken("", "2"))
+        action_sequence.eval(ApplyRule(CloseVariadicFieldRule()))
+        reference = [Token("", "1", "1"), Token("", "2", "2")]
+        action = encoder.encode_action(action_sequence, reference)
+        parent = encoder.encode_parent(action_sequence)
+        for start in range(6):
+            assert np.array_equal(
+                action[start:].numpy(),
+                encoder.encode_action(action_sequence, reference,
+                                      start).numpy())
+            assert np.array_equal(
+                parent[start:].numpy(),
+                encoder.encode_parent(action_sequence, start).numpy())
+            assert np.array_equal(
+                encoder.encode_each_action(
+                    action_sequence, reference, 1)[start:].numpy(),
+                encoder.encode_each_action(
+                    action_sequence, reference, 1, start).numpy())
+
+    def test_extend_action(self):
+        funcdef = ExpandTreeRule(
+            NodeType("def", NodeConstraint.Node, False),
+            [("name",
+              NodeType("value", NodeConstraint.Token, True)),
+             ("body",
+              NodeType("expr", NodeConstraint.Node, True))])
+
+        encoder = ActionSequenceEncoder(
+            Samples([funcdef],
+                    [NodeType("def", NodeConstraint.Node, False),
+                     NodeType("value", NodeConstraint.Token, True),
+                     NodeType("expr", NodeConstraint.Node, True)],
+                    [("", "f")]),
+            0)
+        reference = [Token("", "1", "1")]
+        action_sequence = ActionSequence()
+        action = encoder.encode_action(action_sequence, reference)
+        parent = encoder.encode_parent(action_sequence)
+        for a in [ApplyRule(funcdef), GenerateToken("", "f"),
+                  GenerateToken("", "1"),
+                  ApplyRule(CloseVariadicFieldRule())]:
+            action_sequence.eval(a)
+            action = encoder.extend_action(action, action_sequence, reference)
+            parent = encoder.extend_parent(parent, action_sequence)
+            # The unpickled sequence does not have the memoized tensors
+            copied = pickle.loads(pickle.dumps(action_sequence))
+            assert np.array_equal(
+                encoder.encode_action(copied, reference).numpy(),
+                action.numpy())
+            assert np.array_equal(
+                encoder.encode_parent(copied).numpy(),
+                parent.numpy())
+
+    def test_memoize(self):
+        funcdef = ExpandTreeRule(
+            NodeType("def", NodeConstraint.Node, False),
+            [("name",
+              NodeType("value", NodeConstraint.Token, True)),
+             ("body",
+              NodeType("expr", NodeConstraint.Node, True))])
+
+        encoder = ActionSequenceEncoder(
+            Samples([funcdef],
+                    [NodeType("def", NodeConstraint.Node, False),
+                     NodeType("value", NodeConstraint.Token, True),
+                     NodeType("expr", NodeConstraint.Node, True)],
+                    [("", "f")]),
+            0)
+        starts = []
+        encode_action = encoder._encode_action
+
+        def record(action_sequence, reference_index, start, out=None):
+            starts.append(start)
+            return encode_action(action_sequence, reference_index, start, out)
+        encoder._encode_action = record
+
+        reference = [Token("", "1", "1")]
+        for action_sequence in [ActionSequence(), PersistentActionSequence()]:
+            starts.clear()
+            action_sequence.eval(ApplyRule(funcdef))
+            encoder.encode_action(action_sequence, reference)
+            encoder.encode_parent(action_sequence)
+            for a in [GenerateToken("", "f"), GenerateToken("", "1"),
+                      ApplyRule(CloseVariadicFieldRule())]:
+                # The hypotheses of the search are the clones of the prefix
+                action_sequence = action_sequence.clone()
+                action_sequence.eval(a)
+                action = encoder.encode_action(action_sequence, reference)
+                assert action is encoder.encode_action(action_sequence,
+                                                       reference)
+                copied = pickle.loads(pickle.dumps(action_sequence))
+                assert np.array_equal(
+                    encoder.encode_action(copied, reference).numpy(),
+                    action.numpy())
+                assert np.array_equal(
+                    encoder.encode_parent(copied).numpy(),
+                    encoder.encode_parent(action_sequence).numpy())
+            # Only the appended action and the head are encoded in each step
+            assert [0, 1, 0, 2, 0, 3, 0] == starts
+            # The other reference is not mixed up
+            assert encoder.encode_action(action_sequence, []) is None
+
+    def test_pickle(self):
+        encoder = ActionSequenceEncoder(
+            Samples([], [NodeType("def", NodeConstraint.Node, False)],
+                    [("", "f")]),
+            0)
+        encoder = pickle.loads(pickle.dumps(encoder))
+        assert 1 == encoder._encode_token("", "f")
+        assert 0 == encoder._encode_token("", "g")
+
     def test_encode_parent(self):
         funcdef = ExpandTreeRule(
             NodeType("def", NodeConstraint.Node, False),
@@ -9,6 +9,7 @@ from mlprogram import distributed
 from mlprogram.builtins import Environment
 from mlprogram.entrypoint import evaluate
 from mlprogram.entrypoint.evaluate import EvaluateSynthesizer, Result
+from mlprogram.entrypoint.precision import Precision
 from mlprogram.metrics import Accuracy, Bleu, use_environment
 from mlprogram.synthesizers import Result as DecoderResult
 from mlprogram.utils.data import ListDataset
@@ -97,6 +98,65 @@ class TestEvaluateSynthesizer(object):
                       {1: {"accuracy": 0.0}, 3: {"accuracy": 0.0}},
                       True, 0.0) == results.results[2]
 
+    def test_corpus_metrics(self):
+        bleu = use_environment(
+            Bleu(), in_keys=["actual", ["ground_truth", "expected"]],
+            value_key="actual"
+        )
+        dataset = ListDataset([
+            Environment(
+                {"query": f"query{i}", "ground_truth": "c0"},
+                set(["ground_truth"])
+            )
+            for i in range(3)
+        ])
+        results = EvaluateSynthesizer(dataset, synthesize,
+                                      metrics={"bleu": bleu})()
+        # The top-1 candidates are "c0", "c2", and "c2"
+        assert results.corpus_metrics == \
+            {"bleu": Bleu().corpus(["c0"] * 3, ["c0", "c2", "c2"])}
+        m = Bleu()
+        assert results.metrics[3]["bleu"] == pytest.approx(
+            (max(m("c0", x) for x in ["c0", "c1", "c2"]) +
+             max(m("c0", x) for x in ["c2", "c3", "c0"]) +
+             max(m("c0", x) for x in ["c2", "c3", "c5"])) / 3)
+
+    @pytest.mark.skipif(not hasattr(torch, "autocast"),
+                        reason="torch.autocast is not available")
+    def test_precision(self):
+        def synthesize_in_autocast(input):
+            yield DecoderResult(torch.is_autocast_cpu_enabled(), 0, True, 1)
+
+        dataset = ListDataset([Environment({"query": "query"})])
+        evaluate = EvaluateSynthesizer(
+            dataset, synthesize_in_autocast, {}, top_n=[1],
+            precision=Precision("bf16", torch.device("cpu")))
+        results = evaluate()
+        assert [True] == results.results[0].candidates
+
+    def test_process_pool(self):
+        accuracy = use_environment(
+            Accuracy(), in_keys=["actual", ["ground_truth", "expected"]],
+            value_key="actual"
+        )
+        dataset = ListDataset([
+            Environment(
+                {"query": f"query{i}", "ground_truth": "c0"},
+                set(["ground_truth"])
+            )
+            for i in range(5)
+        ])
+        results = EvaluateSynthesizer(dataset, synthesize,
+                                      metrics={"accuracy": accuracy},
+                                      n_process=2)()
+
+        assert results.metrics == \
+            {1: {"accuracy": 1.0 / 5.0}, 3: {"accuracy": 2.0 / 5.0}}
+        assert 5 == len(results.results)
+        assert [f"query{i}" for i in range(5)] == \
+            [result.sample["query"] for result in results.results]
+        assert ["c2", "c3", "c0"] == results.results[1].candidates
+
     def _run(self, init_dir, dataset, metrics, rank):
         distributed.initialize(init_dir, rank, 2)
         return EvaluateSynthesizer(dataset, synthesize,
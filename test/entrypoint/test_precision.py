@@ -0,0 +1,56 @@
+import pytest
+import torch
+from torch import nn
+
+from mlprogram.entrypoint.precision import Precision
+
+requires_autocast = pytest.mark.skipif(
+    not hasattr(torch, "autocast"), reason="torch.autocast is not available")
+
+
+class TestPrecision(object):
+    def test_fp32(self):
+        precision = Precision("fp32", torch.device("cpu"))
+        assert not precision.enabled
+        with precision.autocast():
+            out = torch.mm(torch.rand(2, 2), torch.rand(2, 2))
+        assert torch.float32 == out.dtype
+
+    @requires_autocast
+    def test_bf16(self):
+        precision = Precision("bf16", torch.device("cpu"))
+        assert precision.enabled
+        assert precision.scaler is None
+        with precision.autocast():
+            out = torch.mm(torch.rand(2, 2), torch.rand(2, 2))
+        assert torch.bfloat16 == out.dtype
+
+    @requires_autocast
+    def test_fp16_on_cpu(self):
+        precision = Precision("fp16", torch.device("cpu"))
+        assert "bf16" == precision.name
+        assert torch.bfloat16 == precision.dtype
+
+    def test_invalid_name(self):
+        with pytest.raises(ValueError):
+            Precision("fp64", torch.device("cpu"))
+
+    def test_bf16_without_autocast(self, monkeypatch):
+        monkeypatch.delattr(torch, "autocast", raising=False)
+        with pytest.raises(ValueError):
+            Precision("bf16", torch.device("cpu"))
+        with pytest.raises(ValueError):
+            Precision("fp16", torch.device("cpu"))
+
+    @requires_autocast
+    def test_backward_and_step(self):
+        precision = Precision("bf16", torch.device("cpu"))
+        model = nn.Linear(2, 1)
+        optimizer = torch.optim.SGD(model.parameters(), lr=1.0)
+        weight = model.weight.detach().clone()
+        with precision.autocast():
+            loss = model(torch.ones(1, 2)).sum()
+        precision.backward(loss)
+        precision.step(optimizer)
+        assert torch.float32 == model.weight.dtype
+        assert not torch.allclose(weight, model.weight)
@@ -10,11 +10,17 @@ from pytorch_pfn_extras.reporting import report
 from torch import nn, optim
 
 from mlprogram import distributed
-from mlprogram.builtins import Environment
+from mlprogram.builtins import Environment, Identity
 from mlprogram.entrypoint import train_REINFORCE, train_supervised
-from mlprogram.entrypoint.train import Epoch, Iteration
+from mlprogram.entrypoint.train import Epoch, Iteration, create_dataloader
 from mlprogram.synthesizers import Result
-from mlprogram.utils.data import Collate, CollateOptions, ListDataset
+from mlprogram.utils.data import (
+    BucketBatchSampler,
+    Collate,
+    CollateOptions,
+    ListDataset,
+    materialize,
+)
 
 context = mp.get_context("spawn")
 
@@ -158,6 +164,29 @@ def _run(init_dir, dataset, model, loss_fn, optimizer, rank):
         return model.state_dict(), optimizer.state_dict()
 
 
+class PidDataset(torch.utils.data.Dataset):
+    def __len__(self):
+        return 4
+
+    def __getitem__(self, index):
+        return os.getpid()
+
+
+class TestCreateDataloader(object):
+    def test_persistent_workers(self):
+        loader = create_dataloader(PidDataset(), 1, 2, Identity(),
+                                   prefetch_factor=1)
+        pids0 = set(pid for batch in loader for pid in batch)
+        pids1 = set(pid for batch in loader for pid in batch)
+        assert os.getpid() not in pids0
+        assert pids0 == pids1
+
+    def test_no_worker(self):
+        loader = create_dataloader(PidDataset(), 2, 0, Identity(),
+                                   prefetch_factor=1)
+        assert [[os.getpid()] * 2] * 2 == list(loader)
+
+
 class TestTrainSupervised(object):
     def test_happy_path(self, dataset, model, loss_fn, optimizer):
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -188,6 +217,103 @@ class TestTrainSupervised(object):
             assert os.path.exists(os.path.join(output, "model.pt"))
             assert os.path.exists(os.path.join(output, "optimizer.pt"))
 
+    def test_materialized_dataset(self, dataset, model, loss_fn, optimizer):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ws = os.path.join(tmpdir, "ws")
+            output = os.path.join(tmpdir, "out")
+            dataset = materialize(dataset, Identity(),
+                                  os.path.join(tmpdir, "store"))
+            train_supervised(ws, output,
+                             dataset,
+                             model,
+                             optimizer,
+                             loss_fn,
+                             MockEvaluate("key"), "key",
+                             collate.collate, 1, Epoch(2),
+                             n_dataloader_worker=2)
+            assert os.path.exists(
+                os.path.join(ws, "snapshot_iter_6"))
+            with open(os.path.join(output, "log.json")) as file:
+                log = json.load(file)
+            assert np.isfinite(log[0]["loss"])
+
+    def test_batch_sampler(self, model, loss_fn, optimizer):
+        dataset = ListDataset([
+            Environment(
+                {"value": torch.tensor(i), "ground_truth": torch.tensor(i),
+                 "code": "x" * (i + 1)},
+                set(["ground_truth"]),
+            )
+            for i in range(3)
+        ])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ws = os.path.join(tmpdir, "ws")
+            output = os.path.join(tmpdir, "out")
+            train_supervised(ws, output,
+                             dataset,
+                             model,
+                             optimizer,
+                             loss_fn,
+                             MockEvaluate("key"), "key",
+                             collate.collate, 1, Epoch(2),
+                             batch_sampler=BucketBatchSampler(
+                                 dataset, ["code"], 3))
+            assert os.path.exists(
+                os.path.join(ws, "snapshot_iter_6"))
+            with open(os.path.join(output, "log.json")) as file:
+                log = json.load(file)
+            assert 0.0 == log[0]["padding_ratio"]
+
+    @pytest.mark.skipif(not hasattr(torch, "autocast"),
+                        reason="torch.autocast is not available")
+    def test_bf16(self, dataset, model, loss_fn, optimizer):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ws = os.path.join(tmpdir, "ws")
+            output = os.path.join(tmpdir, "out")
+            train_supervised(ws, output,
+                             dataset,
+                             model,
+                             optimizer,
+                             loss_fn,
+                             MockEvaluate("key"), "key",
+                             collate.collate, 1, Epoch(2),
+                             precision="bf16")
+            assert os.path.exists(
+                os.path.join(ws, "snapshot_iter_6"))
+            with open(os.path.join(output, "log.json")) as file:
+                log = json.load(file)
+            assert np.isfinite(log[0]["loss"])
+            assert torch.float32 == model.m.weight.dtype
+
+    def test_gradient_accumulation(self, dataset, model, loss_fn, optimizer):
+        expected = DummyModel()
+        expected.load_state_dict(model.state_dict())
+        expected_optimizer = optim.SGD(expected.parameters(), 0.1)
+        for i in range(3):
+            x = torch.tensor([float(i)])
+            (((expected.m(x) - x) ** 2).sum() / 3).backward()
+        expected_optimizer.step()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ws = os.path.join(tmpdir, "ws")
+            output = os.path.join(tmpdir, "out")
+            train_supervised(ws, output,
+                             dataset,
+                             model,
+                             optimizer,
+                             loss_fn,
+                             MockEvaluate("key"), "key",
+                             collate.collate, 1, Epoch(1),
+                             n_accumulation=3)
+            # One optimizer step per epoch
+            assert os.path.exists(
+                os.path.join(ws, "snapshot_iter_1"))
+            with open(os.path.join(output, "log.json")) as file:
+                log = json.load(file)
+            assert 1 == log[0]["iteration"]
+        for key, value in expected.state_dict().items():
+            assert np.allclose(value.numpy(), model.state_dict()[key].numpy())
+
     def test_multiprocess(self, dataset, model, loss_fn, optimizer):
         with tempfile.TemporaryDirectory() as init_dir:
             with context.Pool(2) as pool:
@@ -436,6 +562,38 @@ class TestTrainREINFORCE(object):
             assert os.path.exists(
                 os.path.join(output, "optimizer.pt"))
 
+    def test_parallel_rollout(self, model, loss_fn, optimizer, synthesizer):
+        dataset = ListDataset([
+            Environment(
+                {"value": torch.tensor([i]), "ground_truth": torch.tensor([i])},
+                set(["ground_truth"]),
+            )
+            for i in range(4)
+        ])
+        with tempfile.TemporaryDirectory() as tmpdir:
+            ws = os.path.join(tmpdir, "ws")
+            output = os.path.join(tmpdir, "out")
+            train_REINFORCE(output, ws, output,
+                            dataset,
+                            synthesizer,
+                            model,
+                            optimizer,
+                            lambda x: (loss_fn(x) * x["reward"]).mean(),
+                            MockEvaluate("key"), "key",
+                            reward,
+                            collate.collate,
+                            2, 2, Epoch(2),
+                            n_parallel_rollout=2,
+                            n_reward_process=1)
+            assert os.path.exists(
+                os.path.join(ws, "snapshot_iter_4"))
+            with open(os.path.join(ws, "log")) as file:
+                log = json.load(file)
+            assert 1 == len(log)
+            # All rollouts are rewarded by reward
+            assert 1.0 == log[0]["reward"]
+            assert os.path.exists(os.path.join(output, "model.pt"))
+
     def test_pretrained_model(self, dataset, model, loss_fn, optimizer, synthesizer):
         with tempfile.TemporaryDirectory() as tmpdir:
             ws = os.path.join(tmpdir, "ws")
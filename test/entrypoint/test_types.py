@@ -0,0 +1,74 @@
+import json
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from mlprogram.entrypoint.types import TypeRegistry, types
+
+# The modules that are imported only when a config references them
+lazy_modules = [
+    "transpyle", "bashlex", "nltk", "fairseq", "torchnlp",
+    "mlprogram.datasets.django", "mlprogram.datasets.hearthstone",
+    "mlprogram.datasets.nl2bash", "mlprogram.datasets.deepfix",
+    "mlprogram.languages.python", "mlprogram.languages.bash",
+    "mlprogram.languages.csg", "mlprogram.languages.c",
+    "mlprogram.nn.treegen", "mlprogram.nn.pbe_with_repl",
+]
+
+
+def run(code: str):
+    # Run in a new process, so the modules imported by the other tests do not
+    # matter
+    proc = subprocess.run([sys.executable, "-c", code], check=True,
+                          stdout=subprocess.PIPE, text=True)
+    return json.loads(proc.stdout.strip().split("\n")[-1])
+
+
+class TestTypeRegistry(object):
+    def test_resolve_lazily(self):
+        registry = TypeRegistry({"join": "os.path.join", "one": lambda: 1},
+                                {"np.": "mlprogram.entrypoint.modules.numpy"})
+        assert registry["join"] is os.path.join
+        assert registry["one"]() == 1
+        assert registry["np.random.RandomState"] is np.random.RandomState
+        assert "np.random.RandomState" in registry
+        assert "np.foo" not in registry
+        with pytest.raises(KeyError):
+            registry["foo"]
+
+    def test_copy(self):
+        registry = types.copy()
+        registry["foo"] = lambda: 10
+        assert registry["foo"]() == 10
+        assert "foo" not in types
+
+    def test_import_set_budget(self):
+        imported = run(
+            "import json, sys\n"
+            "import mlprogram.entrypoint.types\n"
+            f"print(json.dumps([m for m in {lazy_modules} if m in sys.modules]))"
+        )
+        assert imported == []
+
+    def test_import_only_referenced_modules(self):
+        imported = run(
+            "import json, sys\n"
+            "from mlprogram.entrypoint.types import types\n"
+            "types['mlprogram.languages.csg.Dataset']\n"
+            f"print(json.dumps([m for m in {lazy_modules} if m in sys.modules]))"
+        )
+        assert imported == ["mlprogram.languages.csg"]
+
+    def test_startup_time_budget(self):
+        # The dependencies (torch and pytorch-pfn-extras) are excluded
+        elapsed = run(
+            "import time\n"
+            "import torch, pytorch_pfn_extras.reporting\n"
+            "begin = time.perf_counter()\n"
+            "import mlprogram.entrypoint.types\n"
+            "print(time.perf_counter() - begin)"
+        )
+        assert elapsed < 1.0
@@ -1,4 +1,11 @@
-from mlprogram.languages.c import Analyzer
+import os
+import pickle
+import tempfile
+
+import pytest
+
+from mlprogram.languages.c import Analyzer, local_compiler
+from mlprogram.languages.c.analyzer import Clang
 
 
 class TestAnalyzer(object):
@@ -17,3 +24,103 @@ class TestAnalyzer(object):
     def test_errors(self):
         analyzer = Analyzer()
         assert 2 == len(analyzer("b = 0;\nint a = 0"))
+
+
+class CountingCompiler(object):
+    def __init__(self):
+        self.codes = []
+
+    def __call__(self, code):
+        self.codes.append(code)
+        return local_compiler(code)
+
+
+class TestLocalCompiler(object):
+    def test_without_errors(self):
+        analyzer = Analyzer(compiler=local_compiler)
+        assert [] == analyzer("int f(){return 0;}")
+
+    def test_error(self):
+        analyzer = Analyzer(compiler=local_compiler)
+        assert 1 == len(analyzer("int a = 0"))
+        assert 2 == len(analyzer("int f({"))
+
+
+class TestCache(object):
+    def test_memoize(self):
+        compiler = CountingCompiler()
+        analyzer = Analyzer(compiler=compiler)
+        assert [[], ["<stdin>:1:10: error: expected ';' after top level "
+                     "declarator"], []] == \
+            analyzer.batch(["int a = 0;", "int a = 0", "int a = 0;"])
+        assert [] == analyzer("int a = 0;")
+        assert ["int a = 0;", "int a = 0"] == compiler.codes
+
+    def test_concurrent_compilation(self):
+        compiler = CountingCompiler()
+        analyzer = Analyzer(compiler=compiler, n_worker=4)
+        codes = [f"int a{i} = 0" for i in range(10)]
+        assert [1] * 10 == [len(errors) for errors in analyzer.batch(codes)]
+        assert sorted(codes) == sorted(compiler.codes)
+
+    def test_close(self):
+        compiler = CountingCompiler()
+        with Analyzer(compiler=compiler, n_worker=4) as analyzer:
+            codes = [f"int a{i} = 0" for i in range(10)]
+            analyzer.batch(codes)
+            executor = analyzer._executor
+            assert executor is not None
+        assert analyzer._executor is None
+        with pytest.raises(RuntimeError):
+            executor.submit(lambda: None)
+        # The threads are started again
+        codes = [f"int b{i} = 0" for i in range(10)]
+        assert [1] * 10 == [len(errors) for errors in analyzer.batch(codes)]
+        analyzer.close()
+
+    def test_persistent_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            analyzer = Analyzer(compiler=local_compiler, cache_dir=tmpdir)
+            assert 1 == len(analyzer("int a = 0"))
+
+            compiler = CountingCompiler()
+            analyzer = Analyzer(compiler=compiler, cache_dir=tmpdir)
+            # The namespace of the cache depends on the compiler
+            assert 1 == len(analyzer("int a = 0"))
+            assert 1 == len(compiler.codes)
+
+            analyzer = pickle.loads(pickle.dumps(analyzer))
+            analyzer.compiler = CountingCompiler()
+            assert 1 == len(analyzer("int a = 0"))
+            assert [] == analyzer.compiler.codes
+
+    def test_namespace_of_clang(self):
+        def create_compiler(path, version):
+            # The fake compiler that reports an error for any code
+            with open(path, "w") as file:
+                file.write(
+                    "#!/bin/sh\n"
+                    f"if [ \"$1\" = --version ]; then echo {version}; exit; fi\n"
+                    "cat > /dev/null\n"
+                    "echo \"<stdin>:1:1: error: foo\" >&2\n")
+            os.chmod(path, 0o755)
+
+        def n_cache_file(cache_dir):
+            return sum(len(files) for _, _, files in os.walk(cache_dir))
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache_dir = os.path.join(tmpdir, "cache")
+            cc0 = os.path.join(tmpdir, "cc0")
+            cc1 = os.path.join(tmpdir, "cc1")
+            create_compiler(cc0, "1.0")
+            create_compiler(cc1, "1.0")
+            for cmd in [cc0, cc1, cc0]:
+                analyzer = Analyzer(compiler=Clang(cmd), cache_dir=cache_dir)
+                assert 1 == len(analyzer("int a = 0;"))
+            assert 2 == n_cache_file(cache_dir)
+
+            # The version of the compiler is a part of the namespace
+            create_compiler(cc0, "2.0")
+            analyzer = Analyzer(clang_cmd=cc0, cache_dir=cache_dir)
+            assert 1 == len(analyzer("int a = 0;"))
+            assert 3 == n_cache_file(cache_dir)
@@ -0,0 +1,106 @@
+import os
+import tempfile
+
+import torch
+
+from mlprogram import distributed
+from mlprogram.builtins import Environment
+from mlprogram.datasets.deepfix import Lexer
+from mlprogram.languages.c import MutationDataset, TypoMutator
+from mlprogram.languages.linediff import Interpreter
+from mlprogram.utils.data import ListDataset
+
+code = """int a = 0;
+printf(\"%d\\n\", a);
+int *b = {0, 1, 2};
+int y = x.a;
+"""
+
+
+def create_dataset(n: int) -> ListDataset:
+    return ListDataset([
+        Environment({"code": f"int x{i};\n{code}", "n_error": 0},
+                    set(["n_error"]))
+        for i in range(n)])
+
+
+class TestMutationDataset(object):
+    def test_iterator(self):
+        dataset = MutationDataset(create_dataset(10), TypoMutator(3))
+        interpreter = Interpreter()
+        samples = list(dataset)
+        assert len(samples) == 10
+        assert set(sample["test_cases"][0][1] for sample in samples) == \
+            set(entry["code"] for entry in create_dataset(10))
+        for sample in samples:
+            mutated, orig = sample["test_cases"][0]
+            assert sample["code"] == mutated
+            assert sample.is_supervision("n_error")
+            assert interpreter.eval(sample["ground_truth"], [mutated])[0] == orig
+
+    def test_len_in_each_process(self, monkeypatch):
+        monkeypatch.setattr(distributed, "size", lambda: 3)
+        dataset = MutationDataset(create_dataset(10), TypoMutator(3))
+        assert len(dataset) == 4
+        n_samples = []
+        for rank in range(3):
+            monkeypatch.setattr(distributed, "rank", lambda: rank)
+            n_samples.append(len(list(dataset)))
+        assert sum(n_samples) == 10
+        assert max(n_samples) == len(dataset)
+
+    def test_reseed_in_each_epoch(self):
+        dataset = MutationDataset(create_dataset(10), TypoMutator(3), seed=0)
+        epoch0 = [sample["code"] for sample in dataset]
+        epoch1 = [sample["code"] for sample in dataset]
+        assert epoch0 != epoch1
+        dataset = MutationDataset(create_dataset(10), TypoMutator(3), seed=0)
+        assert epoch0 == [sample["code"] for sample in dataset]
+
+    def test_tokenize(self):
+        lexer = Lexer()
+        dataset = MutationDataset(create_dataset(2), TypoMutator(3),
+                                  lexer=lexer)
+        for sample in dataset:
+            assert sample["reference"] == lexer.tokenize(sample["code"])
+
+    def test_pregenerate(self):
+        interpreter = Interpreter()
+        dataset = MutationDataset(create_dataset(10), TypoMutator(3),
+                                  lexer=Lexer(), n_mutation=2)
+        epochs = [[sample["code"] for sample in dataset] for _ in range(3)]
+        # The mutations are used cyclically
+        assert sorted(epochs[0]) == sorted(epochs[2])
+        assert sorted(epochs[0]) != sorted(epochs[1])
+        for sample in dataset:
+            mutated, orig = sample["test_cases"][0]
+            assert sample["code"] == mutated
+            assert sample["reference"] == Lexer().tokenize(mutated)
+            assert interpreter.eval(sample["ground_truth"], [mutated])[0] == orig
+
+    def test_pregenerate_in_parallel(self):
+        expected = MutationDataset(create_dataset(10), TypoMutator(3),
+                                   n_mutation=2).mutations
+        dataset = MutationDataset(create_dataset(10), TypoMutator(3),
+                                  n_mutation=2, n_process=2)
+        assert dataset.mutations == expected
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "mutations.pt")
+            dataset = MutationDataset(create_dataset(10), TypoMutator(3),
+                                      n_mutation=2, cache_path=path)
+            assert os.path.exists(path)
+            cached = MutationDataset(create_dataset(10), TypoMutator(3),
+                                     n_mutation=2, cache_path=path,
+                                     seed=1)
+            assert cached.mutations == dataset.mutations
+
+    def test_multiprocess_loader(self):
+        dataset = MutationDataset(create_dataset(10), TypoMutator(3))
+        loader = torch.utils.data.DataLoader(dataset, 1, num_workers=2,
+                                             collate_fn=lambda x: x[0])
+        samples = list(loader)
+        # The workers yield the disjoint shards of the programs
+        assert len(samples) == 10
+        assert len(set(sample["test_cases"][0][1] for sample in samples)) == 10
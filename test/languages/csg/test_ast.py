@@ -1,3 +1,5 @@
+import pickle
+
 from mlprogram.languages.csg.ast import (
     Circle,
     Difference,
@@ -30,3 +32,11 @@ class TestAST(object):
 
     def test_reference(self):
         assert "Reference" == Reference(0).type_name()
+
+    def test_hash(self):
+        code = Union(Circle(2), Translation(1, 2, Rectangle(1, 2)))
+        assert hash(code) == hash(code)
+        assert code == Union(Circle(2), Translation(1, 2, Rectangle(1, 2)))
+        assert code != Union(Circle(2), Translation(1, 2, Rectangle(2, 1)))
+        assert hash(code) == \
+            hash(pickle.loads(pickle.dumps(code)))
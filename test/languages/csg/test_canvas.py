@@ -0,0 +1,37 @@
+import pickle
+
+import numpy as np
+
+from mlprogram.languages.csg import Canvas
+
+
+class TestCanvas(object):
+    def test_pack(self):
+        array = np.random.RandomState(0).rand(5, 3) > 0.5
+        canvas = Canvas.pack(array)
+        assert (5, 3) == canvas.shape
+        assert 2 == canvas.nbytes
+        assert 2 == Canvas.pack(array[:3]).nbytes
+        assert np.array_equal(array, canvas.unpack())
+        assert np.array_equal(array, np.asarray(canvas))
+        assert array.sum() == canvas.sum()
+
+    def test_set_operations(self):
+        rng = np.random.RandomState(0)
+        a = rng.rand(3, 7) > 0.5
+        b = rng.rand(3, 7) > 0.5
+        assert np.array_equal(a & b, (Canvas.pack(a) & Canvas.pack(b)).unpack())
+        assert np.array_equal(a | b, (Canvas.pack(a) | Canvas.pack(b)).unpack())
+        assert np.array_equal(a & ~b, (Canvas.pack(a) - Canvas.pack(b)).unpack())
+        assert (a & ~b).sum() == (Canvas.pack(a) - Canvas.pack(b)).sum()
+
+    def test_eq(self):
+        array = np.array([[True, False], [False, True]])
+        assert Canvas.pack(array) == Canvas.pack(array)
+        assert hash(Canvas.pack(array)) == hash(Canvas.pack(array))
+        assert Canvas.pack(array) != Canvas.pack(~array)
+        assert Canvas.pack(array) != Canvas.pack(array.reshape(1, 4))
+
+    def test_pickle(self):
+        canvas = Canvas.pack(np.array([[True, False, True]]))
+        assert canvas == pickle.loads(pickle.dumps(canvas))
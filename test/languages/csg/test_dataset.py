@@ -10,6 +10,17 @@ class TestDataset(object):
         for x in dataset:
             break
 
+    def test_reseed_in_each_epoch(self):
+        dataset = Dataset(2, 1, 2, 1, 45, seed=0)
+        it = iter(dataset)
+        epoch0 = [next(it)["ground_truth"] for _ in range(10)]
+        it = iter(dataset)
+        epoch1 = [next(it)["ground_truth"] for _ in range(10)]
+        assert epoch0 != epoch1
+
+        it = iter(Dataset(2, 1, 2, 1, 45, seed=0))
+        assert epoch0 == [next(it)["ground_truth"] for _ in range(10)]
+
     def test_multiprocess_loader(self):
         torch.manual_seed(0)
         np.random.seed(0)
@@ -1,6 +1,8 @@
 import numpy as np
 
 from mlprogram.languages.csg import (
+    Canvas,
+    CanvasCache,
     Circle,
     Difference,
     Interpreter,
@@ -36,6 +38,43 @@ class TestShape(object):
         assert "      \n      \n  ##  \n  ##  \n      \n      \n" == \
             show(shape.render(6, 6, 1))
 
+    def test_render_scalar_function(self):
+        shape = Shape(lambda x, y: x == 0 and y == 0)
+        assert "   \n # \n   \n" == show(shape.render(3, 3))
+
+
+class TestCanvasCache(object):
+    def test_get(self):
+        cache = CanvasCache()
+        key = (Rectangle(1, 1), 1, 1, 1)
+        assert cache.get(key) is None
+        canvas = Canvas.pack(np.ones((1, 1), dtype=np.bool))
+        cache.put(key, canvas)
+        # The key is compared by its structure
+        assert canvas is cache.get((Rectangle(1, 1), 1, 1, 1))
+        assert cache.get((Rectangle(1, 1), 2, 2, 1)) is None
+        assert 1 == cache.n_hit
+        assert 2 == cache.n_miss
+        assert 1 / 3 == cache.hit_rate
+
+    def test_evict(self):
+        cache = CanvasCache(max_bytes=4)
+        for i in range(3):
+            cache.put((Circle(i), 1, 1, 1), Canvas.pack(np.ones((1, 1))))
+        assert 2 == len(cache)
+        assert 4 == cache.n_bytes
+        assert cache.get((Circle(0), 1, 1, 1)) is None
+        assert cache.get((Circle(2), 1, 1, 1)) is not None
+
+    def test_evict_least_recently_used(self):
+        cache = CanvasCache(max_bytes=4)
+        cache.put((Circle(0), 1, 1, 1), Canvas.pack(np.ones((1, 1))))
+        cache.put((Circle(1), 1, 1, 1), Canvas.pack(np.ones((1, 1))))
+        cache.get((Circle(0), 1, 1, 1))
+        cache.put((Circle(2), 1, 1, 1), Canvas.pack(np.ones((1, 1))))
+        assert cache.get((Circle(0), 1, 1, 1)) is not None
+        assert cache.get((Circle(1), 1, 1, 1)) is None
+
 
 class TestInterpreter(object):
     def test_circle(self):
@@ -151,3 +190,20 @@ class TestInterpreter(object):
 
         state = interpreter.execute(ref0, state)
         assert len(state.environment[Reference(0)]) == 2
+
+    def test_reuse_canvas_of_subtree(self):
+        cache = CanvasCache()
+        interpreter = Interpreter(3, 3, 1, False, canvas_cache=cache)
+        code = Union(Rectangle(3, 1), Rectangle(1, 3))
+        cache.put((Rectangle(3, 1), 3, 3, 1),
+                  Canvas.pack(np.zeros((3, 3), dtype=np.bool)))
+        # The canvas of the child is reused
+        assert " # \n # \n # \n" == show(interpreter.eval(code, [None])[0])
+
+    def test_share_canvas_cache(self):
+        cache = CanvasCache()
+        interpreter0 = Interpreter(3, 3, 1, False, canvas_cache=cache)
+        interpreter1 = Interpreter(3, 3, 1, False, canvas_cache=cache)
+        canvas = interpreter0.eval(Rectangle(1, 3), [None])[0]
+        assert canvas is interpreter1.eval(Rectangle(1, 3), [None])[0]
+        assert 0 < cache.hit_rate
@@ -0,0 +1,76 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from mlprogram.languages.linediff import LineBuffer
+
+
+class TestLineBuffer(object):
+    def test_from_text(self):
+        buffer = LineBuffer.from_text("foo\nbar\n")
+        assert ["foo", "bar", ""] == list(buffer)
+        assert 3 == len(buffer)
+        assert "bar" == buffer[1]
+        assert "" == buffer[-1]
+        assert "foo\nbar\n" == str(buffer)
+
+    def test_edit(self):
+        buffer = LineBuffer.from_text("foo\nbar")
+        assert "foo\nx\nbar" == str(buffer.insert(1, "x"))
+        assert "foo\nbar\nx" == str(buffer.insert(10, "x"))
+        assert "bar" == str(buffer.remove(0))
+        assert "foo\nx" == str(buffer.replace(-1, "x"))
+        # The original buffer is not modified
+        assert "foo\nbar" == str(buffer)
+        with pytest.raises(IndexError):
+            buffer.remove(2)
+        with pytest.raises(IndexError):
+            buffer.replace(2, "x")
+
+    @pytest.mark.parametrize("n_line", [1, 10, 200])
+    def test_random_edits(self, n_line):
+        rng = np.random.RandomState(0)
+        lines = [str(i) for i in range(n_line)]
+        buffer = LineBuffer.from_text("\n".join(lines))
+        for i in range(1000):
+            op = rng.randint(3)
+            if op == 0 or len(lines) == 0:
+                index = rng.randint(len(lines) + 1)
+                lines.insert(index, f"x{i}")
+                buffer = buffer.insert(index, f"x{i}")
+            elif op == 1:
+                index = rng.randint(len(lines))
+                del lines[index]
+                buffer = buffer.remove(index)
+            else:
+                index = rng.randint(len(lines))
+                lines[index] = f"y{i}"
+                buffer = buffer.replace(index, f"y{i}")
+            assert lines == list(buffer)
+            if len(lines) != 0:
+                assert lines[len(lines) // 2] == buffer[len(lines) // 2]
+        assert "\n".join(lines) == str(buffer)
+
+    def test_balanced(self):
+        buffer = LineBuffer.from_text("")
+        for i in range(10000):
+            buffer = buffer.insert(0, str(i))
+        assert 10001 == len(buffer)
+        assert "9999" == buffer[0]
+        # The chunks are split and the tree is balanced
+        assert buffer._root.height <= 2 * np.log2(10001 / 32) + 1
+
+    def test_eq(self):
+        buffer = LineBuffer.from_text("foo\nbar")
+        assert buffer == LineBuffer.from_text("foo\nbar")
+        assert hash(buffer) == hash(LineBuffer.from_text("foo\nbar"))
+        assert buffer.insert(0, "x").remove(0) == buffer
+        assert buffer != buffer.replace(0, "x")
+        assert buffer != "foo\nbar"
+
+    def test_pickle(self):
+        for text in ["", "foo\nbar"]:
+            buffer = LineBuffer.from_text(text)
+            assert buffer == pickle.loads(pickle.dumps(buffer))
+            assert text == str(pickle.loads(pickle.dumps(buffer)))
@@ -6,6 +6,7 @@ from mlprogram.languages.linediff import (
     Expander,
     Interpreter,
     IsSubtype,
+    LineBuffer,
     Remove,
     Replace,
     ToEpisode,
@@ -36,8 +37,10 @@ class TestToEpisode(object):
             set(["ground_truth"])
         ))
         assert len(episode) == 2
-        assert episode[0]["interpreter_state"].context == ["xxx\nyyy"]
-        assert episode[1]["interpreter_state"].context == ["zzz\nyyy"]
+        assert episode[0]["interpreter_state"].context == \
+            [LineBuffer.from_text("xxx\nyyy")]
+        assert episode[1]["interpreter_state"].context == \
+            [LineBuffer.from_text("zzz\nyyy")]
 
 
 class TestAddTestCases(object):
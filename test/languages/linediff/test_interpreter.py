@@ -28,12 +28,20 @@ class TestInterpreter(object):
         assert state.history == [ref0]
         assert set(state.environment.keys()) == set([ref0])
         assert state.type_environment[ref0] == "Insert"
-        assert state.environment[ref0][0] == "foo\nbar\nhoge"
-        assert state.context[0] == "foo\nbar\nhoge"
+        assert str(state.environment[ref0][0]) == "foo\nbar\nhoge"
+        assert str(state.context[0]) == "foo\nbar\nhoge"
 
         state = interpreter.execute(ref1, state)
         assert state.history == [ref0, ref1]
         assert set(state.environment.keys()) == set([ref1])
         assert state.type_environment[ref1] == "Replace"
-        assert state.environment[ref1][0] == "foo\ntest\nhoge"
-        assert state.context[0] == "foo\ntest\nhoge"
+        assert str(state.environment[ref1][0]) == "foo\ntest\nhoge"
+        assert str(state.context[0]) == "foo\ntest\nhoge"
+
+    def test_execute_keeps_state(self):
+        interpreter = Interpreter()
+        state = interpreter.create_state(["bar\nhoge"])
+        next = interpreter.execute(Insert(0, "foo"), state)
+        assert str(state.context[0]) == "bar\nhoge"
+        assert str(next.context[0]) == "foo\nbar\nhoge"
+        assert interpreter.execute(Insert(0, "foo"), state) == next
@@ -12,3 +12,9 @@ class TestBleu(object):
             expected="def f():\n  pass\n",
             actual="def f(arg):\n  pass\n"
         ) > 0.9
+
+    def test_batch(self):
+        bleu = Bleu()
+        actual = ["def f():\n  pass\n", "def f(arg):\n  pass\n"]
+        assert bleu.batch("def f():\n  pass\n", actual) == \
+            [bleu("def f():\n  pass\n", x) for x in actual]
@@ -1,5 +1,7 @@
 
-from mlprogram.languages import Field, Leaf, Node, Sugar
+import pickle
+
+from mlprogram.languages import Field, Leaf, Node, Sugar, intern
 
 
 class TestLeaf(object):
@@ -37,3 +39,47 @@ class TestSugar(object):
 
     def test_leaf(self):
         assert Sugar.leaf("str", "name") == Leaf("str", "name")
+
+
+def _tree():
+    return Node("list",
+                [Field("name", "literal", Leaf("str", "name")),
+                 Field("elems", "literal", [
+                     Leaf("str", "foo"), Leaf("str", "bar")])])
+
+
+class TestIntern(object):
+    def test_share_instance(self):
+        a = intern(_tree())
+        b = intern(_tree())
+        assert a is b
+        assert a == _tree()
+        assert hash(a) == hash(_tree())
+        # Equal subtrees share one instance
+        c = intern(Leaf("str", "foo"))
+        assert c is a.fields[1].value[0]
+
+    def test_not_equal(self):
+        a = intern(_tree())
+        b = intern(Node("list", [Field("name", "literal", Leaf("str", "x"))]))
+        assert a != b
+        assert intern(Leaf("int", 1)) is not intern(Leaf("int", True))
+        assert intern(Leaf("int", 1)) == intern(Leaf("int", True))
+
+    def test_clone(self):
+        a = intern(_tree())
+        assert a is a.clone()
+
+    def test_unhashable_value(self):
+        leaf = Leaf("list", [0])
+        assert leaf is intern(leaf)
+        node = Node("node", [Field("value", "list", leaf)])
+        assert node is intern(node)
+
+    def test_pickle(self):
+        a = intern(_tree())
+        b = pickle.loads(pickle.dumps(a))
+        assert a is not b
+        assert a == b
+        assert b is not b.clone()
+        assert b._hash is None
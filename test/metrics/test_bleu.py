@@ -1,7 +1,91 @@
-from mlprogram.metrics import Bleu
+import pickle
+import threading
+import time
+import warnings
+from collections import OrderedDict
+
+from nltk.translate.bleu_score import corpus_bleu, sentence_bleu
+
+from mlprogram.builtins import Environment
+from mlprogram.metrics import Bleu, use_environment
 
 
 class TestBleu(object):
     def test_simple_case(self):
         m = Bleu()
         assert m(expected="int", actual="xxx") < 0.1
+
+    def test_same_as_nltk(self):
+        m = Bleu()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            for expected, actual in [("int x = 0;", "int y = 0;"),
+                                     ("int", "xxx"),
+                                     ("int x", "int x"),
+                                     ("foo", "")]:
+                assert m(expected, actual) == \
+                    float(sentence_bleu([expected], actual))
+
+    def test_batch(self):
+        m = Bleu()
+        actual = ["int y = 0;", "int x = 0;", "int y = 0;"]
+        assert m.batch("int x = 0;", actual) == \
+            [m("int x = 0;", x) for x in actual]
+
+    def test_corpus(self):
+        m = Bleu()
+        expected = ["int x = 0;", "return 0;"]
+        actual = ["int y = 0;", "return 1;"]
+        assert m.corpus(expected, actual) == \
+            float(corpus_bleu([[x] for x in expected], actual))
+        assert m.corpus(expected, [actual[0], None]) == \
+            float(corpus_bleu([[x] for x in expected], [actual[0], ""]))
+
+    def test_cache_references(self):
+        m = Bleu(cache_size=1)
+        m("int x", "int y")
+        m("int x", "int z")
+        assert list(m._references.keys()) == ["int x"]
+        m("int y", "int y")
+        assert list(m._references.keys()) == ["int y"]
+
+    def test_cache_in_threads(self):
+        class SlowOrderedDict(OrderedDict):
+            # Widen the window between the lookup and the update of the LRU
+            def move_to_end(self, key, last=True):
+                time.sleep(0.001)
+                super().move_to_end(key, last)
+
+        m = Bleu(cache_size=1)
+        expected = {ref: m(ref, "int x") for ref in ["int x", "int y"]}
+        m._references = SlowOrderedDict()
+        results = []
+
+        def run(refs):
+            for _ in range(20):
+                for ref in refs:
+                    results.append(m(ref, "int x") == expected[ref])
+
+        threads = [threading.Thread(target=run, args=(refs,))
+                   for refs in [["int x", "int x"], ["int y", "int y"]]]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert [True] * 80 == results
+
+    def test_pickle(self):
+        m = Bleu(cache_size=1)
+        m("int x", "int y")
+        m = pickle.loads(pickle.dumps(m))
+        assert len(m._references) == 0
+        assert m("int x", "int x") == 1.0
+
+    def test_use_environment(self):
+        m = use_environment(Bleu(), in_keys=["actual", ["ground_truth", "expected"]],
+                            value_key="actual")
+        env = Environment({"ground_truth": "int x"})
+        assert m.batch(env, ["int x", "int y"]) == \
+            [m(env.clone(), "int x"), m(env.clone(), "int y")]
+        assert m.corpus([env, env], ["int x", "int y"]) == \
+            Bleu().corpus(["int x", "int x"], ["int x", "int y"])
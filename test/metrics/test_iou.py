@@ -1,5 +1,6 @@
 import numpy as np
 
+from mlprogram.languages.csg import Canvas
 from mlprogram.metrics import Iou
 
 
@@ -26,3 +27,13 @@ class TestIou(object):
             iou(expected=gt,
                 actual=np.array([False, False, False], dtype=np.bool)
                 ))
+
+    def test_canvas(self):
+        iou = Iou()
+        gt = Canvas.pack(np.array([False, True, False]))
+        assert np.allclose(
+            0.5, iou(expected=gt, actual=Canvas.pack(np.array([True, True, False]))))
+        gt = Canvas.pack(np.array([False, False, False]))
+        assert np.allclose(
+            1.0 / 3,
+            iou(expected=gt, actual=Canvas.pack(np.array([True, True, False]))))
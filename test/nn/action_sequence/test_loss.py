@@ -67,6 +67,29 @@ class TestLoss(object):
         assert (1,) == objective2.shape
         assert np.allclose(objective0.item(), objective1.item())
 
+    def test_half_precision(self):
+        gt0 = torch.LongTensor([[0, -1, -1], [-1, 2, -1], [-1, -1, 3]])
+        gt = rnn.pad_sequence([gt0], padding_value=-1)
+        rule_prob0 = torch.FloatTensor([[0.8, 0.2], [0.5, 0.5], [0.5, 0.5]])
+        rule_prob = rnn.pad_sequence([rule_prob0])
+        token_prob0 = torch.FloatTensor(
+            [[0.1, 0.4, 0.5], [0.1, 0.2, 0.0], [0.5, 0.4, 0.1]])
+        token_prob = rnn.pad_sequence([token_prob0])
+        reference_prob0 = torch.FloatTensor(
+            [[0.1, 0.4, 0.5, 0.0], [0.0, 0.5, 0.4, 0.1], [0.0, 0.0, 0.0, 1e-5]])
+        reference_prob = rnn.pad_sequence([reference_prob0])
+
+        def bf16(x):
+            return rnn.PaddedSequenceWithMask(x.data.bfloat16(), x.mask)
+
+        loss = Loss()
+        expected = loss(rule_prob, token_prob, reference_prob, gt)
+        objective = loss(bf16(rule_prob), bf16(token_prob),
+                         bf16(reference_prob), gt)
+        assert torch.float32 == objective.dtype
+        assert np.isfinite(objective.item())
+        assert np.allclose(expected.item(), objective.item(), rtol=1e-2)
+
 
 class TestEntropyLoss(object):
     def test_parameters(self):
@@ -140,3 +163,24 @@ class TestEntropyLoss(object):
             reference_probs=reference_prob,
         )
         assert objective[0].item() > objective[1].item()
+
+    def test_half_precision(self):
+        rule_prob0 = torch.FloatTensor([[0.5, 0.5]])
+        rule_prob1 = torch.FloatTensor([[1.0, 0.0]])
+        rule_prob = rnn.pad_sequence([rule_prob0, rule_prob1])
+        token_prob0 = torch.FloatTensor([[0.0, 0.0]])
+        token_prob1 = torch.FloatTensor([[0.0, 0.0]])
+        token_prob = rnn.pad_sequence([token_prob0, token_prob1])
+        reference_prob0 = torch.FloatTensor([[0.0, 0.0]])
+        reference_prob1 = torch.FloatTensor([[0.0, 0.0]])
+        reference_prob = rnn.pad_sequence([reference_prob0, reference_prob1])
+
+        def bf16(x):
+            return rnn.PaddedSequenceWithMask(x.data.bfloat16(), x.mask)
+
+        loss = EntropyLoss(reduction="none")
+        expected = loss(rule_prob, token_prob, reference_prob)
+        objective = loss(bf16(rule_prob), bf16(token_prob),
+                         bf16(reference_prob))
+        assert torch.float32 == objective.dtype
+        assert np.allclose(expected.numpy(), objective.numpy())
@@ -350,3 +350,73 @@ class TestActionSequenceSampler(object):
         assert 3 == all_results[0].state.state["length"].item()
         assert np.allclose(log(0.2) + log(1.),
                            all_results[0].state.score)
+
+    def test_batched_states(self):
+        class BatchedDecoderModule(nn.Module):
+            def __init__(self, rule_prob, token_prob, reference_prob):
+                super().__init__()
+                self.rule_prob = rule_prob
+                self.token_prob = token_prob
+                self.reference_prob = reference_prob
+
+            def forward(self, env):
+                length = env["length"] - 1
+                env["rule_probs"] = \
+                    self.rule_prob[length].reshape(1, len(length), -1)
+                env["token_probs"] = \
+                    self.token_prob[length].reshape(1, len(length), -1)
+                env["reference_probs"] = \
+                    self.reference_prob[length].reshape(1, len(length), -1)
+                return env
+
+        rule_prob = torch.tensor([
+            [1.0, 1.0, 0.2, 0.1, 1.0, 1.0],
+            [1.0, 1.0, 1.0, 1.0, 0.5, 0.3],
+            [0.0, 0.8, 0.0, 0.0, 0.0, 0.2]])
+        token_prob = torch.tensor([
+            [0.0, 0.0, 0.0],
+            [0.0, 0.0, 0.0],
+            [1.0, 0.2, 0.8]])
+        reference_prob = torch.tensor([[0.0], [0.0], [0.1]])
+        sampler = ActionSequenceSampler(
+            create_encoder(),
+            is_subtype,
+            create_transform_input([Token("Str", "y", "y")]),
+            transform_action_sequence,
+            collate,
+            Module(encoder_module,
+                   BatchedDecoderModule(rule_prob, token_prob, reference_prob)),
+            rng=np.random.RandomState(0)
+        )
+        s = SamplerState(0.0, sampler.initialize(Environment()))
+        results = [s.state for s in sampler.all_samples([s])]
+        # (Root2X, X2Y_list) and (Root2Y, Ysub2Str)
+        states = [s.state for s in sampler.all_samples(results[:1])] + \
+            [s.state for s in sampler.all_samples(results[1:])]
+        assert 2 == len(states)
+
+        def to_key(results):
+            return [(str(result.state.state["action_sequence"]),
+                     round(result.state.score, 5), result.num)
+                    for result in results]
+
+        expected = []
+        for state in states:
+            expected.extend(to_key(sampler.all_samples([state], sorted=False)))
+        assert 5 == len(expected)
+        assert expected == to_key(sampler.all_samples(states, sorted=False))
+
+        topk_results = list(sampler.top_k_samples(states, 2))
+        assert 2 == len(topk_results)
+        assert np.allclose(log(0.2) + log(0.5) + log(0.8),
+                           topk_results[0].state.score)
+        assert np.allclose(log(0.1) + log(0.3) + log(0.8),
+                           topk_results[1].state.score)
+
+        random_results = list(sampler.batch_k_samples(states, [3, 2]))
+        assert [3, 2] == [
+            sum(r.num for r in random_results
+                if r.state.state["action_sequence"].action_sequence[1] ==
+                state.state["action_sequence"].action_sequence[1])
+            for state in states
+        ]
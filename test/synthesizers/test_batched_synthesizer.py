@@ -0,0 +1,230 @@
+import threading
+from typing import List
+
+import numpy as np
+import pytest
+import torch
+import torch.nn as nn
+
+from mlprogram.actions import ExpandTreeRule, NodeConstraint, NodeType
+from mlprogram.builtins import Environment
+from mlprogram.encoders import ActionSequenceEncoder, Samples
+from mlprogram.languages import Root, Token
+from mlprogram.samplers import ActionSequenceSampler, FilteredSampler
+from mlprogram.samplers import transform as transform_sampler
+from mlprogram.synthesizers import (
+    SMC,
+    BatchedSynthesizer,
+    BeamSearch,
+    FilteredSynthesizer,
+)
+from mlprogram.synthesizers.batched_synthesizer import LockstepDecoder
+from mlprogram.utils.data import Collate, CollateOptions
+
+R = NodeType(Root(), NodeConstraint.Node, False)
+X = NodeType("X", NodeConstraint.Node, False)
+Str = NodeType("Str", NodeConstraint.Token, True)
+
+Root2X = ExpandTreeRule(R, [("x", X)])
+X2Str = ExpandTreeRule(X, [("str", Str)])
+
+
+def create_encoder():
+    return ActionSequenceEncoder(Samples(
+        [Root2X, X2Str],
+        [R, X, Str],
+        [("Str", "x"), ("Str", "y")]), 0)
+
+
+collate = Collate(input=CollateOptions(False, 0, -1),
+                  length=CollateOptions(False, 0, -1))
+
+
+def transform_input(env):
+    env["reference"] = [Token("Str", env["ref"], env["ref"])]
+    env["input"] = torch.zeros((1,))
+    return env
+
+
+def transform_action_sequence(kwargs):
+    kwargs["length"] = \
+        torch.tensor(len(kwargs["action_sequence"].action_sequence))
+    return kwargs
+
+
+class EncoderModule(nn.Module):
+    def forward(self, kwargs):
+        return kwargs
+
+
+class DecoderModule(nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes: List[int] = []
+        # rules: unknown, close, Root2X, X2Str
+        self.rule_prob = torch.tensor([
+            [0.0, 0.0, 1.0, 0.0],
+            [0.0, 0.0, 0.0, 1.0],
+            [0.0, 0.1, 0.0, 0.0],
+            [0.0, 0.4, 0.0, 0.0],
+            [0.0, 0.9, 0.0, 0.0]])
+        # tokens: unknown, x, y
+        self.token_prob = torch.tensor([
+            [0.0, 0.0, 0.0],
+            [0.0, 0.0, 0.0],
+            [0.0, 0.5, 0.2],
+            [0.0, 0.3, 0.1],
+            [0.0, 0.1, 0.0]])
+        self.reference_prob = torch.tensor([[0.0], [0.0], [0.2], [0.2], [0.0]])
+
+    def forward(self, env):
+        length = env["length"] - 1
+        self.batch_sizes.append(len(length))
+        env["rule_probs"] = self.rule_prob[length].reshape(1, len(length), -1)
+        env["token_probs"] = \
+            self.token_prob[length].reshape(1, len(length), -1)
+        env["reference_probs"] = \
+            self.reference_prob[length].reshape(1, len(length), -1)
+        return env
+
+
+class Module(nn.Module):
+    def __init__(self, encoder, decoder):
+        super().__init__()
+        self.encoder = encoder
+        self.decoder = decoder
+
+
+def create_sampler(decoder):
+    return ActionSequenceSampler(
+        create_encoder(), lambda x, y: x == y,
+        transform_input, transform_action_sequence, collate,
+        Module(EncoderModule(), decoder),
+        rng=np.random.RandomState(0))
+
+
+class TestLockstepDecoder(object):
+    def test_merge_requests(self):
+        calls = []
+
+        def decode(state_list):
+            calls.append(list(state_list))
+            n = len(state_list)
+            return (torch.arange(n), torch.arange(n), torch.arange(n),
+                    state_list)
+
+        decoder = LockstepDecoder(decode)
+        results = {}
+
+        def run(name, n):
+            try:
+                results[name] = decoder([name] * n)
+            finally:
+                decoder.exit()
+
+        decoder.enter()
+        decoder.enter()
+        threads = [threading.Thread(target=run, args=("a", 2)),
+                   threading.Thread(target=run, args=("b", 3))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert 1 == len(calls)
+        assert 5 == len(calls[0])
+        assert ["a", "a"] == results["a"][3]
+        assert ["b", "b", "b"] == results["b"][3]
+        assert 5 == len(torch.cat([results["a"][0], results["b"][0]]))
+
+
+class TestBatchedSynthesizer(object):
+    def test_map(self):
+        inputs = [Environment({"ref": "x"}), Environment({"ref": "z"}),
+                  Environment({"ref": "y"})]
+
+        def to_key(results):
+            return [(str(result.output), round(result.score, 5))
+                    for result in results]
+
+        decoder = DecoderModule()
+        sampler = transform_sampler(create_sampler(decoder), lambda x: x)
+        expected = [to_key(BeamSearch(3, 10, sampler)(input))
+                    for input in inputs]
+        n_sequential_call = len(decoder.batch_sizes)
+
+        decoder = DecoderModule()
+        sampler = transform_sampler(create_sampler(decoder), lambda x: x)
+        synthesizer = BatchedSynthesizer(BeamSearch(3, 10, sampler), sampler,
+                                         n_parallel=3)
+        actual = synthesizer.map(lambda x: to_key(synthesizer(x)), inputs)
+
+        assert 3 == len(expected[0])
+        assert expected == actual
+        assert n_sequential_call > len(decoder.batch_sizes)
+        assert max(decoder.batch_sizes) > 3
+        assert synthesizer.sampler.batcher is None
+
+    def test_find_sampler_from_synthesizer(self):
+        sampler = create_sampler(DecoderModule())
+        synthesizer = FilteredSynthesizer(
+            BeamSearch(3, 10, FilteredSampler(
+                transform_sampler(sampler, lambda x: x), lambda x, y: 1.0,
+                0.9)),
+            lambda x, y: 1.0, 0.9)
+        batched = BatchedSynthesizer(synthesizer, synthesizer, n_parallel=2)
+        assert sampler is batched.sampler
+
+    def test_propagate_error(self):
+        synthesizer = BatchedSynthesizer(
+            BeamSearch(3, 10, create_sampler(DecoderModule())),
+            create_sampler(DecoderModule()),
+            n_parallel=2)
+
+        def f(x):
+            if x == 1:
+                raise RuntimeError()
+            return x
+
+        with pytest.raises(RuntimeError):
+            synthesizer.map(f, [0, 1, 2])
+
+    def test_reproducible_random_streams(self):
+        inputs = [Environment({"ref": ref}) for ref in ["x", "y", "z", "x"]]
+
+        def run(n_parallel):
+            sampler = create_sampler(DecoderModule())
+            synthesizer = BatchedSynthesizer(
+                SMC(3, 4, sampler,
+                    to_key=lambda x: str(x["action_sequence"]), max_try_num=1,
+                    rng=np.random.RandomState(0)),
+                sampler,
+                n_parallel=n_parallel)
+            return synthesizer.map(
+                lambda x: [(str(result.output), result.num)
+                           for result in synthesizer(x)],
+                inputs)
+
+        # The samples do not depend on the thread scheduling
+        expected = run(1)
+        assert expected == run(4)
+        assert expected == run(2)
+
+    def test_work_outside_search(self):
+        inputs = [Environment({"ref": "x"}), Environment({"ref": "y"})]
+        sampler = create_sampler(DecoderModule())
+        synthesizer = BatchedSynthesizer(BeamSearch(3, 10, sampler), sampler,
+                                         n_parallel=2)
+        finished = threading.Event()
+
+        def f(x):
+            n = len(list(synthesizer(x)))
+            if x["ref"] == "x":
+                # The thread waiting after the search does not block the
+                # decoding of the other search
+                return n if finished.wait(timeout=10) else None
+            n += len(list(synthesizer(x)))
+            finished.set()
+            return n
+
+        assert [3, 6] == synthesizer.map(f, inputs)
@@ -0,0 +1,125 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from mlprogram import logging
+
+
+class TestLogger(object):
+    def test_block(self):
+        logger = logging.Logger("test")
+        with logger.block("foo"):
+            pass
+        with logger.block("bar", "foo"):
+            pass
+        assert 2 == logger.elapsed_time_log["foo"][0]
+
+    def test_iterable_block(self):
+        logger = logging.Logger("test")
+        assert [0, 1, 2] == list(logger.iterable_block("foo", range(3)))
+        assert 3 == logger.elapsed_time_log["foo"][0]
+
+    def test_function_block(self):
+        logger = logging.Logger("test")
+
+        @logger.function_block("foo")
+        def f(x):
+            return x + 1
+        assert 2 == f(1)
+        assert 1 == logger.elapsed_time_log["foo"][0]
+
+
+class TestProfiler(object):
+    def test_call_tree(self):
+        logger = logging.Logger("test")
+        profiler = logging.enable_profiler()
+        try:
+            with logger.block("outer"):
+                for _ in logger.iterable_block("inner", range(3)):
+                    time.sleep(0.001)
+        finally:
+            assert profiler is logging.disable_profiler()
+
+        root, = profiler.roots.values()
+        outer = root.children["test:outer"]
+        inner = outer.children["test:inner"]
+        assert 1 == outer.count
+        assert 3 == inner.count
+        assert inner.total_time >= 0.003
+        assert outer.total_time >= inner.total_time
+        assert abs(outer.self_time + inner.total_time - outer.total_time) < 1e-9
+        assert inner.percentile(50) >= 0.001
+
+    def test_disabled(self):
+        logger = logging.Logger("test")
+        profiler = logging.enable_profiler()
+        logging.disable_profiler()
+        with logger.block("foo"):
+            pass
+        assert 0 == len(profiler.roots)
+        assert logging.get_profiler() is None
+
+    def test_interleaved_generators(self):
+        logger = logging.Logger("test")
+        profiler = logging.enable_profiler()
+        try:
+            it0 = logger.iterable_block("it0", range(2))
+            it1 = logger.iterable_block("it1", range(2))
+            next(it0)
+            next(it1)
+            list(it0)
+            list(it1)
+            with logger.block("after"):
+                pass
+        finally:
+            logging.disable_profiler()
+        root, = profiler.roots.values()
+        assert "test:after" in root.children
+
+    def test_sequential_threads(self):
+        # The ident of a thread is reused after the thread exits
+        logger = logging.Logger("test")
+
+        def step():
+            with logger.block("step"):
+                pass
+
+        profiler = logging.enable_profiler()
+        try:
+            for _ in range(20):
+                thread = threading.Thread(target=step)
+                thread.start()
+                thread.join()
+        finally:
+            logging.disable_profiler()
+        assert 20 == len(profiler.roots)
+        assert 20 == sum(root.children["test:step"].count
+                         for root in profiler.roots.values())
+
+    def test_export(self):
+        logger = logging.Logger("test")
+        profiler = logging.enable_profiler(trace=True)
+        try:
+            with logger.block("outer"):
+                with logger.block("inner"):
+                    time.sleep(0.001)
+        finally:
+            logging.disable_profiler()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            profiler.export_chrome_trace(os.path.join(tmpdir, "trace.json"))
+            with open(os.path.join(tmpdir, "trace.json")) as file:
+                trace = json.load(file)
+            assert ["test:inner", "test:outer"] == \
+                [event["name"] for event in trace]
+            assert trace[0]["dur"] <= trace[1]["dur"]
+
+            profiler.export_flamegraph(os.path.join(tmpdir, "flamegraph.txt"))
+            with open(os.path.join(tmpdir, "flamegraph.txt")) as file:
+                stacks = [line.rsplit(" ", 1)[0] for line in file]
+            assert any(stack.endswith(";test:outer;test:inner")
+                       for stack in stacks)
+        assert "test:inner" in profiler.format()
+        assert "test:outer" == profiler.to_dict()[0]["children"][0]["name"]
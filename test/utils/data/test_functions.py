@@ -6,6 +6,7 @@ import torch
 from mlprogram.builtins import Environment
 from mlprogram.languages import Analyzer, Token
 from mlprogram.languages.python import Parser
+from mlprogram.nn.utils.rnn import PaddedSequenceWithMask
 from mlprogram.utils.data import (
     Collate,
     CollateOptions,
@@ -173,6 +174,39 @@ class TestCollate(object):
             for key in expected.to_dict():
                 assert np.array_equal(expected[key], actual[key])
 
+    def test_split_returns_views(self):
+        data = [
+            Environment({"pad": torch.zeros(1), "stack": torch.zeros(2)}),
+            Environment({"pad": torch.ones(2), "stack": torch.ones(2)})
+        ]
+        collate = Collate(pad=CollateOptions(True, 0, -1),
+                          stack=CollateOptions(False, 0, -1))
+        batch = collate.collate(data)
+        retval = collate.split(batch)
+        batch["pad"].data[0, 1] = 2
+        batch["stack"][1, 0] = 2
+        assert np.array_equal([2, 1], retval[1]["pad"])
+        assert np.array_equal([2, 1], retval[1]["stack"])
+
+    def test_split_with_non_prefix_mask(self):
+        collate = Collate(pad=CollateOptions(True, 0, -1))
+        retval = collate.split(Environment({
+            "pad": PaddedSequenceWithMask(
+                torch.arange(6).reshape(3, 2),
+                torch.tensor([[False, True], [True, True], [True, False]]))
+        }))
+        assert np.array_equal([2, 4], retval[0]["pad"])
+        assert np.array_equal([1, 3], retval[1]["pad"])
+
+    def test_collate_with_pad_in_second_dim(self):
+        data = [
+            Environment({"x": torch.zeros(2, 1)}),
+            Environment({"x": torch.zeros(1, 1)})
+        ]
+        collate = Collate(x=CollateOptions(False, 1, -1))
+        retval = collate.collate(data)
+        assert np.array_equal([[[0], [0]], [[0], [-1]]], retval["x"].numpy())
+
     def test_split_with_additional_key(self):
         data = [
             Environment({"pad0": 1}),
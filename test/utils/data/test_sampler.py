@@ -0,0 +1,57 @@
+import numpy as np
+
+from mlprogram.utils.data import BucketBatchSampler, ListDataset
+
+
+def create_dataset():
+    return ListDataset([
+        {"query": [0] * q, "code": [0] * c}
+        for q, c in [(1, 2), (3, 1), (1, 2), (2, 5), (3, 1), (1, 1), (2, 2)]
+    ])
+
+
+class TestBucketBatchSampler(object):
+    def test_max_tokens(self):
+        dataset = create_dataset()
+        sampler = BucketBatchSampler(dataset, ["query", "code"], 8)
+        batches = list(sampler)
+        assert len(sampler) == len(batches)
+        assert list(range(7)) == sorted(sum(batches, []))
+        for batch in batches:
+            n_token = len(batch) * (
+                max(len(dataset[i]["query"]) for i in batch) +
+                max(len(dataset[i]["code"]) for i in batch))
+            assert n_token <= 8 or len(batch) == 1
+
+    def test_long_entry(self):
+        sampler = BucketBatchSampler(create_dataset(), ["query", "code"], 1)
+        assert 7 == len(list(sampler))
+
+    def test_shuffle(self):
+        sampler = BucketBatchSampler(create_dataset(), ["query", "code"], 8,
+                                     seed=0)
+        epochs = [list(sampler) for _ in range(10)]
+        assert all(len(epochs[0]) == len(batches) for batches in epochs)
+        assert any(epochs[0] != batches for batches in epochs)
+
+    def test_padding_ratio(self):
+        sampler = BucketBatchSampler(create_dataset(), ["query", "code"], 8,
+                                     shuffle=False)
+        assert np.allclose(0.0, sampler.padding_ratio([0, 2]))
+        # (1 + 2 + 1 + 1) / (2 * (1 + 2))
+        assert np.allclose(1 - 5 / 6, sampler.padding_ratio([0, 5]))
+        batches = list(sampler)
+        assert [sampler.padding_ratio(batch) for batch in batches] == \
+            [sampler.pop_padding_ratio() for _ in batches]
+        assert sampler.pop_padding_ratio() is None
+
+    def test_distributed(self):
+        samplers = [
+            BucketBatchSampler(create_dataset(), ["query", "code"], 4,
+                               seed=0, rank=rank, world_size=2)
+            for rank in range(2)
+        ]
+        batches = [list(sampler) for sampler in samplers]
+        assert len(samplers[0]) == len(batches[0]) == len(batches[1])
+        indexes = sum(batches[0], []) + sum(batches[1], [])
+        assert len(set(indexes)) == len(indexes)
@@ -0,0 +1,114 @@
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+import torch
+
+from mlprogram.builtins import Environment
+from mlprogram.utils.data import ListDataset, materialize, store_key
+
+
+class Transform(object):
+    def __init__(self):
+        self.n_call = 0
+
+    def __call__(self, entry):
+        self.n_call += 1
+        x = entry["x"]
+        if x < 0:
+            return None
+        entry = entry.clone()
+        entry["vector"] = torch.arange(x)
+        entry["matrix"] = torch.ones(x, 2, dtype=torch.bool)
+        entry["scalar"] = torch.tensor(x * 0.5)
+        entry["state"] = None
+        entry["ground_truth"] = torch.tensor([x])
+        entry.mark_as_supervision("ground_truth")
+        return entry
+
+
+def create_dataset():
+    return ListDataset([Environment({"x": x}) for x in [1, -1, 0, 3, 2]])
+
+
+class TestMaterialize(object):
+    def test_happy_path(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dataset = materialize(create_dataset(), Transform(), tmpdir,
+                                  shard_size=2)
+            assert 4 == len(dataset)
+            for x, entry in zip([1, 0, 3, 2], dataset):
+                assert x == entry["x"]
+                assert np.array_equal(np.arange(x), entry["vector"].numpy())
+                assert (x, 2) == entry["matrix"].shape
+                assert torch.bool == entry["matrix"].dtype
+                assert () == entry["scalar"].shape
+                assert x * 0.5 == entry["scalar"].item()
+                assert entry["state"] is None
+                assert entry.is_supervision("ground_truth")
+                assert not entry.is_supervision("vector")
+            assert 3 == dataset[-2]["x"]
+
+    def test_reuse_store(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            transform = Transform()
+            materialize(create_dataset(), transform, tmpdir, key="store")
+            assert 5 == transform.n_call
+            transform = Transform()
+            dataset = materialize(create_dataset(), transform, tmpdir,
+                                  key="store")
+            assert 0 == transform.n_call
+            assert 4 == len(dataset)
+            assert ["store"] == os.listdir(tmpdir)
+
+    def test_key_from_config(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            materialize(create_dataset(), Transform(), tmpdir)
+            materialize(create_dataset(), Transform(), tmpdir)
+            assert 1 == len(os.listdir(tmpdir))
+            materialize(ListDataset([Environment({"x": 0})]), Transform(),
+                        tmpdir)
+            assert 2 == len(os.listdir(tmpdir))
+
+    def test_pickle(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            dataset = materialize(create_dataset(), Transform(), tmpdir)
+            dataset[0]
+            dataset = pickle.loads(pickle.dumps(dataset))
+            assert 1 == dataset[0]["x"]
+
+
+class TestStoreKey(object):
+    def test_stable_among_processes(self):
+        # The order of the supervisions (set) depends on PYTHONHASHSEED
+        code = (
+            "from mlprogram.builtins import Environment\n"
+            "from mlprogram.utils.data import ListDataset, store_key\n"
+            "from collections import OrderedDict\n"
+            "from mlprogram.functools import Compose, Identity\n"
+            "keys = [f'key{i}' for i in range(10)]\n"
+            "entry = Environment({key: i for i, key in enumerate(keys)},\n"
+            "                    set(keys))\n"
+            "transform = Compose(OrderedDict(identity=Identity()))\n"
+            "print(store_key(ListDataset([entry]), transform))\n"
+        )
+
+        def run(seed):
+            env = dict(os.environ)
+            env["PYTHONHASHSEED"] = str(seed)
+            proc = subprocess.run([sys.executable, "-c", code], check=True,
+                                  stdout=subprocess.PIPE, text=True, env=env)
+            return proc.stdout.strip().split("\n")[-1]
+
+        assert run(1) == run(2)
+        assert run(1) == run(3)
+
+    def test_supervision(self):
+        key0 = store_key(ListDataset([Environment({"x": 0, "y": 1}, set(["x"]))]),
+                         Transform())
+        key1 = store_key(ListDataset([Environment({"x": 0, "y": 1}, set(["y"]))]),
+                         Transform())
+        assert key0 != key1
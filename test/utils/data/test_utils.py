@@ -35,3 +35,14 @@ class TestTransform(object):
         for x in dataset:
             break
         assert 2 == x
+
+    def test_iterable_dataset_with_len(self):
+        class SizedDataset(MockDataset):
+            def __len__(self) -> int:
+                return 1
+
+        dataset = transform(SizedDataset(), lambda x: x + 1)
+        assert isinstance(dataset, torch.utils.data.IterableDataset)
+        for x in dataset:
+            break
+        assert 2 == x
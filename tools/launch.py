@@ -2,6 +2,7 @@ import argparse
 import cProfile
 import logging as L
 import os
+import pstats
 import random
 import tempfile
 from typing import Any, Optional
@@ -9,7 +10,6 @@ from typing import Any, Optional
 import numpy as np
 import torch
 from torch import multiprocessing
-from torch.autograd.profiler import profile
 
 from mlprogram import distributed, logging
 from mlprogram.entrypoint.configs import load_config, parse_config
@@ -148,12 +148,26 @@ def launch(config_file: str, option: Optional[str], tmpdir: str,
     if option == "profile":
         cprofile = cProfile.Profile()
         cprofile.enable()
-        with profile() as torch_prof:
+        profiler = logging.enable_profiler(trace=True)
+        try:
             parse_config(configs)["/main"]
-        cprofile.disable()
-        torch.save(torch_prof, os.path.join(output_dir,
-                                            f"torch_profiler-{rank}.pt"))
+        finally:
+            logging.disable_profiler()
+            cprofile.disable()
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, f"profile-{rank}.txt"), "w") as file:
+            file.write(profiler.format())
+        profiler.export_chrome_trace(
+            os.path.join(output_dir, f"trace-{rank}.json"))
+        profiler.export_flamegraph(
+            os.path.join(output_dir, f"flamegraph-{rank}.txt"))
         cprofile.dump_stats(os.path.join(output_dir, f"cprofile-{rank}.pt"))
+        for key in ["cumtime", "tottime"]:
+            with open(os.path.join(output_dir, f"{key}_stats-{rank}.txt"),
+                      "w") as file:
+                stats = pstats.Stats(cprofile, stream=file)
+                stats.sort_stats(key)
+                stats.print_stats()
     else:
         parse_config(configs)["/main"]
 